@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Projeto.settings')
+# Avisa o settings que o processo é ASGI (ver ASGI_MODE)
+os.environ.setdefault('ASGI_MODE', '1')
 
 application = get_asgi_application()
@@ -1,6 +1,9 @@
 import os
+import tempfile
 from pathlib import Path
 
+from .sqlite import opcoes_banco
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -24,12 +27,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.InstrumentacaoMiddleware', # Server-Timing e log de requisições lentas (primeiro da lista)
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # Adicionado WhiteNoise para servir estáticos em produção
+    'app.middleware.EstaticosMiddleware', # WhiteNoise para servir estáticos em produção (também em modo async)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.SeparateAdminAuthMiddleware', # Sessões separadas admin/site (após Auth!)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -38,11 +43,20 @@ ROOT_URLCONF = 'Projeto.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que também mede o tempo de renderização (Server-Timing 'tpl')
+        'BACKEND': 'app.instrumentacao.DjangoTemplatesInstrumentado',
         # AQUI ESTÁ O SEGREDO: Apontamos para 'app/template' explicitamente
         'DIRS': [os.path.join(BASE_DIR, 'app', 'template')], 
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compilados uma vez por processo; o gunicorn compila
+            # todos no master antes do fork (app/inicializacao.py). O runserver
+            # limpa este cache quando um template é editado.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -56,6 +70,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'Projeto.wsgi.application'
 
+# Modo ASGI (gunicorn com workers do uvicorn, SERVIDOR=asgi - ver gunicorn.conf.py).
+# Ligado pelo Projeto/asgi.py. No ASGI o código síncrono de cada requisição
+# (ORM, middlewares do Django) roda numa thread criada para ela, então uma
+# conexão persistente nunca seria reaproveitada: CONN_MAX_AGE passa a 0.
+ASGI_MODE = os.environ.get('ASGI_MODE', '0') == '1'
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -72,6 +92,35 @@ DATABASES = {
 if os.path.exists('/data'):
     DATABASES['default']['NAME'] = os.path.join('/data', 'db.sqlite3')
 
+# Permite apontar para outro arquivo (ex.: banco populado dos benchmarks)
+if os.environ.get('SQLITE_PATH'):
+    DATABASES['default']['NAME'] = os.environ['SQLITE_PATH']
+
+# Perfil de produção do SQLite (WAL, busy_timeout, mmap...) - ver Projeto/sqlite.py
+DATABASES['default']['OPTIONS'] = opcoes_banco()
+# Conexões persistentes: reaproveita a conexão (e os PRAGMAs) entre requisições
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 0 if ASGI_MODE else 600))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+# Banco de testes em arquivo (o padrão é em memória com cache compartilhado, em que
+# uma escrita concorrente falha na hora com "table is locked" em vez de esperar o
+# busy_timeout): os testes de concorrência travam como em produção. Um arquivo por
+# processo: duas execuções simultâneas (outro checkout, outro usuário) não apagam o
+# banco uma da outra. SQLITE_TEST_PATH fixa o arquivo (ex.: para usar --keepdb)
+DATABASES['default']['TEST'] = {
+    'NAME': os.environ.get(
+        'SQLITE_TEST_PATH', os.path.join(tempfile.gettempdir(), f'ecocycle_test-{os.getpid()}.sqlite3'),
+    ),
+}
+
+# Hashers de senha: o PBKDF2 padrão, medido pela instrumentação (Server-Timing 'hash')
+PASSWORD_HASHERS = [
+    'app.instrumentacao.PBKDF2PasswordHasherMedido',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -89,7 +138,17 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') # Pasta onde o collectstatic vai reunir os arquivos
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage' # Otimização do WhiteNoise
+
+# Storages (STATICFILES_STORAGE não é mais lido desde o Django 5.1)
+# O collectstatic gera os CSS com hash + .gz/.br, servidos pelo WhiteNoise com cache longo
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'Projeto.storage.EstaticosComHash', # Otimização do WhiteNoise
+    },
+}
 
 # Configuração de Mídia (Uploads)
 MEDIA_URL = '/media/'
@@ -101,9 +160,157 @@ if os.path.exists('/data'):
 else:
     MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cache-Control (segundos) das mídias sem hash no nome; as URLs versionadas
+# (arquivo.<hash>.ext) são servidas como immutable - ver app/media.py
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 24 * 60 * 60))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Redirecionamento após login/logout
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'index'
-LOGIN_URL = 'login'
\ No newline at end of file
+LOGIN_URL = 'login'
+
+# Caches (ver app/cache.py)
+# A invalidação entre workers é feita por carimbos de versão em arquivo
+# (por padrão ao lado do banco; pode ser alterado com CACHE_STAMP_DIR).
+# Tempo em segundos que cada worker mantém a Pagina em memória.
+SITE_CONFIG_CACHE_TTL = int(os.environ.get('SITE_CONFIG_CACHE_TTL', 300))
+
+# Cache de página inteira para visitantes anônimos.
+# PAGE_CACHE_BACKEND: 'locmem' (memória de cada worker), 'file' ou 'db'
+# ('db' exige `python manage.py createcachetable`).
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 600))
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'locmem')
+_PAGE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'paginas',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.path.dirname(DATABASES['default']['NAME']), 'cache_paginas'),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_paginas',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'paginas': _PAGE_CACHE_BACKENDS[PAGE_CACHE_BACKEND],
+}
+
+# Limite de tentativas de login, cadastro e contato (ver app/limites.py).
+# LIMITES_CACHE_BACKEND: 'locmem' (baldes por worker), 'file' ou 'db' (compartilhados
+# entre os workers; 'db' exige `python manage.py createcachetable`).
+LIMITES_ATIVOS = os.environ.get('LIMITES_ATIVOS', '1') == '1'
+LIMITES_CACHE_BACKEND = os.environ.get('LIMITES_CACHE_BACKEND', 'locmem')
+# True atrás de um proxy reverso que adiciona o IP do cliente ao X-Forwarded-For
+LIMITES_X_FORWARDED_FOR = os.environ.get('LIMITES_X_FORWARDED_FOR', '0') == '1'
+# Sobrescreve os limites padrão: {'login': {'ip': (tentativas, segundos), 'usuario': (...)}, ...}
+LIMITES = {}
+CACHES['limites'] = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'limites',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.path.dirname(DATABASES['default']['NAME']), 'cache_limites'),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_limites',
+    },
+}[LIMITES_CACHE_BACKEND]
+
+# Sessões (ver app/sessoes.py e o comando limpar_sessoes).
+# SESSION_BACKEND: 'db' (toda requisição lê o django_session), 'cached_db'
+# (lê do cache 'sessoes' e só vai ao banco se faltar) ou 'signed_cookies'
+# (a sessão inteira vai assinada no cookie, sem tabela; o logout não a
+# invalida no servidor). SESSOES_CACHE_BACKEND: 'file' (compartilhado entre
+# os workers) ou 'locmem' (só com um worker: com vários, um worker pode ler
+# uma versão velha da sessão, como o carrinho, gravada por outro).
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessoes'
+SESSOES_CACHE_BACKEND = os.environ.get('SESSOES_CACHE_BACKEND', 'file')
+CACHES['sessoes'] = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessoes',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(os.path.dirname(DATABASES['default']['NAME']), 'cache_sessoes'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}[SESSOES_CACHE_BACKEND]
+
+# Usuário autenticado guardado no cache 'sessoes' (segundos; 0 desliga):
+# poupa o SELECT em auth_user de cada requisição logada. Invalidado em
+# todos os workers quando qualquer User é salvo ou apagado.
+USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', 300))
+AUTHENTICATION_BACKENDS = ['app.sessoes.ModelBackendComCache']
+
+# API JSON do catálogo (app/api.py): tempo (s) que CDN/clientes podem guardar
+# a resposta e por quanto tempo podem servi-la velha enquanto revalidam.
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 60))
+API_CACHE_STALE = int(os.environ.get('API_CACHE_STALE', 300))
+
+# Instrumentação de requisições (ver app/instrumentacao.py)
+# Requisições acima deste tempo (ms) vão para o log 'app.requisicoes_lentas'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+
+# Fila do formulário de contato (ver app/fila_contatos.py)
+# Mensagens aguardando gravação por processo; 0 grava na própria requisição
+CONTATO_FILA_TAMANHO = int(os.environ.get('CONTATO_FILA_TAMANHO', 1000))
+# Máximo de mensagens gravadas por transação
+CONTATO_LOTE = int(os.environ.get('CONTATO_LOTE', 100))
+# Intervalo mínimo (s) entre e-mails de aviso à equipe
+CONTATO_EMAIL_INTERVALO = int(os.environ.get('CONTATO_EMAIL_INTERVALO', 60))
+# Destinatários dos avisos (separados por vírgula); vazio = usuários staff com e-mail
+CONTATO_EMAILS = [email.strip() for email in os.environ.get('CONTATO_EMAILS', '').split(',') if email.strip()]
+
+# Reservas de estoque da página de compra (ver app/reservas.py e o comando
+# limpar_reservas). Duração (minutos) de cada reserva de uma unidade
+RESERVA_MINUTOS = int(os.environ.get('RESERVA_MINUTOS', 5))
+# Abaixo deste disponível o card da vitrine mostra "últimas N unidades"
+RESERVA_AVISO_ESTOQUE = int(os.environ.get('RESERVA_AVISO_ESTOQUE', 5))
+# Reservas vencidas apagadas a cada reserva gravada (0 = só pelo comando)
+RESERVAS_VARREDURA = int(os.environ.get('RESERVAS_VARREDURA', 20))
+
+# Backup online do SQLite (ver app/backup.py e o comando backup_db).
+# BACKUP_DIR vazio = pasta 'backups' ao lado do banco (no volume, em produção).
+BACKUP_DIR = os.environ.get('BACKUP_DIR', '')
+# Backups mantidos pela rotação (0 = todos)
+BACKUP_MANTER = int(os.environ.get('BACKUP_MANTER', 7))
+# Páginas copiadas por passo e pausa (s) entre os passos
+BACKUP_PAGINAS = int(os.environ.get('BACKUP_PAGINAS', 256))
+BACKUP_PAUSA = float(os.environ.get('BACKUP_PAUSA', 0.002))
+
+# E-mail: console por padrão (aparece no log). Para um SMTP local de teste:
+# EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend EMAIL_PORT=1025
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'EcoCycle <nao-responda@ecocycle.com.br>')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'app': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
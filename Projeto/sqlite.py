@@ -0,0 +1,59 @@
+"""
+Perfil de produção do SQLite.
+
+Os PRAGMAs abaixo são aplicados em toda conexão nova (via OPTIONS['init_command']
+do Django) e cada um pode ser sobrescrito por variável de ambiente
+SQLITE_<NOME>, por exemplo SQLITE_BUSY_TIMEOUT=10000.
+
+- journal_mode=WAL: leitores não bloqueiam o escritor (e vice-versa)
+- synchronous=NORMAL: seguro com WAL e bem mais rápido que FULL
+- busy_timeout: espera o lock em vez de falhar com "database is locked"
+- mmap_size: leituras direto do page cache do sistema operacional
+- cache_size: negativo = tamanho em KiB do cache de páginas por conexão
+- temp_store=MEMORY: tabelas temporárias (ORDER BY, GROUP BY) em memória
+"""
+import os
+
+PRAGMAS_PADRAO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,           # ms
+    'mmap_size': 64 * 1024 * 1024,  # 64 MiB
+    'cache_size': -8000,            # ~8 MiB
+    'temp_store': 'MEMORY',
+}
+
+
+def pragmas(**sobrescritos):
+    """
+    Retorna os PRAGMAs efetivos: padrão < variáveis de ambiente < argumentos.
+    """
+    efetivos = {}
+    for nome, valor in PRAGMAS_PADRAO.items():
+        efetivos[nome] = os.environ.get(f'SQLITE_{nome.upper()}', valor)
+    efetivos.update(sobrescritos)
+    return efetivos
+
+
+def init_command(valores=None):
+    """
+    Monta o init_command (comandos separados por ';') a partir dos PRAGMAs.
+    """
+    if valores is None:
+        valores = pragmas()
+    return ';'.join(f'PRAGMA {nome}={valor}' for nome, valor in valores.items())
+
+
+def opcoes_banco():
+    """
+    OPTIONS para DATABASES['default'].
+
+    transaction_mode=IMMEDIATE faz o BEGIN de transaction.atomic() já pegar o
+    lock de escrita, o que permite ao busy_timeout funcionar (com BEGIN
+    DEFERRED a promoção leitura->escrita falha na hora com "database is locked").
+    Use SQLITE_TRANSACTION_MODE=DEFERRED para voltar ao comportamento padrão.
+    """
+    return {
+        'init_command': init_command(),
+        'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE') or None,
+    }
@@ -0,0 +1,25 @@
+"""
+Storage dos arquivos estáticos.
+
+O collectstatic com CompressedManifestStaticFilesStorage (WhiteNoise) é o
+passo de build dos assets: copia os CSS de app/static, gera nomes com hash
+do conteúdo (base.3f2a9c1b7d4e.css) e as versões .gz/.br. O WhiteNoise serve
+os arquivos com hash com cache "para sempre" (immutable).
+"""
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class EstaticosComHash(CompressedManifestStaticFilesStorage):
+    """
+    Usa sempre a URL com hash quando o manifest existe, mesmo com DEBUG=True
+    (o ManifestStaticFilesStorage original só usa hash com DEBUG=False).
+    Sem manifest (desenvolvimento/testes sem collectstatic) cai para a URL
+    simples, servida pelos finders do WhiteNoise/runserver.
+    """
+    manifest_strict = False
+
+    def url(self, name, force=False):
+        if not self.hashed_files:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force=True)
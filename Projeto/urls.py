@@ -1,12 +1,12 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, re_path
-from django.conf import settings
-from django.conf.urls.static import static
-from django.views.static import serve
 from django.contrib.auth import views as auth_views
+from django.views.generic import RedirectView
 
 # Importamos apenas as views, que é o padrão seguro
-from app import views
+from app import api, views
+from app.media import servir_midia
 
 # Definimos o formulário de login DIRETAMENTE na view personalizada se precisarmos,
 # ou usamos um truque para não importar o forms.py aqui.
@@ -17,24 +17,47 @@ from app import views
 # O formulário personalizado (com placeholders) já deve ser usado automaticamente
 # se configurarmos corretamente ou se passarmos na view.
 
+# Views de leitura: as async no modo ASGI (não prendem thread enquanto esperam),
+# as síncronas no WSGI (sem ir e voltar entre threads a cada consulta)
+if settings.ASGI_MODE:
+    index, buscar, perfil = views.aindex, views.abuscar, views.aperfil
+    api_produtos, api_produto = api.aprodutos, api.aproduto
+else:
+    index, buscar, perfil = views.index, views.buscar, views.perfil
+    api_produtos, api_produto = api.produtos, api.produto
+
 urlpatterns = [
+    # O login padrão do admin não marca a sessão como 'admin' (o middleware de
+    # separação desfaria o login), então ele é redirecionado para /admin-login/
+    path('admin/login/', RedirectView.as_view(pattern_name='admin_login', query_string=True)),
+    # Resumo de desempenho por view (somente staff) - ver app/instrumentacao.py
+    path('admin/metricas/', views.metricas, name='metricas'),
+    # Painel de vendas e impacto (somente staff), lido dos agregados diários
+    path('admin/vendas/', views.painel_vendas, name='painel_vendas'),
     path('admin/', admin.site.urls),
     
     # Rotas do App
-    path('', views.index, name='index'),
+    path('', index, name='index'),
+    path('buscar/', buscar, name='buscar'),
     path('cadastro/', views.cadastro, name='cadastro'),
     path('comprar/<int:produto_id>/', views.comprar, name='comprar'),
-    path('perfil/', views.perfil, name='perfil'),
+    path('perfil/', perfil, name='perfil'),
+
+    # Carrinho (guardado na sessão) e finalização de todos os itens de uma vez
+    path('carrinho/', views.carrinho, name='carrinho'),
+    path('carrinho/adicionar/<int:produto_id>/', views.adicionar_ao_carrinho, name='adicionar_ao_carrinho'),
+    path('carrinho/finalizar/', views.finalizar_carrinho, name='finalizar_carrinho'),
     
+    # API JSON do catálogo (somente leitura, com ETag/304) - ver app/api.py
+    path('api/produtos/', api_produtos, name='api_produtos'),
+    path('api/produtos/<int:produto_id>/', api_produto, name='api_produto'),
+
     # Login: Usando a view que criaremos no app/views.py para evitar circular import
     path('login/', views.site_login, name='login'),
     path('admin-login/', views.admin_login, name='admin_login'),
 
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 
-    # Rota para média em produção
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Rota para mídia (dev e produção): ETag/304, Range e cache longo - ver app/media.py
+    re_path(r'^media/(?P<path>.*)$', servir_midia),
+]
\ No newline at end of file
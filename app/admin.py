@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Pagina, Produto, Contato, Pedido
+from .models import Pagina, Produto, Contato, Pedido, Reserva
+from .busca import consulta_fts, filtrar_produtos
+from .relatorios import COLUNAS_CONTATOS, COLUNAS_PEDIDOS, nome_do_arquivo, resposta_csv
 
 # Configuração da Página (Só deve ter uma, então simplificamos)
 admin.site.register(Pagina)
@@ -7,18 +9,52 @@ admin.site.register(Pagina)
 # Configuração de Produtos com colunas visíveis
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'preco', 'estoque', 'atualizado_em')
+    list_display = ('nome', 'sku', 'preco', 'estoque', 'atualizado_em')
     search_fields = ('nome', 'descricao')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Usa o índice FTS5 (app/busca.py) em vez de LIKE '%termo%' em nome e
+        # descrição, mais o SKU exato
+        if not search_term.strip():
+            return queryset, False
+        por_sku = queryset.filter(sku=search_term.strip())
+        if not consulta_fts(search_term):
+            # Sem nenhuma palavra ("-", "%%") o FTS não filtraria nada: só o SKU
+            return por_sku, False
+        return filtrar_produtos(queryset, search_term) | por_sku, False
+
 # Configuração de Contatos para facilitar a leitura
 @admin.register(Contato)
 class ContatoAdmin(admin.ModelAdmin):
     list_display = ('nome', 'email', 'criado_em')
     search_fields = ('nome', 'email')
     readonly_fields = ('nome', 'email', 'mensagem', 'criado_em') # Apenas leitura
+    actions = ['exportar_csv']
+
+    @admin.action(description='Exportar selecionados para CSV')
+    def exportar_csv(self, request, queryset):
+        # CSV em streaming (app/relatorios.py): memória constante
+        return resposta_csv(request, queryset.order_by('pk'), COLUNAS_CONTATOS, nome_do_arquivo('contatos'))
 
 # Configuração de Pedidos
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
     list_display = ('id', 'usuario', 'produto', 'quantidade', 'total', 'data')
-    list_filter = ('data',)
\ No newline at end of file
+    list_filter = ('data',)
+    # Usuário e produto vêm no mesmo SELECT da lista (sem uma consulta por linha)
+    list_select_related = ('usuario', 'produto')
+    # Navegação por ano/mês/dia, usando o índice pedido_data_idx
+    date_hierarchy = 'data'
+    actions = ['exportar_csv']
+
+    @admin.action(description='Exportar selecionados para CSV')
+    def exportar_csv(self, request, queryset):
+        # CSV em streaming (app/relatorios.py): memória constante
+        return resposta_csv(request, queryset.order_by('pk'), COLUNAS_PEDIDOS, nome_do_arquivo('pedidos'))
+
+# Reservas da página de compra (app/reservas.py): só consulta
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = ('produto', 'usuario', 'quantidade', 'expira_em')
+    list_select_related = ('usuario', 'produto')
+    readonly_fields = ('usuario', 'produto', 'quantidade', 'expira_em')
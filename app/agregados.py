@@ -0,0 +1,157 @@
+"""
+Agregados diários de vendas: por produto (VendaDiariaProduto) e por
+cliente (VendaDiariaUsuario), com pedidos, unidades, receita e o impacto
+estimado (CO₂ e lixo eletrônico evitados).
+
+O painel de vendas do admin e o resumo do perfil leem só essas tabelas,
+que crescem com dias x produtos/clientes e não com o número de pedidos.
+
+- registrar_pedidos soma pedidos novos aos totais do dia, na mesma
+  transação da compra (um UPSERT por tabela). É chamado pelo sinal
+  post_save de Pedido e, como bulk_create não dispara sinais, direto
+  pela finalização do carrinho;
+- descontar_pedidos tira dos totais do dia os pedidos excluídos (sinal
+  post_delete de Pedido, inclusive na exclusão em cascata de um cliente
+  ou produto);
+- reconstruir refaz os agregados a partir dos pedidos: a migração 0006
+  carrega o histórico com ele, e o comando reconstruir_agregados corrige
+  os totais depois de pedidos editados no admin ou gravados por
+  bulk_create (popular_dados).
+"""
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import (
+    CO2_POR_PEDIDO_KG, LIXO_POR_UNIDADE_KG, Pedido, VendaDiariaProduto, VendaDiariaUsuario,
+)
+
+# (modelo, campo que identifica a linha além do dia)
+AGREGADOS = (
+    (VendaDiariaProduto, 'produto'),
+    (VendaDiariaUsuario, 'usuario'),
+)
+SOMAS = ('pedidos', 'unidades', 'receita', 'co2_kg', 'lixo_kg')
+LOTE = 1000
+
+
+def _impacto(pedidos, unidades):
+    return {'co2_kg': pedidos * CO2_POR_PEDIDO_KG, 'lixo_kg': unidades * LIXO_POR_UNIDADE_KG}
+
+
+def _upsert(modelo, campo):
+    """INSERT ... ON CONFLICT que soma os valores novos aos existentes (SQLite e PostgreSQL)."""
+    nome = connection.ops.quote_name
+    tabela = nome(modelo._meta.db_table)
+    chave = modelo._meta.get_field(campo).column
+    colunas = ['dia', chave, *SOMAS]
+    somas = ', '.join(f'{nome(c)} = {tabela}.{nome(c)} + excluded.{nome(c)}' for c in SOMAS)
+    return (
+        f'INSERT INTO {tabela} ({", ".join(nome(c) for c in colunas)}) '
+        f'VALUES ({", ".join(["%s"] * len(colunas))}) '
+        f'ON CONFLICT ({nome("dia")}, {nome(chave)}) DO UPDATE SET {somas}'
+    )
+
+
+def _agrupar(pedidos, campo):
+    """{(dia, id do produto/cliente): [pedidos, unidades, receita]}"""
+    grupos = defaultdict(lambda: [0, 0, 0])
+    for pedido in pedidos:
+        grupo = grupos[timezone.localdate(pedido.data), getattr(pedido, f'{campo}_id')]
+        grupo[0] += 1
+        grupo[1] += pedido.quantidade
+        grupo[2] += pedido.total
+    return grupos
+
+
+def registrar_pedidos(pedidos):
+    """Soma os pedidos (já gravados) aos agregados do dia de cada um."""
+    pedidos = list(pedidos)
+    if not pedidos:
+        return
+    for modelo, campo in AGREGADOS:
+        grupos = _agrupar(pedidos, campo)
+        linhas = [
+            (
+                connection.ops.adapt_datefield_value(dia),
+                chave,
+                quantidade,
+                unidades,
+                connection.ops.adapt_decimalfield_value(receita),
+                *_impacto(quantidade, unidades).values(),
+            )
+            for (dia, chave), (quantidade, unidades, receita) in grupos.items()
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(_upsert(modelo, campo), linhas)
+
+
+def descontar_pedidos(pedidos):
+    """
+    Tira os pedidos (excluídos) dos agregados do dia de cada um. Nenhum
+    total fica negativo: se o agregado já estava defasado (pedidos de
+    bulk_create, por exemplo), para em zero até o próximo reconstruir.
+    """
+    pedidos = list(pedidos)
+    if not pedidos:
+        return
+    for modelo, campo in AGREGADOS:
+        for (dia, chave), (quantidade, unidades, receita) in _agrupar(pedidos, campo).items():
+            valores = {'pedidos': quantidade, 'unidades': unidades, 'receita': receita,
+                       **_impacto(quantidade, unidades)}
+            modelo.objects.filter(dia=dia, **{f'{campo}_id': chave}).update(
+                **{soma: Greatest(F(soma) - valor, 0) for soma, valor in valores.items()}
+            )
+
+
+def reconstruir(desde=None, apps=None):
+    """
+    Recalcula os agregados a partir de ``desde`` (uma data; None = todo o
+    histórico) numa única transação. Retorna {modelo: linhas gravadas}.
+    ``apps`` é o registro de modelos históricos quando chamado por uma
+    migração.
+    """
+    if apps is None:
+        pedidos, agregados = Pedido.objects.all(), AGREGADOS
+    else:
+        pedidos = apps.get_model('app', 'Pedido').objects.all()
+        agregados = [(apps.get_model('app', modelo.__name__), campo) for modelo, campo in AGREGADOS]
+    if desde is not None:
+        # Intervalo em data/hora (e não __date) para usar o índice pedido_data_idx
+        pedidos = pedidos.filter(data__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+
+    gravadas = {}
+    with transaction.atomic():
+        for modelo, campo in agregados:
+            antigos = modelo.objects.all()
+            if desde is not None:
+                antigos = antigos.filter(dia__gte=desde)
+            antigos.delete()
+
+            grupos = (
+                pedidos.annotate(dia=TruncDate('data'))
+                .values('dia', campo)
+                .annotate(total_pedidos=Count('id'), total_unidades=Sum('quantidade'), total_receita=Sum('total'))
+                .order_by()
+            )
+            lote, total = [], 0
+            for grupo in grupos.iterator(chunk_size=LOTE):
+                lote.append(modelo(
+                    dia=grupo['dia'],
+                    pedidos=grupo['total_pedidos'],
+                    unidades=grupo['total_unidades'],
+                    receita=grupo['total_receita'],
+                    **{f'{campo}_id': grupo[campo]},
+                    **_impacto(grupo['total_pedidos'], grupo['total_unidades']),
+                ))
+                if len(lote) == LOTE:
+                    modelo.objects.bulk_create(lote)
+                    total += len(lote)
+                    lote = []
+            modelo.objects.bulk_create(lote)
+            gravadas[modelo] = total + len(lote)
+    return gravadas
@@ -0,0 +1,178 @@
+"""
+API JSON (somente leitura) do catálogo de produtos.
+
+    GET /api/produtos/          lista, do mais novo ao mais antigo
+                                ?em_estoque=1  só produtos com estoque
+                                ?limite=N      itens por página (máx. API_LIMITE_MAX)
+                                ?cursor=...    página seguinte (campo "proximo")
+    GET /api/produtos/<id>/     detalhe
+
+As consultas usam .values(): nenhuma instância de Produto é criada.
+Cada produto traz ``disponivel``: o estoque menos as reservas ativas da
+página de compra (app/reservas.py), calculado na mesma consulta.
+
+Cada resposta leva um ETag fraco. Na lista ele vem de max(atualizado_em)
+e do total de produtos, das reservas ativas (quantas, quantas unidades e
+o maior vencimento), tudo numa única consulta agregada, e dos parâmetros
+da URL. Qualquer alteração, compra (o UPDATE de estoque
+também grava atualizado_em), inclusão, exclusão, reserva nova ou vencida
+muda o ETag. Se o cliente mandar If-None-Match com o ETag atual, a
+resposta é 304 sem montar o JSON. O Cache-Control público permite que CDN
+e clientes guardem a resposta por API_CACHE_MAX_AGE segundos e a sirvam
+velha por mais API_CACHE_STALE enquanto revalidam.
+
+Cada view tem duas versões: a síncrona, do modo WSGI (o padrão), e a
+async (aprodutos, aproduto, com o ORM async), que o Projeto/urls.py
+escolhe no modo ASGI, onde ela não prende thread. Nela o hash das URLs das
+fotos (url_versionada), que lê o arquivo, é calculado numa thread por
+apreparar_imagens antes de montar o JSON.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max, Q, Sum
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+from .imagens import apreparar_imagens
+from .media import url_versionada
+from .models import Produto
+from .paginacao import apaginar_por_cursor, paginar_por_cursor
+from .reservas import com_disponivel
+
+API_CACHE_MAX_AGE = getattr(settings, 'API_CACHE_MAX_AGE', 60)
+API_CACHE_STALE = getattr(settings, 'API_CACHE_STALE', 300)
+API_LIMITE_PADRAO = 50
+API_LIMITE_MAX = 200
+
+CAMPOS = ('id', 'nome', 'descricao', 'preco', 'estoque', 'foto', 'atualizado_em')
+
+
+def _etag(*partes):
+    conteudo = '|'.join(str(parte) for parte in partes).encode()
+    return f'W/"{hashlib.md5(conteudo, usedforsecurity=False).hexdigest()}"'
+
+
+def _com_cache(resposta, etag):
+    resposta['ETag'] = etag
+    patch_cache_control(
+        resposta, public=True, max_age=API_CACHE_MAX_AGE, stale_while_revalidate=API_CACHE_STALE
+    )
+    return resposta
+
+
+def _serializar(request, produto):
+    return {
+        'id': produto['id'],
+        'nome': produto['nome'],
+        'descricao': produto['descricao'],
+        'preco': produto['preco'],
+        'estoque': produto['estoque'],
+        'disponivel': max(produto['disponivel'], 0),
+        'foto': request.build_absolute_uri(url_versionada(produto['foto'])) if produto['foto'] else None,
+        'atualizado_em': produto['atualizado_em'],
+        'url': request.build_absolute_uri(reverse('api_produto', args=[produto['id']])),
+    }
+
+
+def _limite(valor):
+    try:
+        return min(max(int(valor), 1), API_LIMITE_MAX)
+    except (TypeError, ValueError):
+        return API_LIMITE_PADRAO
+
+
+def _agregado_do_catalogo(agora):
+    """Agregados do ETag da lista (ver o docstring do módulo)."""
+    ativas = Q(reservas__expira_em__gt=agora)
+    # LEFT JOIN com as reservas, que o índice (produto, expira_em, quantidade) responde sozinho
+    return {
+        'ultima': Max('atualizado_em'),
+        'total': Count('id', distinct=True),
+        'ativas': Count('reservas', filter=ativas),
+        'reservado': Sum('reservas__quantidade', filter=ativas),
+        'fim_reservas': Max('reservas__expira_em', filter=ativas),
+    }
+
+
+def _lista(request, agora):
+    queryset = com_disponivel(Produto.objects.values(*CAMPOS), agora=agora)
+    if request.GET.get('em_estoque') in ('1', 'true'):
+        queryset = queryset.filter(estoque__gt=0)
+    return queryset
+
+
+def _resposta_da_lista(request, itens, proximo, etag):
+    if proximo:
+        parametros = request.GET.copy()
+        parametros['cursor'] = proximo
+        proximo = request.build_absolute_uri(f'{request.path}?{parametros.urlencode()}')
+    dados = {'produtos': [_serializar(request, item) for item in itens], 'proximo': proximo}
+    return _com_cache(JsonResponse(dados), etag)
+
+
+@require_safe
+def produtos(request):
+    agora = timezone.now()
+    catalogo = Produto.objects.aggregate(**_agregado_do_catalogo(agora))
+    etag = _etag(*catalogo.values(), request.GET.urlencode())
+    nao_modificado = get_conditional_response(request, etag=etag)
+    if nao_modificado is not None:
+        return _com_cache(nao_modificado, etag)
+
+    itens, proximo = paginar_por_cursor(
+        _lista(request, agora), 'id', cursor=request.GET.get('cursor'), tamanho=_limite(request.GET.get('limite'))
+    )
+    return _resposta_da_lista(request, itens, proximo, etag)
+
+
+@require_safe
+async def aprodutos(request):
+    """produtos para o modo ASGI."""
+    agora = timezone.now()
+    catalogo = await Produto.objects.aaggregate(**_agregado_do_catalogo(agora))
+    etag = _etag(*catalogo.values(), request.GET.urlencode())
+    nao_modificado = get_conditional_response(request, etag=etag)
+    if nao_modificado is not None:
+        return _com_cache(nao_modificado, etag)
+
+    itens, proximo = await apaginar_por_cursor(
+        _lista(request, agora), 'id', cursor=request.GET.get('cursor'), tamanho=_limite(request.GET.get('limite'))
+    )
+    await apreparar_imagens([item['foto'] for item in itens])
+    return _resposta_da_lista(request, itens, proximo, etag)
+
+
+def _detalhe(produto_id):
+    return com_disponivel(Produto.objects.filter(pk=produto_id).values(*CAMPOS))
+
+
+def _condicional_do_detalhe(request, item):
+    """(etag, resposta 304 ou None) do produto ``item``."""
+    if item is None:
+        raise Http404('Produto não encontrado')
+    etag = _etag(item['id'], item['atualizado_em'], item['disponivel'])
+    return etag, get_conditional_response(request, etag=etag)
+
+
+@require_safe
+def produto(request, produto_id):
+    item = _detalhe(produto_id).first()
+    etag, nao_modificado = _condicional_do_detalhe(request, item)
+    if nao_modificado is not None:
+        return _com_cache(nao_modificado, etag)
+    return _com_cache(JsonResponse(_serializar(request, item)), etag)
+
+
+@require_safe
+async def aproduto(request, produto_id):
+    """produto para o modo ASGI."""
+    item = await _detalhe(produto_id).afirst()
+    etag, nao_modificado = _condicional_do_detalhe(request, item)
+    if nao_modificado is not None:
+        return _com_cache(nao_modificado, etag)
+    await apreparar_imagens([item['foto']])
+    return _com_cache(JsonResponse(_serializar(request, item)), etag)
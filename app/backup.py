@@ -0,0 +1,367 @@
+"""
+Backup online do SQLite (comando ``backup_db``).
+
+Copiar o db.sqlite3 com a aplicação no ar pode gerar uma cópia rasgada
+(metade antes e metade depois de uma compra), e parar a aplicação derruba
+o site. Aqui a cópia usa a API de backup do SQLite, de BACKUP_PAGINAS
+páginas por passo, com uma pausa de BACKUP_PAUSA entre os passos:
+
+- A conexão de origem mantém uma transação de leitura aberta durante toda
+  a cópia. No modo WAL isso não bloqueia os escritores e fixa o retrato do
+  banco. Sem ela, cada compra feita no meio da cópia a faria recomeçar do
+  zero (com compras contínuas, ela nunca terminaria). O custo é o WAL
+  crescer até o fim da cópia, porque o checkpoint não passa do retrato.
+- Uma sonda mede, enquanto a cópia roda, quanto um escritor espera pelo
+  lock (BEGIN IMMEDIATE seguido de ROLLBACK, a cada 10 ms).
+
+A cópia vai para um arquivo temporário na pasta de backups e passa pelo
+PRAGMA integrity_check antes de ser gravada num destes formatos:
+
+- completo: ``ecocycle-<data>.sqlite3.gz`` (ou ``.sqlite3`` sem compressão),
+  que pode ser restaurado à mão com gunzip
+- incremental: ``ecocycle-<data>.json``, um manifesto com os hashes dos
+  blocos do arquivo (BACKUP_BLOCO bytes cada), guardados uma única vez em
+  ``blocos/``. Um backup novo só grava os blocos que mudaram desde os
+  anteriores
+
+rotacionar() mantém os BACKUP_MANTER backups mais novos e apaga os blocos
+que nenhum manifesto usa mais. restaurar() reconstrói e verifica o backup e
+o copia para o banco, também pela API de backup (numa transação: os
+leitores veem o banco antigo ou o novo, nunca uma mistura).
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+BACKUP_MANTER = getattr(settings, 'BACKUP_MANTER', 7)
+BACKUP_PAGINAS = getattr(settings, 'BACKUP_PAGINAS', 256)
+BACKUP_PAUSA = getattr(settings, 'BACKUP_PAUSA', 0.002)
+# Tamanho dos blocos dos backups incrementais (múltiplo de qualquer page_size)
+BACKUP_BLOCO = getattr(settings, 'BACKUP_BLOCO', 256 * 1024)
+
+PREFIXO = 'ecocycle-'
+SUFIXOS = ('.sqlite3', '.sqlite3.gz', '.json')
+TAMANHO_LEITURA = 1024 * 1024
+
+Copia = namedtuple('Copia', 'bytes paginas passos segundos pausa_escritores')
+
+
+class BackupInvalido(Exception):
+    """O backup está incompleto, corrompido ou não é um banco SQLite íntegro."""
+
+
+def caminho_do_banco(using='default'):
+    conexao = connections[using]
+    nome = str(conexao.settings_dict['NAME'])
+    if conexao.vendor != 'sqlite' or conexao.is_in_memory_db():
+        raise ValueError('backup_db só funciona com um banco SQLite em arquivo')
+    return Path(nome)
+
+
+def pasta_backups():
+    pasta = getattr(settings, 'BACKUP_DIR', None)
+    if not pasta:
+        pasta = caminho_do_banco().parent / 'backups'
+    return Path(pasta)
+
+
+# ---------------------------------------------------------------------------
+# Cópia online
+# ---------------------------------------------------------------------------
+
+class SondaEscritores:
+    """Thread que mede quanto um escritor espera pelo lock do banco."""
+
+    def __init__(self, banco, intervalo=0.01):
+        self.banco = banco
+        self.intervalo = intervalo
+        self.maior = 0.0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._sondar, name='sonda-backup', daemon=True)
+
+    def _sondar(self):
+        conexao = sqlite3.connect(self.banco, timeout=60, isolation_level=None)
+        try:
+            while not self._parar.wait(self.intervalo):
+                inicio = time.perf_counter()
+                conexao.execute('BEGIN IMMEDIATE')
+                conexao.execute('ROLLBACK')
+                self.maior = max(self.maior, time.perf_counter() - inicio)
+        finally:
+            conexao.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+
+def copiar_online(banco, destino, paginas=None, pausa=None, sondar=True):
+    """
+    Copia ``banco`` para ``destino`` (arquivo novo) com a API de backup, em
+    passos de ``paginas`` páginas com ``pausa`` segundos entre eles. A cópia
+    sai em journal_mode=DELETE: um arquivo só, sem -wal.
+    """
+    paginas = paginas or BACKUP_PAGINAS
+    pausa = BACKUP_PAUSA if pausa is None else pausa
+    passos = 0
+
+    def progresso(status, restantes, total):
+        nonlocal passos
+        passos += 1
+        if restantes:
+            time.sleep(pausa)
+
+    origem = sqlite3.connect(banco, timeout=60, isolation_level=None)
+    copia = sqlite3.connect(destino, isolation_level=None)
+    sonda = SondaEscritores(banco) if sondar else None
+    try:
+        inicio = time.perf_counter()
+        with sonda or nullcontext():
+            # Retrato fixo do banco durante toda a cópia (ver docstring do módulo)
+            origem.execute('BEGIN')
+            origem.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+            origem.backup(copia, pages=paginas, progress=progresso)
+            origem.execute('COMMIT')
+        segundos = time.perf_counter() - inicio
+        total_paginas = copia.execute('PRAGMA page_count').fetchone()[0]
+        tamanho_pagina = copia.execute('PRAGMA page_size').fetchone()[0]
+        copia.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        copia.close()
+        origem.close()
+    return Copia(
+        total_paginas * tamanho_pagina, total_paginas, passos, segundos, sonda.maior if sonda else None,
+    )
+
+
+def verificar_integridade(arquivo):
+    """Roda o PRAGMA integrity_check; levanta BackupInvalido com os problemas."""
+    try:
+        conexao = sqlite3.connect(f'file:{arquivo}?mode=ro', uri=True)
+        try:
+            problemas = [linha[0] for linha in conexao.execute('PRAGMA integrity_check')]
+        finally:
+            conexao.close()
+    except sqlite3.DatabaseError as erro:
+        raise BackupInvalido(f'{arquivo}: {erro}') from erro
+    if problemas != ['ok']:
+        raise BackupInvalido(f'{arquivo}: ' + '; '.join(problemas[:5]))
+
+
+# ---------------------------------------------------------------------------
+# Formatos
+# ---------------------------------------------------------------------------
+
+def _sha256(arquivo):
+    sha = hashlib.sha256()
+    with open(arquivo, 'rb') as entrada:
+        for bloco in iter(lambda: entrada.read(TAMANHO_LEITURA), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _gravar_atomico(destino, gravar):
+    """Grava via arquivo .tmp + rename: um backup pela metade nunca tem o nome final."""
+    temporario = destino.with_name(destino.name + '.tmp')
+    with open(temporario, 'wb') as saida:
+        gravar(saida)
+        saida.flush()
+        os.fsync(saida.fileno())
+    os.replace(temporario, destino)
+
+
+def gravar_completo(copia, pasta, nome, comprimir=True):
+    destino = pasta / f'{nome}.sqlite3{".gz" if comprimir else ""}'
+
+    def gravar(saida):
+        with open(copia, 'rb') as entrada:
+            if comprimir:
+                with gzip.GzipFile(fileobj=saida, mode='wb', compresslevel=6, mtime=0) as compactado:
+                    shutil.copyfileobj(entrada, compactado, TAMANHO_LEITURA)
+            else:
+                shutil.copyfileobj(entrada, saida, TAMANHO_LEITURA)
+
+    _gravar_atomico(destino, gravar)
+    return destino, 0, 0
+
+
+def _arquivo_do_bloco(pasta, sha, comprimido):
+    return pasta / 'blocos' / sha[:2] / (sha + ('.gz' if comprimido else ''))
+
+
+def gravar_incremental(copia, pasta, nome, comprimir=True, tamanho_bloco=None):
+    """Grava o manifesto e os blocos que ainda não existem; retorna (manifesto, novos, reaproveitados)."""
+    tamanho_bloco = tamanho_bloco or BACKUP_BLOCO
+    blocos, novos, reaproveitados = [], 0, 0
+    with open(copia, 'rb') as entrada:
+        for dados in iter(lambda: entrada.read(tamanho_bloco), b''):
+            sha = hashlib.sha256(dados).hexdigest()
+            blocos.append(sha)
+            arquivo = _arquivo_do_bloco(pasta, sha, comprimir)
+            if arquivo.exists():
+                reaproveitados += 1
+                continue
+            arquivo.parent.mkdir(parents=True, exist_ok=True)
+            _gravar_atomico(arquivo, lambda saida: saida.write(gzip.compress(dados, 6, mtime=0) if comprimir else dados))
+            novos += 1
+
+    manifesto = {
+        'criado_em': timezone.now().isoformat(),
+        'tamanho': os.path.getsize(copia),
+        'sha256': _sha256(copia),
+        'tamanho_bloco': tamanho_bloco,
+        'comprimido': comprimir,
+        'blocos': blocos,
+    }
+    destino = pasta / f'{nome}.json'
+    _gravar_atomico(destino, lambda saida: saida.write(json.dumps(manifesto).encode()))
+    return destino, novos, reaproveitados
+
+
+def reconstruir(backup, destino):
+    """Monta o arquivo SQLite de qualquer formato de backup em ``destino`` e o verifica."""
+    backup = Path(backup)
+    if backup.name.endswith('.json'):
+        manifesto = json.loads(backup.read_text())
+        with open(destino, 'wb') as saida:
+            for sha in manifesto['blocos']:
+                arquivo = _arquivo_do_bloco(backup.parent, sha, manifesto['comprimido'])
+                try:
+                    dados = arquivo.read_bytes()
+                except FileNotFoundError:
+                    raise BackupInvalido(f'{backup.name}: bloco {sha} não encontrado') from None
+                saida.write(gzip.decompress(dados) if manifesto['comprimido'] else dados)
+        if _sha256(destino) != manifesto['sha256']:
+            raise BackupInvalido(f'{backup.name}: o conteúdo não confere com o sha256 do manifesto')
+    elif backup.name.endswith('.gz'):
+        try:
+            with gzip.open(backup, 'rb') as entrada, open(destino, 'wb') as saida:
+                shutil.copyfileobj(entrada, saida, TAMANHO_LEITURA)
+        except (OSError, EOFError) as erro:
+            raise BackupInvalido(f'{backup.name}: {erro}') from erro
+    else:
+        shutil.copyfile(backup, destino)
+    verificar_integridade(destino)
+    return destino
+
+
+# ---------------------------------------------------------------------------
+# Operações do comando
+# ---------------------------------------------------------------------------
+
+def listar_backups(pasta=None):
+    """Backups da pasta, do mais antigo ao mais novo (o nome leva a data)."""
+    pasta = Path(pasta or pasta_backups())
+    if not pasta.is_dir():
+        return []
+    return sorted(
+        arquivo for arquivo in pasta.iterdir()
+        if arquivo.name.startswith(PREFIXO) and arquivo.name.endswith(SUFIXOS)
+    )
+
+
+def fazer_backup(pasta=None, incremental=False, comprimir=True, paginas=None, pausa=None, banco=None):
+    """
+    Copia o banco, verifica a cópia e grava o backup. Retorna
+    (arquivo, Copia, blocos novos, blocos reaproveitados).
+    """
+    banco = Path(banco or caminho_do_banco())
+    pasta = Path(pasta or pasta_backups())
+    pasta.mkdir(parents=True, exist_ok=True)
+    nome = PREFIXO + timezone.localtime().strftime('%Y%m%d-%H%M%S-%f')
+    temporario = pasta / f'.{nome}.copia'
+    try:
+        copia = copiar_online(banco, temporario, paginas, pausa)
+        verificar_integridade(temporario)
+        gravar = gravar_incremental if incremental else gravar_completo
+        arquivo, novos, reaproveitados = gravar(temporario, pasta, nome, comprimir)
+    finally:
+        temporario.unlink(missing_ok=True)
+    return arquivo, copia, novos, reaproveitados
+
+
+def verificar(backup):
+    """Reconstrói o backup num arquivo temporário e roda o integrity_check."""
+    backup = Path(backup)
+    temporario = backup.with_name(f'.{backup.name}.verificacao')
+    try:
+        reconstruir(backup, temporario)
+        return os.path.getsize(temporario)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+def rotacionar(pasta=None, manter=None):
+    """
+    Mantém os ``manter`` backups mais novos (0 = todos) e apaga os blocos que
+    nenhum manifesto restante usa. Retorna (backups removidos, blocos removidos).
+    """
+    pasta = Path(pasta or pasta_backups())
+    manter = BACKUP_MANTER if manter is None else manter
+    backups = listar_backups(pasta)
+    removidos = backups[:-manter] if manter and len(backups) > manter else []
+    for arquivo in removidos:
+        arquivo.unlink()
+
+    usados = set()
+    for manifesto in listar_backups(pasta):
+        if manifesto.name.endswith('.json'):
+            dados = json.loads(manifesto.read_text())
+            usados.update(_arquivo_do_bloco(pasta, sha, dados['comprimido']) for sha in dados['blocos'])
+    blocos_removidos = 0
+    if (pasta / 'blocos').is_dir():
+        for arquivo in (pasta / 'blocos').glob('*/*'):
+            if arquivo not in usados:
+                arquivo.unlink()
+                blocos_removidos += 1
+    return removidos, blocos_removidos
+
+
+def restaurar(backup, banco=None):
+    """
+    Substitui o conteúdo do banco pelo do backup (verificado antes) e
+    invalida os caches de todos os workers. Retorna o tamanho restaurado.
+    """
+    from django.core.cache import caches
+
+    from .cache import invalidar_paginas, invalidar_site_config, invalidar_usuarios
+
+    banco = Path(banco or caminho_do_banco())
+    backup = Path(backup)
+    temporario = banco.with_name(f'.{banco.name}.restauracao')
+    try:
+        reconstruir(backup, temporario)
+        origem = sqlite3.connect(temporario)
+        destino = sqlite3.connect(banco, timeout=60)
+        try:
+            # Um passo só: o banco é trocado numa única transação de escrita
+            origem.backup(destino)
+        finally:
+            destino.close()
+            origem.close()
+        tamanho = os.path.getsize(temporario)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+    invalidar_site_config()
+    invalidar_paginas()
+    invalidar_usuarios()
+    if getattr(settings, 'SESSION_CACHE_ALIAS', None) in settings.CACHES:
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+    return tamanho
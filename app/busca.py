@@ -0,0 +1,112 @@
+"""
+Busca de produtos pelo índice FTS5 do SQLite.
+
+A tabela virtual app_produto_fts indexa Produto.nome e Produto.descricao
+(tabela de conteúdo externo: o texto fica só em app_produto). Ela é
+mantida por triggers no próprio banco, criados na migração 0003, então
+também acompanha bulk_create, update() e alterações feitas fora do Django.
+O trigger de UPDATE só olha nome e descrição: baixa de estoque não mexe
+no índice.
+
+O tokenizador unicode61 com remove_diacritics ignora acentos e caixa
+("acessivel" encontra "Acessível"). Cada palavra digitada vira um prefixo
+obrigatório ("note" encontra "Notebook") e o resultado é ordenado por
+bm25, com o nome pesando mais que a descrição.
+
+Em bancos que não são SQLite a busca cai para icontains.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Produto
+from .reservas import com_disponivel, sql_disponivel
+
+TABELA_FTS = 'app_produto_fts'
+
+# Máximo de produtos devolvidos pela busca pública
+BUSCA_MAX_RESULTADOS = getattr(settings, 'BUSCA_MAX_RESULTADOS', 48)
+# Pesos do bm25 por coluna (nome, descricao)
+PESO_NOME = 10.0
+PESO_DESCRICAO = 1.0
+
+# Tabela, triggers e carga inicial do índice. Idempotente: usado pelo
+# comando reindexar_busca para recriar o que estiver faltando.
+SQL_INDICE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        nome, descricao,
+        content='app_produto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON app_produto BEGIN
+        INSERT INTO {TABELA_FTS}(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON app_produto BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome, descricao)
+        VALUES ('delete', old.id, old.nome, old.descricao);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF nome, descricao ON app_produto BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome, descricao)
+        VALUES ('delete', old.id, old.nome, old.descricao);
+        INSERT INTO {TABELA_FTS}(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END""",
+]
+
+_PALAVRA = re.compile(r'\w+')
+
+
+def usa_fts():
+    return connection.vendor == 'sqlite'
+
+
+def consulta_fts(termo):
+    """
+    Converte o texto digitado numa consulta FTS5 segura: só palavras,
+    cada uma entre aspas e como prefixo. Operadores e aspas do usuário
+    são descartados, então a consulta nunca tem erro de sintaxe.
+    """
+    return ' '.join(f'"{palavra}"*' for palavra in _PALAVRA.findall(termo))
+
+
+def filtrar_produtos(queryset, termo):
+    """Restringe ``queryset`` aos produtos que casam com ``termo`` (sem ordenar)."""
+    consulta = consulta_fts(termo)
+    if not consulta:
+        return queryset
+    if not usa_fts():
+        return queryset.filter(Q(nome__icontains=termo) | Q(descricao__icontains=termo))
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s', [consulta])
+    )
+
+
+def buscar_produtos(termo, limite=BUSCA_MAX_RESULTADOS):
+    """
+    Produtos em estoque que casam com ``termo``, do mais ao menos relevante,
+    com o ``disponivel`` (estoque - reservas ativas) anotado.
+    """
+    consulta = consulta_fts(termo)
+    if not consulta:
+        return []
+    if not usa_fts():
+        return list(filtrar_produtos(com_disponivel(Produto.objects.filter(estoque__gt=0)), termo)[:limite])
+    disponivel, parametros = sql_disponivel()
+    return list(Produto.objects.raw(
+        f'SELECT app_produto.*, {disponivel} FROM {TABELA_FTS} '
+        f'JOIN app_produto ON app_produto.id = {TABELA_FTS}.rowid '
+        f'WHERE {TABELA_FTS} MATCH %s AND app_produto.estoque > 0 '
+        f'ORDER BY bm25({TABELA_FTS}, %s, %s) LIMIT %s',
+        [*parametros, consulta, PESO_NOME, PESO_DESCRICAO, limite],
+    ))
+
+
+def reconstruir_indice():
+    """Recria tabela e triggers (se faltarem) e reindexa todos os produtos."""
+    with connection.cursor() as cursor:
+        for sql in SQL_INDICE:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('optimize')")
@@ -0,0 +1,306 @@
+"""
+Caches do site.
+
+1. Configuração do site (model Pagina): cache local (por processo) com TTL
+   explícito, invalidado pelos sinais de post_save/post_delete (depois do
+   commit, para nenhum worker recarregar a versão antiga no meio).
+
+2. Cache de página inteira para visitantes anônimos (cache_pagina_anonima),
+   guardado no cache 'paginas' (locmem, arquivo ou tabela no banco - ver
+   PAGE_CACHE_BACKEND em settings) e invalidado quando qualquer Produto ou
+   Pagina muda, inclusive baixa de estoque por compra.
+
+3. Usuário autenticado (usuario_em_cache): o User de cada sessão logada,
+   guardado no cache 'sessoes' (ver SESSION_BACKEND em settings) e
+   invalidado quando qualquer User é salvo ou apagado.
+
+Como o gunicorn roda vários workers (processos separados), a invalidação
+de um worker precisa chegar aos outros. Para isso usamos "carimbos de
+versão" em arquivo: invalidar atualiza o mtime do arquivo e cada worker
+compara o mtime com o da versão que está em memória (um os.stat, sem
+tocar no banco).
+"""
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+
+from .media import url_versionada
+from .middleware import acarregar_usuario
+from .models import Pagina
+
+# Tempo máximo (segundos) que a configuração fica em memória
+SITE_CONFIG_CACHE_TTL = getattr(settings, 'SITE_CONFIG_CACHE_TTL', 300)
+# Tempo máximo (segundos) de uma página no cache de anônimos
+PAGE_CACHE_TTL = getattr(settings, 'PAGE_CACHE_TTL', 600)
+# Tempo máximo (segundos) do usuário autenticado no cache (0 desliga)
+USUARIO_CACHE_TTL = getattr(settings, 'USUARIO_CACHE_TTL', 300)
+
+CARIMBO_SITE_CONFIG = '.site_config_version'
+CARIMBO_PAGINAS = '.paginas_version'
+CARIMBO_USUARIOS = '.usuarios_version'
+
+# Marcador que ocupa o lugar do token CSRF no HTML guardado em cache
+CSRF_MARCADOR = '__ecocycle_csrf_token__'
+
+_lock = threading.Lock()
+# (pagina, versao, expira_em) - substituído por inteiro para leitura sem lock
+_cache = (None, None, 0.0)
+
+
+def _arquivo_carimbo(nome):
+    """
+    Caminho de um carimbo de versão compartilhado entre os workers.
+    Por padrão fica ao lado do banco SQLite (/data em produção).
+    """
+    pasta = getattr(settings, 'CACHE_STAMP_DIR', None)
+    if not pasta:
+        pasta = Path(settings.DATABASES['default']['NAME']).parent
+    return Path(pasta) / nome
+
+
+def _ler_carimbo(nome):
+    try:
+        return os.stat(_arquivo_carimbo(nome)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _tocar_carimbo(nome):
+    arquivo = _arquivo_carimbo(nome)
+    try:
+        arquivo.touch(exist_ok=True)
+        agora_ns = time.time_ns()
+        os.utime(arquivo, ns=(agora_ns, agora_ns))
+    except OSError:
+        # Sem permissão de escrita: os outros workers ainda
+        # enxergam a mudança quando o TTL expirar.
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Configuração do site
+# ---------------------------------------------------------------------------
+
+def _preparar(pagina):
+    """
+    Pré-calcula as URLs das imagens para que os templates não precisem
+    passar pelo storage a cada renderização.
+    """
+    if pagina is not None:
+        pagina.logo_url = url_versionada(pagina.logo_do_site.name) if pagina.logo_do_site else ''
+        pagina.imagem_sobre_url = url_versionada(pagina.imagem_sobre.name) if pagina.imagem_sobre else ''
+    return pagina
+
+
+def obter_site_config():
+    """
+    Retorna a configuração do site (ou None se não existir),
+    consultando o banco apenas quando o cache expirou ou foi invalidado.
+    """
+    global _cache
+    versao = _ler_carimbo(CARIMBO_SITE_CONFIG)
+    agora = time.monotonic()
+    pagina, versao_cache, expira_em = _cache
+    if versao_cache == versao and agora < expira_em:
+        return pagina
+
+    with _lock:
+        # Outra thread pode ter recarregado enquanto esperávamos o lock
+        pagina, versao_cache, expira_em = _cache
+        if versao_cache == versao and agora < expira_em:
+            return pagina
+        pagina = _preparar(Pagina.objects.first())
+        _cache = (pagina, versao, agora + SITE_CONFIG_CACHE_TTL)
+    return pagina
+
+
+async def aobter_site_config():
+    """
+    obter_site_config para views async: com o cache deste processo válido
+    responde na hora; senão a consulta vai para uma thread (o ORM é síncrono).
+    """
+    pagina, versao_cache, expira_em = _cache
+    if versao_cache == _ler_carimbo(CARIMBO_SITE_CONFIG) and time.monotonic() < expira_em:
+        return pagina
+    return await sync_to_async(obter_site_config)()
+
+
+def invalidar_site_config():
+    """
+    Descarta o cache deste processo e avisa os demais workers
+    atualizando o carimbo de versão.
+    """
+    global _cache
+    _tocar_carimbo(CARIMBO_SITE_CONFIG)
+    with _lock:
+        _cache = (None, None, 0.0)
+
+
+# ---------------------------------------------------------------------------
+# Cache de página inteira (visitantes anônimos)
+# ---------------------------------------------------------------------------
+
+def invalidar_paginas():
+    """
+    Invalida todas as páginas em cache. A versão faz parte da chave,
+    então as entradas antigas simplesmente deixam de ser lidas e
+    expiram sozinhas.
+    """
+    _tocar_carimbo(CARIMBO_PAGINAS)
+
+
+def _chave_pagina(request):
+    caminho = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+    return f'pagina:{_ler_carimbo(CARIMBO_PAGINAS)}:{get_language()}:{caminho}'
+
+
+def _pode_usar_cache(request):
+    # Só GET anônimo e sem mensagens pendentes (ex.: "Mensagem enviada com sucesso!")
+    return (
+        request.method == 'GET'
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def _para_guardar(resposta):
+    """(html, Content-Type) da resposta, ou None se ela não pode ir para o cache."""
+    if resposta.status_code != 200 or resposta.streaming:
+        return None
+    return resposta.content.decode(resposta.charset), resposta['Content-Type']
+
+
+def _servir(request, guardada, estado):
+    html, tipo = guardada
+    resposta = HttpResponse(html.replace(CSRF_MARCADOR, get_token(request)), content_type=tipo)
+    resposta['X-Page-Cache'] = estado
+    return resposta
+
+
+def cache_pagina_anonima(view):
+    """
+    Decorator que guarda o HTML da view para visitantes anônimos.
+
+    A view deve aceitar o argumento ``csrf_token``: quando a resposta vai
+    para o cache, ele vem preenchido com CSRF_MARCADOR e o template o usa no
+    lugar do token real. Ao servir, o marcador é trocado pelo token da
+    requisição atual, então o formulário de contato continua funcionando.
+
+    Aceita views síncronas e async.
+    """
+    if iscoroutinefunction(view):
+        return _cache_pagina_anonima_async(view)
+
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if not _pode_usar_cache(request):
+            return view(request, *args, **kwargs)
+
+        cache = caches['paginas']
+        chave = _chave_pagina(request)
+        guardada = cache.get(chave)
+        if guardada is None:
+            resposta = view(request, *args, csrf_token=CSRF_MARCADOR, **kwargs)
+            guardada = _para_guardar(resposta)
+            if guardada is None:
+                return resposta
+            cache.set(chave, guardada, PAGE_CACHE_TTL)
+            estado = 'MISS'
+        else:
+            estado = 'HIT'
+        return _servir(request, guardada, estado)
+
+    return _view
+
+
+def _cache_pagina_anonima_async(view):
+    @wraps(view)
+    async def _view(request, *args, **kwargs):
+        # Usuário e mensagens (na sessão) carregados pelas APIs async
+        await acarregar_usuario(request)
+        if not _pode_usar_cache(request):
+            return await view(request, *args, **kwargs)
+
+        cache = caches['paginas']
+        # locmem e arquivo respondem na hora; o backend 'db' consulta o banco
+        no_banco = isinstance(cache, DatabaseCache)
+        chave = _chave_pagina(request)
+        guardada = await cache.aget(chave) if no_banco else cache.get(chave)
+        if guardada is None:
+            resposta = await view(request, *args, csrf_token=CSRF_MARCADOR, **kwargs)
+            guardada = _para_guardar(resposta)
+            if guardada is None:
+                return resposta
+            if no_banco:
+                await cache.aset(chave, guardada, PAGE_CACHE_TTL)
+            else:
+                cache.set(chave, guardada, PAGE_CACHE_TTL)
+            estado = 'MISS'
+        else:
+            estado = 'HIT'
+        return _servir(request, guardada, estado)
+
+    return _view
+
+
+# ---------------------------------------------------------------------------
+# Usuário autenticado
+# ---------------------------------------------------------------------------
+
+def _chave_usuario(user_id):
+    return f'usuario:{_ler_carimbo(CARIMBO_USUARIOS)}:{user_id}'
+
+
+def usuario_em_cache(user_id, carregar):
+    """
+    Retorna o usuário ``user_id`` do cache 'sessoes' ou, se não estiver
+    lá, ``carregar(user_id)`` (que pode retornar None), guardando o
+    resultado. A versão do carimbo faz parte da chave, como nas páginas.
+    """
+    if not USUARIO_CACHE_TTL:
+        return carregar(user_id)
+    cache = caches[settings.SESSION_CACHE_ALIAS]
+    chave = _chave_usuario(user_id)
+    usuario = cache.get(chave)
+    if usuario is None:
+        usuario = carregar(user_id)
+        if usuario is not None:
+            cache.set(chave, usuario, USUARIO_CACHE_TTL)
+    return usuario
+
+
+async def ausuario_em_cache(user_id, acarregar):
+    """
+    usuario_em_cache para request.auser(), com ``acarregar`` async. O cache
+    'sessoes' (memória ou arquivo) é lido direto; só a consulta é async.
+    """
+    if not USUARIO_CACHE_TTL:
+        return await acarregar(user_id)
+    cache = caches[settings.SESSION_CACHE_ALIAS]
+    chave = _chave_usuario(user_id)
+    usuario = cache.get(chave)
+    if usuario is None:
+        usuario = await acarregar(user_id)
+        if usuario is not None:
+            cache.set(chave, usuario, USUARIO_CACHE_TTL)
+    return usuario
+
+
+def invalidar_usuarios():
+    """
+    Descarta os usuários em cache de todos os workers (senha, is_active e
+    is_staff mudam com um save, e o hash da senha valida a sessão).
+    """
+    _tocar_carimbo(CARIMBO_USUARIOS)
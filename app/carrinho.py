@@ -0,0 +1,51 @@
+"""
+Carrinho de compras guardado na sessão do usuário.
+
+Formato: request.session['carrinho'] = {"<id do produto>": quantidade}.
+As chaves são strings porque a sessão é serializada em JSON. Preço e
+estoque não ficam na sessão: são lidos do banco ao exibir e ao finalizar.
+"""
+CHAVE_SESSAO = 'carrinho'
+
+
+def itens_do_carrinho(session):
+    """Retorna {produto_id (int): quantidade}."""
+    return {int(produto_id): quantidade for produto_id, quantidade in session.get(CHAVE_SESSAO, {}).items()}
+
+
+def _salvar(session, itens):
+    # Reatribui o dicionário para a sessão perceber a alteração
+    session[CHAVE_SESSAO] = {str(produto_id): quantidade for produto_id, quantidade in itens.items()}
+
+
+def adicionar_ao_carrinho(session, produto_id, quantidade):
+    itens = itens_do_carrinho(session)
+    itens[produto_id] = itens.get(produto_id, 0) + quantidade
+    _salvar(session, itens)
+
+
+def alterar_quantidade(session, produto_id, quantidade):
+    """Define a quantidade de um item; zero (ou menos) remove o item."""
+    itens = itens_do_carrinho(session)
+    if quantidade > 0:
+        itens[produto_id] = quantidade
+    else:
+        itens.pop(produto_id, None)
+    _salvar(session, itens)
+
+
+def remover_inexistentes(session, existentes):
+    """
+    Tira do carrinho os produtos que não estão em ``existentes`` (ids que
+    ainda existem no banco) e retorna os ids removidos.
+    """
+    itens = itens_do_carrinho(session)
+    removidos = [produto_id for produto_id in itens if produto_id not in existentes]
+    if removidos:
+        _salvar(session, {produto_id: quantidade for produto_id, quantidade in itens.items()
+                          if produto_id not in removidos})
+    return removidos
+
+
+def esvaziar_carrinho(session):
+    session.pop(CHAVE_SESSAO, None)
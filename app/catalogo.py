@@ -0,0 +1,212 @@
+"""
+Importação e exportação do catálogo de produtos em CSV ou JSONL
+(comandos import_produtos e export_produtos).
+
+Tudo acontece em fluxo: o arquivo é lido e escrito linha a linha e os
+produtos são gravados em lotes, então a memória usada não depende do
+tamanho do catálogo.
+
+Colunas/chaves: sku, nome, descricao, preco, estoque, foto
+
+- sku é a chave: produto com o mesmo sku é atualizado, senão é criado
+  (bulk_create com update_conflicts, um INSERT ... ON CONFLICT por lote);
+- preco aceita "1299.90" ou "1299,90", com no máximo 2 casas decimais;
+- foto é o nome no storage (como o export escreve) ou, com uma pasta de
+  imagens no import, o caminho de um arquivo local a ser copiado.
+"""
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils._os import safe_join
+from PIL import Image, UnidentifiedImageError
+
+from .imagens import gerar_variantes
+from .media import _hash_conteudo
+from .models import Produto
+
+COLUNAS = ('sku', 'nome', 'descricao', 'preco', 'estoque', 'foto')
+FORMATOS = ('csv', 'jsonl')
+
+_SKU = Produto._meta.get_field('sku')
+_NOME = Produto._meta.get_field('nome')
+_PRECO = Produto._meta.get_field('preco')
+PRECO_MAXIMO = Decimal(10) ** (_PRECO.max_digits - _PRECO.decimal_places) - Decimal('0.01')
+PASTA_FOTOS = Produto._meta.get_field('foto').upload_to
+
+
+class LinhaInvalida(ValueError):
+    """Registro do arquivo que não pode ser importado (a mensagem diz o motivo)."""
+
+
+def formato_do_arquivo(caminho, formato=None):
+    if formato:
+        return formato
+    return 'jsonl' if caminho.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# ---------------------------------------------------------------------------
+# Importação
+# ---------------------------------------------------------------------------
+
+def ler_registros(arquivo, formato, delimitador=','):
+    """
+    Gera (número da linha, registro) a partir de um arquivo texto.
+    Uma linha JSONL inválida é entregue como string, para virar
+    LinhaInvalida na validação sem interromper a leitura.
+    """
+    if formato == 'csv':
+        leitor = csv.DictReader(arquivo, delimiter=delimitador)
+        for registro in leitor:
+            yield leitor.line_num, registro
+        return
+    for numero, linha in enumerate(arquivo, 1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except ValueError:
+            yield numero, linha
+
+
+def _texto(registro, chave):
+    valor = registro.get(chave)
+    return '' if valor is None else str(valor).strip()
+
+
+def validar(registro):
+    """Converte um registro do arquivo nos campos de Produto. Levanta LinhaInvalida."""
+    if not isinstance(registro, dict):
+        raise LinhaInvalida('não é um objeto JSON válido')
+
+    sku = _texto(registro, 'sku')
+    if not sku:
+        raise LinhaInvalida('sku vazio')
+    if len(sku) > _SKU.max_length:
+        raise LinhaInvalida(f'sku com mais de {_SKU.max_length} caracteres')
+
+    nome = _texto(registro, 'nome')
+    if not nome:
+        raise LinhaInvalida('nome vazio')
+    if len(nome) > _NOME.max_length:
+        raise LinhaInvalida(f'nome com mais de {_NOME.max_length} caracteres')
+
+    texto_preco = _texto(registro, 'preco')
+    if ',' in texto_preco and '.' not in texto_preco:
+        texto_preco = texto_preco.replace(',', '.')
+    try:
+        preco = Decimal(texto_preco)
+    except InvalidOperation:
+        raise LinhaInvalida(f'preço inválido: {texto_preco!r}')
+    if not preco.is_finite() or preco < 0 or preco > PRECO_MAXIMO:
+        raise LinhaInvalida(f'preço fora do intervalo 0 a {PRECO_MAXIMO}: {texto_preco}')
+    if preco != preco.quantize(Decimal('0.01')):
+        raise LinhaInvalida(f'preço com mais de 2 casas decimais: {texto_preco}')
+
+    texto_estoque = _texto(registro, 'estoque')
+    try:
+        estoque = int(texto_estoque)
+    except ValueError:
+        raise LinhaInvalida(f'estoque inválido: {texto_estoque!r}')
+    if estoque < 0:
+        raise LinhaInvalida(f'estoque negativo: {estoque}')
+
+    dados = {
+        'sku': sku,
+        'nome': nome,
+        'descricao': _texto(registro, 'descricao'),
+        'preco': preco.quantize(Decimal('0.01')),
+        'estoque': estoque,
+    }
+    if 'foto' in registro:
+        dados['foto'] = _texto(registro, 'foto')
+    return dados
+
+
+def _mesmo_conteudo(origem, destino):
+    """Compara o tamanho (barato) e, só se for igual, o hash do conteúdo."""
+    info_origem, info_destino = os.stat(origem), os.stat(destino)
+    if info_origem.st_size != info_destino.st_size:
+        return False
+    return (
+        _hash_conteudo(origem, info_origem.st_mtime_ns, info_origem.st_size)
+        == _hash_conteudo(destino, info_destino.st_mtime_ns, info_destino.st_size)
+    )
+
+
+def copiar_imagem(pasta, caminho):
+    """
+    Copia uma imagem local para o storage (pasta de fotos dos produtos),
+    gera as variantes do srcset e retorna o nome salvo. Se já existir um
+    arquivo com o mesmo nome e o mesmo conteúdo (tamanho e hash), ele é
+    reaproveitado; com conteúdo diferente, a imagem é salva com outro nome.
+    """
+    try:
+        origem = safe_join(pasta, caminho)
+    except (ValueError, SuspiciousFileOperation):
+        raise LinhaInvalida(f'caminho de imagem inválido: {caminho}')
+    if not os.path.isfile(origem):
+        raise LinhaInvalida(f'imagem não encontrada: {caminho}')
+    try:
+        with Image.open(origem) as imagem:
+            imagem.verify()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        raise LinhaInvalida(f'arquivo não é uma imagem válida: {caminho}')
+
+    destino = f'{PASTA_FOTOS}{os.path.basename(origem)}'
+    if default_storage.exists(destino) and _mesmo_conteudo(origem, default_storage.path(destino)):
+        return destino
+    with open(origem, 'rb') as arquivo:
+        salvo = default_storage.save(destino, File(arquivo))
+    # bulk_create não dispara post_save: gera as variantes aqui
+    gerar_variantes(salvo)
+    return salvo
+
+
+def gravar_lote(lote, com_foto):
+    """
+    Grava um lote ({sku: dados}) numa transação: cria os SKUs novos e
+    atualiza os existentes. Retorna (criados, atualizados).
+    """
+    campos = ['nome', 'descricao', 'preco', 'estoque', 'atualizado_em']
+    if com_foto:
+        campos.append('foto')
+    with transaction.atomic():
+        existentes = set(Produto.objects.filter(sku__in=lote).values_list('sku', flat=True))
+        Produto.objects.bulk_create(
+            [Produto(**dados) for dados in lote.values()],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=campos,
+        )
+    return len(lote) - len(existentes), len(existentes)
+
+
+# ---------------------------------------------------------------------------
+# Exportação
+# ---------------------------------------------------------------------------
+
+def exportar(arquivo, formato, queryset=None, delimitador=','):
+    """Escreve os produtos no arquivo, em ordem de id, sem carregar tudo na memória."""
+    if queryset is None:
+        queryset = Produto.objects.all()
+    linhas = queryset.order_by('pk').values_list(*COLUNAS).iterator(chunk_size=2000)
+
+    total = 0
+    if formato == 'csv':
+        escritor = csv.writer(arquivo, delimiter=delimitador)
+        escritor.writerow(COLUNAS)
+        for linha in linhas:
+            escritor.writerow(['' if valor is None else valor for valor in linha])
+            total += 1
+    else:
+        for linha in linhas:
+            registro = {coluna: ('' if valor is None else valor) for coluna, valor in zip(COLUNAS, linha)}
+            arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+            total += 1
+    return total
@@ -1,12 +1,18 @@
-from .models import Pagina
+from .cache import obter_site_config
+from .instrumentacao import medir
 
 def dados_do_site(request):
     """
     Disponibiliza as configurações da página (logo, nome, etc.)
     para todos os templates do sistema.
     """
-    # Pega a primeira configuração encontrada no banco ou None se não existir
-    pagina = Pagina.objects.first()
-    
+    if hasattr(request, 'site_config'):
+        # View async: já carregada antes do render, que roda no event loop (sem ORM)
+        pagina = request.site_config
+    else:
+        # Pega a configuração do cache (ou do banco, se expirou) ou None se não existir
+        with medir('ctx'):
+            pagina = obter_site_config()
+
     # Retorna um dicionário que será mesclado ao contexto dos templates
-    return {'site_config': pagina}
\ No newline at end of file
+    return {'site_config': pagina}
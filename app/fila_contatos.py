@@ -0,0 +1,214 @@
+"""
+Fila de mensagens do formulário de contato.
+
+O POST do formulário só valida e coloca o Contato numa fila em memória;
+uma thread de gravação por processo esvazia a fila e grava em lotes
+(bulk_create de até CONTATO_LOTE linhas numa transação). Assim, uma
+rajada de spam ocupa o lock de escrita do SQLite uma vez por lote, e não
+uma vez por mensagem, e as compras esperam menos.
+
+- A fila é limitada (CONTATO_FILA_TAMANHO). Cheia, a mensagem é gravada
+  na própria requisição, como antes: nada se perde, a requisição só fica
+  mais lenta (contrapressão). CONTATO_FILA_TAMANHO = 0 desliga a fila.
+- A equipe recebe um e-mail com as mensagens novas, no máximo um a cada
+  CONTATO_EMAIL_INTERVALO segundos (para CONTATO_EMAILS ou, se vazio,
+  para os usuários staff com e-mail).
+- Ao encerrar o processo (atexit), a fila é gravada e o último e-mail é
+  enviado antes de sair.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+from .models import Contato
+
+logger = logging.getLogger('app.contatos')
+
+CONTATO_FILA_TAMANHO = getattr(settings, 'CONTATO_FILA_TAMANHO', 1000)
+CONTATO_LOTE = getattr(settings, 'CONTATO_LOTE', 100)
+CONTATO_EMAIL_INTERVALO = getattr(settings, 'CONTATO_EMAIL_INTERVALO', 60)
+# Tentativas de gravar um lote antes de desistir (e registrar no log)
+TENTATIVAS = 3
+# Mensagens listadas no corpo do e-mail (as demais só entram na contagem)
+MENSAGENS_POR_EMAIL = 20
+
+_FIM = object()
+
+
+def destinatarios():
+    emails = getattr(settings, 'CONTATO_EMAILS', [])
+    if emails:
+        return list(emails)
+    return list(
+        User.objects.filter(is_staff=True, is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+
+
+def notificar(contatos):
+    """Envia à equipe um único e-mail com as mensagens ``contatos``."""
+    para = destinatarios()
+    if not contatos or not para:
+        return
+    linhas = [
+        f'- {contato.nome} <{contato.email}>: {contato.mensagem[:200]}'
+        for contato in contatos[:MENSAGENS_POR_EMAIL]
+    ]
+    if len(contatos) > MENSAGENS_POR_EMAIL:
+        linhas.append(f'... e mais {len(contatos) - MENSAGENS_POR_EMAIL} (veja o admin).')
+    send_mail(
+        f'[EcoCycle] {len(contatos)} nova(s) mensagem(ns) de contato',
+        '\n'.join(linhas),
+        None,
+        para,
+        fail_silently=True,
+    )
+
+
+class FilaContatos:
+    """Fila limitada + thread de gravação em lotes (uma por processo)."""
+
+    def __init__(self, tamanho=None, lote=None, intervalo_email=None):
+        self.tamanho = CONTATO_FILA_TAMANHO if tamanho is None else tamanho
+        self.lote = lote or CONTATO_LOTE
+        self.intervalo_email = CONTATO_EMAIL_INTERVALO if intervalo_email is None else intervalo_email
+        self._lock = threading.Lock()
+        self._a_notificar = []
+        self._iniciar()
+
+    def _iniciar(self):
+        self._fila = queue.Queue(maxsize=self.tamanho)
+        self._thread = None
+        self._pid = os.getpid()
+        self._ultimo_email = float('-inf')
+
+    # -- Requisição ---------------------------------------------------------
+
+    def enviar(self, contato):
+        """
+        Enfileira um Contato ainda não salvo. Retorna True se foi para a
+        fila e False se foi gravado na hora (fila desligada ou cheia).
+        """
+        if self.tamanho > 0:
+            self._garantir_thread()
+            try:
+                self._fila.put_nowait(contato)
+                return True
+            except queue.Full:
+                logger.warning('Fila de contatos cheia: gravando na requisição')
+        contato.save()
+        with self._lock:
+            self._a_notificar.append(contato)
+            sem_thread = not self._thread_viva()
+        if sem_thread:
+            self._enviar_emails(forcar=True)
+        return False
+
+    def _thread_viva(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _garantir_thread(self):
+        if self._thread_viva() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processo filho (fork do gunicorn): a fila e a thread do pai não existem aqui
+                self._iniciar()
+            if not self._thread_viva():
+                # Primeira mensagem, ou a thread anterior morreu: o que ficou na fila segue com a nova
+                self._thread = threading.Thread(target=self._trabalhar, name='fila-contatos', daemon=True)
+                self._thread.start()
+                atexit.unregister(self.encerrar)
+                atexit.register(self.encerrar)
+
+    # -- Thread de gravação ---------------------------------------------------
+
+    def _trabalhar(self):
+        try:
+            while True:
+                try:
+                    primeiro = self._fila.get(timeout=1)
+                except queue.Empty:
+                    self._enviar_emails()
+                    continue
+                lote = [primeiro]
+                # Junta o que já está esperando, até o tamanho do lote
+                while len(lote) < self.lote:
+                    try:
+                        lote.append(self._fila.get_nowait())
+                    except queue.Empty:
+                        break
+                fim = any(item is _FIM for item in lote)
+                contatos = [item for item in lote if item is not _FIM]
+                if contatos:
+                    self._gravar(contatos)
+                self._enviar_emails(forcar=fim)
+                if fim:
+                    return
+        finally:
+            connection.close()
+
+    def _gravar(self, contatos):
+        close_old_connections()
+        for tentativa in range(1, TENTATIVAS + 1):
+            try:
+                with transaction.atomic():
+                    Contato.objects.bulk_create(contatos)
+                break
+            except Exception as erro:
+                # Banco travado vale nova tentativa; qualquer outro erro não passaria na próxima
+                if isinstance(erro, OperationalError) and tentativa < TENTATIVAS:
+                    time.sleep(0.1 * 2 ** tentativa)
+                    continue
+                # Não perde as mensagens: ficam no log para serem recuperadas
+                logger.exception('Não foi possível gravar %d contatos: %s', len(contatos), json.dumps(
+                    [{'nome': c.nome, 'email': c.email, 'mensagem': c.mensagem} for c in contatos],
+                    ensure_ascii=False,
+                ))
+                return
+        with self._lock:
+            self._a_notificar.extend(contatos)
+
+    def _enviar_emails(self, forcar=False):
+        with self._lock:
+            if not self._a_notificar:
+                return
+            if not forcar and time.monotonic() - self._ultimo_email < self.intervalo_email:
+                return
+            contatos, self._a_notificar = self._a_notificar, []
+            self._ultimo_email = time.monotonic()
+        try:
+            notificar(contatos)
+        except Exception:
+            logger.exception('Falha ao notificar a equipe sobre %d contatos', len(contatos))
+
+    # -- Encerramento -------------------------------------------------------
+
+    def encerrar(self, timeout=10):
+        """Grava o que está na fila, envia o último e-mail e para a thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            self._fila.put(_FIM, timeout=timeout)
+        except queue.Full:
+            logger.error('Fila de contatos não esvaziou a tempo no encerramento')
+            return
+        thread.join(timeout)
+        self._thread = None
+
+
+fila = FilaContatos()
+
+
+def enviar_contato(contato):
+    """Ponto de entrada da view: enfileira (ou grava) a mensagem de contato."""
+    return fila.enviar(contato)
@@ -0,0 +1,203 @@
+"""
+Variantes redimensionadas das imagens enviadas (Produto.foto, Pagina.logo_do_site,
+Pagina.imagem_sobre) para uso em srcset.
+
+Para cada largura de IMAGEM_LARGURAS menor que a original são geradas duas
+variantes: WebP e um formato de compatibilidade (JPEG, ou PNG quando a
+imagem tem transparência). Elas ficam em MEDIA_ROOT/variantes/ com o mesmo
+caminho da original, por exemplo:
+
+    produtos/Mac.jpeg -> variantes/produtos/Mac-320w.webp
+                         variantes/produtos/Mac-320w.jpg
+
+As variantes são geradas no upload (sinal post_save) e, para arquivos
+antigos, na primeira vez em que a imagem é renderizada ou pelo comando
+``python manage.py gerar_variantes``.
+
+Gerar uma variante ou calcular o hash da URL (url_versionada) lê o arquivo
+inteiro. As views async chamam apreparar_imagens() antes do render: esse
+trabalho vai para uma thread, e a template tag só encontra caches em memória.
+"""
+import logging
+import os
+import tempfile
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+from .media import url_versionada
+
+logger = logging.getLogger(__name__)
+
+IMAGEM_LARGURAS = tuple(getattr(settings, 'IMAGEM_LARGURAS', (160, 320, 640, 1024)))
+IMAGEM_QUALIDADE = getattr(settings, 'IMAGEM_QUALIDADE', 80)
+PASTA_VARIANTES = 'variantes'
+
+_FORMATOS_PIL = {'webp': 'WEBP', 'jpg': 'JPEG', 'png': 'PNG'}
+_TIPOS_MIME = {'webp': 'image/webp', 'jpg': 'image/jpeg', 'png': 'image/png'}
+
+# Tag EXIF de orientação: 5 a 8 giram a imagem em 90°
+ORIENTACAO = ExifTags.Base.Orientation
+
+
+def caminho_variante(nome, largura, extensao):
+    base, _ = os.path.splitext(nome)
+    return f'{PASTA_VARIANTES}/{base}-{largura}w.{extensao}'
+
+
+def _tem_transparencia(imagem):
+    return imagem.mode in ('RGBA', 'LA') or (imagem.mode == 'P' and 'transparency' in imagem.info)
+
+
+def _salvar_atomico(imagem, destino, extensao):
+    """
+    Grava num arquivo temporário e renomeia, para que nenhum worker
+    sirva uma variante pela metade.
+    """
+    caminho = default_storage.path(destino)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            imagem.save(arquivo, format=_FORMATOS_PIL[extensao], quality=IMAGEM_QUALIDADE, optimize=True)
+        os.chmod(temporario, 0o644)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+
+def _atualizada(destino, mtime_original):
+    """A variante existe e é mais nova que a original?"""
+    try:
+        return os.stat(default_storage.path(destino)).st_mtime_ns >= mtime_original
+    except OSError:
+        return False
+
+
+def gerar_variantes(nome, forcar=False):
+    """
+    Gera as variantes da imagem ``nome`` do storage que faltam ou são mais
+    antigas que a original (todas, com ``forcar``).
+
+    Da original só o cabeçalho é lido (tamanho, orientação, transparência):
+    ela só é decodificada se alguma variante precisar ser gerada. Não há
+    lock: cada variante é gravada num temporário e renomeada, então duas
+    threads (ou workers) com a mesma imagem no máximo repetem o trabalho.
+
+    Retorna (largura_original, variantes), onde variantes é a lista de
+    tuplas (largura, extensao, caminho_no_storage), da menor para a maior.
+    """
+    mtime_original = os.stat(default_storage.path(nome)).st_mtime_ns
+    with default_storage.open(nome, 'rb') as arquivo, Image.open(arquivo) as original:
+        largura_original, altura_original = original.size
+        if original.getexif().get(ORIENTACAO) in (5, 6, 7, 8):
+            largura_original, altura_original = altura_original, largura_original
+        transparente = _tem_transparencia(original)
+        compatibilidade = 'png' if transparente else 'jpg'
+        modo = 'RGBA' if transparente else 'RGB'
+
+        variantes, pendentes = [], []
+        for largura in sorted(IMAGEM_LARGURAS):
+            if largura >= largura_original:
+                break
+            for extensao in ('webp', compatibilidade):
+                destino = caminho_variante(nome, largura, extensao)
+                variantes.append((largura, extensao, destino))
+                if forcar or not _atualizada(destino, mtime_original):
+                    pendentes.append((largura, extensao, destino))
+
+        if pendentes:
+            girada = ImageOps.exif_transpose(original).convert(modo)
+            reduzida = (None, None)
+            for largura, extensao, destino in pendentes:
+                if reduzida[0] != largura:
+                    altura = max(1, round(altura_original * largura / largura_original))
+                    reduzida = (largura, girada.resize((largura, altura), Image.LANCZOS))
+                _salvar_atomico(reduzida[1], destino, extensao)
+    return largura_original, variantes
+
+
+@lru_cache(maxsize=2048)
+def _variantes(nome):
+    # O lru_cache não guarda exceções: só sucessos ficam em memória
+    largura_original, variantes = gerar_variantes(nome)
+    return largura_original, tuple(variantes)
+
+
+def variantes_de(nome):
+    """
+    Variantes de ``nome``, gerando as que faltarem na primeira chamada.
+    O resultado fica em memória: o nome de um upload nunca é reutilizado
+    para outro arquivo (o storage acrescenta um sufixo), então não há o
+    que invalidar. Uma falha (arquivo ainda sendo gravado, disco cheio)
+    retorna (None, ()) e não fica em cache: a próxima chamada tenta de novo.
+    """
+    try:
+        return _variantes(nome)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Não foi possível gerar variantes de %s', nome, exc_info=True)
+        return None, ()
+
+
+def srcsets(arquivo):
+    """
+    Monta os srcset de uma imagem (ImageFieldFile).
+
+    Retorna um dicionário {tipo_mime: 'url 320w, url 640w, original 1200w'};
+    vazio se a imagem não tiver variantes (por exemplo, se já for menor que
+    todas as larguras). A original entra como maior candidata de cada
+    grupo para telas que precisam dela.
+    """
+    if not arquivo:
+        return {}
+    largura_original, variantes = variantes_de(arquivo.name)
+    grupos = {}
+    for largura, extensao, destino in variantes:
+        grupos.setdefault(_TIPOS_MIME[extensao], []).append(f'{url_versionada(destino)} {largura}w')
+    for itens in grupos.values():
+        itens.append(f'{url_versionada(arquivo.name)} {largura_original}w')
+    return {tipo: ', '.join(itens) for tipo, itens in grupos.items()}
+
+
+# Imagens cujas variantes e hashes já estão nos caches deste processo
+_preparadas = set()
+
+
+def preparar_imagens(nomes):
+    """Gera as variantes e calcula os hashes das URLs das imagens ``nomes``."""
+    for nome in nomes:
+        largura_original, variantes = variantes_de(nome)
+        for _, _, destino in variantes:
+            url_versionada(destino)
+        url_versionada(nome)
+        if largura_original is not None:
+            # Depois de uma falha a próxima requisição tenta de novo
+            _preparadas.add(nome)
+
+
+async def apreparar_imagens(nomes):
+    """
+    preparar_imagens para views async, numa thread (fora do event loop).
+    Imagens já preparadas neste processo não custam nada.
+    """
+    faltando = {nome for nome in nomes if nome} - _preparadas
+    if faltando:
+        await sync_to_async(preparar_imagens, thread_sensitive=False)(faltando)
+
+
+def gerar_para_instancia(instancia):
+    """
+    Gera as variantes de todos os ImageField preenchidos de uma instância
+    (usado pelo sinal post_save).
+    """
+    for campo in instancia._meta.fields:
+        if not isinstance(campo, models.ImageField):
+            continue
+        arquivo = getattr(instancia, campo.name)
+        if arquivo:
+            variantes_de(arquivo.name)
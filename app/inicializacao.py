@@ -0,0 +1,173 @@
+"""
+Partida rápida do servidor (máquinas que dormem sem tráfego e acordam a
+cada visita).
+
+O gunicorn.conf.py chama preparar() no processo master, antes de abrir a
+porta e de criar os workers (preload_app):
+
+1. migrar_se_preciso(): em vez de rodar o ``migrate`` completo a cada
+   partida, compara a impressão digital dos arquivos de migração com a
+   gravada no próprio banco (PRAGMA user_version do SQLite). Só migra se
+   ela mudou. Qualquer ``migrate`` feito por outro caminho (inclusive
+   parcial, para trás) apaga a impressão, e a próxima partida confere tudo.
+2. aquecer(): monta o resolver de URLs (importa as views), compila os
+   templates (ficam no cached loader) e carrega a configuração do site e
+   os hashes/variantes das fotos da vitrine, chamando as funções direto.
+   Nenhuma requisição passa pelo Django no master: o test client
+   dispararia os sinais de requisição e deixaria pools de threads do
+   asgiref (e os locks delas) criados antes do fork.
+3. Fecha as conexões com o banco (uma conexão SQLite não pode atravessar o
+   fork) e congela o coletor de lixo: os objetos carregados no master são
+   compartilhados com os workers por copy-on-write, e o gc.freeze() evita
+   que cada coleta nos workers escreva nessas páginas e as duplique.
+"""
+import gc
+import hashlib
+import importlib.util
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+from django.template import engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Migrações
+# ---------------------------------------------------------------------------
+
+def _pastas_de_migracoes():
+    for config in apps.get_app_configs():
+        modulo, _ = MigrationLoader.migrations_module(config.label)
+        try:
+            spec = importlib.util.find_spec(modulo) if modulo else None
+        except ModuleNotFoundError:
+            spec = None
+        if spec is not None and spec.submodule_search_locations:
+            yield config.label, Path(next(iter(spec.submodule_search_locations)))
+
+
+def impressao_digital_migracoes():
+    """
+    Hash (inteiro positivo de 31 bits, o que cabe no user_version) dos nomes
+    e do conteúdo de todos os arquivos de migração dos apps instalados.
+    Lê os arquivos sem importá-los: custa alguns milissegundos.
+    """
+    sha = hashlib.sha256()
+    for label, pasta in sorted(_pastas_de_migracoes()):
+        for arquivo in sorted(pasta.glob('*.py')):
+            sha.update(f'{label}/{arquivo.name}\0'.encode())
+            sha.update(arquivo.read_bytes())
+    return int.from_bytes(sha.digest()[:4], 'big') & 0x7FFFFFFF or 1
+
+
+def _impressao_gravada(conexao):
+    with conexao.cursor() as cursor:
+        cursor.execute('PRAGMA user_version')
+        return cursor.fetchone()[0]
+
+
+def _gravar_impressao(conexao, valor):
+    with conexao.cursor() as cursor:
+        cursor.execute(f'PRAGMA user_version = {int(valor)}')
+
+
+def esquecer_impressao(using=DEFAULT_DB_ALIAS):
+    """Apaga a impressão gravada: a próxima partida confere as migrações."""
+    conexao = connections[using]
+    if conexao.vendor == 'sqlite':
+        _gravar_impressao(conexao, 0)
+
+
+def migrar_se_preciso(using=DEFAULT_DB_ALIAS):
+    """
+    Roda o ``migrate`` só se os arquivos de migração mudaram desde o último
+    (ou se o banco é novo). Retorna True se migrou. Fora do SQLite sempre
+    migra.
+    """
+    from django.core.management import call_command
+
+    conexao = connections[using]
+    impressao = impressao_digital_migracoes()
+    if conexao.vendor == 'sqlite' and _impressao_gravada(conexao) == impressao:
+        return False
+    call_command('migrate', database=using, interactive=False, verbosity=1)
+    if conexao.vendor == 'sqlite':
+        _gravar_impressao(conexao, impressao)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Aquecimento
+# ---------------------------------------------------------------------------
+
+def _compilar_templates():
+    """Carrega todos os templates do projeto (DIRS) no cached loader."""
+    total = 0
+    for backend in engines.all():
+        for pasta in backend.engine.dirs:
+            pasta = Path(pasta)
+            for arquivo in pasta.rglob('*.html'):
+                backend.engine.get_template(arquivo.relative_to(pasta).as_posix())
+                total += 1
+    return total
+
+
+def _carregar_dados():
+    """
+    Configuração do site e fotos da vitrine: o cache da configuração e os
+    hashes/variantes das imagens ficam na memória do master.
+    """
+    from . import imagens
+    from .cache import obter_site_config
+    from .models import Produto
+
+    nomes = list(Produto.objects.filter(estoque__gt=0).values_list('foto', flat=True))
+    pagina = obter_site_config()
+    if pagina is not None:
+        nomes += [pagina.logo_do_site.name, pagina.imagem_sobre.name]
+    imagens.preparar_imagens([nome for nome in nomes if nome])
+
+
+def aquecer():
+    """
+    Deixa prontos URLs, templates, a configuração do site e as imagens da
+    vitrine, sem passar uma requisição pelo Django. Retorna o tempo (ms) de
+    cada etapa.
+    """
+    tempos = {}
+    inicio = time.perf_counter()
+    get_resolver()._populate()  # importa as views e monta as tabelas de URLs
+    tempos['urls'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    _compilar_templates()
+    tempos['templates'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    _carregar_dados()
+    tempos['dados'] = time.perf_counter() - inicio
+    return {etapa: round(duracao * 1000, 1) for etapa, duracao in tempos.items()}
+
+
+def preparar():
+    """Migra se preciso, aquece e deixa o processo pronto para o fork."""
+    inicio = time.perf_counter()
+    migrou = migrar_se_preciso()
+    # Nada do migrate (transação, cursores) segue para o aquecimento
+    connections[DEFAULT_DB_ALIAS].close()
+    tempos = aquecer()
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        'Partida: %s, aquecimento %s, total %.0f ms',
+        'migrações aplicadas' if migrou else 'migrações em dia',
+        ', '.join(f'{etapa} {ms} ms' for etapa, ms in tempos.items()),
+        (time.perf_counter() - inicio) * 1000,
+    )
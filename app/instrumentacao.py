@@ -0,0 +1,297 @@
+"""
+Instrumentação de desempenho por requisição.
+
+O InstrumentacaoMiddleware (app/middleware.py) abre uma Metricas para cada
+requisição e, no final:
+
+- envia o cabeçalho Server-Timing (db, tpl, ctx, hash, total), visível na aba
+  Network do navegador;
+- registra em log estruturado (JSON, logger 'app.requisicoes_lentas') as
+  requisições acima de SLOW_REQUEST_MS;
+- acumula o tempo total por view para o resumo de percentis (p50/p95/p99),
+  lido pelo endpoint /admin/metricas/ e pelo comando `manage.py metricas`.
+
+As fontes de tempo são baratas o suficiente para ficar ligadas em produção:
+um execute_wrapper instalado em toda conexão com o banco (não depende de
+DEBUG; a Metricas da requisição chega a ele por uma ContextVar, inclusive
+nas threads que o ASGI usa para o ORM), o backend de templates
+DjangoTemplatesInstrumentado, o hasher PBKDF2PasswordHasherMedido e o
+context manager medir() para trechos do próprio código.
+
+Cada worker do gunicorn guarda as amostras em memória e as grava
+periodicamente em METRICAS_DIR/metricas-<pid>.json; o resumo junta as
+amostras deste processo com os arquivos dos outros workers. A leitura não
+grava nada, e apaga os arquivos de processos que já terminaram (workers
+reciclados pelo max_requests ou por um restart) e os parados há mais de
+METRICAS_VALIDADE: eles não entram mais nos percentis.
+"""
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger('app.requisicoes_lentas')
+
+# Requisições mais lentas que isso (ms) vão para o log
+SLOW_REQUEST_MS = getattr(settings, 'SLOW_REQUEST_MS', 500)
+# Amostras mantidas por view para o cálculo dos percentis
+METRICAS_AMOSTRAS = getattr(settings, 'METRICAS_AMOSTRAS', 1000)
+# Intervalo (s) entre gravações do arquivo de métricas de cada worker
+METRICAS_INTERVALO = getattr(settings, 'METRICAS_INTERVALO', 30)
+# Arquivos de workers parados há mais tempo que isso (s) são apagados
+METRICAS_VALIDADE = 24 * 60 * 60
+
+_atual = ContextVar('metricas_requisicao', default=None)
+
+
+class Metricas:
+    """Tempos acumulados (em segundos) de uma requisição."""
+    __slots__ = ('inicio', 'consultas', 'tempo_db', 'trechos')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.trechos = {}
+
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def somar(self, nome, duracao):
+        self.trechos[nome] = self.trechos.get(nome, 0.0) + duracao
+
+
+def iniciar():
+    metricas = Metricas()
+    return metricas, _atual.set(metricas)
+
+
+def encerrar(token):
+    _atual.reset(token)
+
+
+@contextmanager
+def medir(nome):
+    """Soma o tempo do bloco ao trecho ``nome`` da requisição atual (se houver)."""
+    metricas = _atual.get()
+    if metricas is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas.somar(nome, time.perf_counter() - inicio)
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper do banco: conta consultas e soma o tempo."""
+    metricas = _atual.get()
+    if metricas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metricas.consultas += 1
+        metricas.tempo_db += time.perf_counter() - inicio
+
+
+def instrumentar_conexao(conexao):
+    """Instala medir_consulta na conexão (uma vez; o sinal se repete a cada reconexão)."""
+    if medir_consulta not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(medir_consulta)
+
+
+def server_timing(metricas, total):
+    partes = [f'db;dur={metricas.tempo_db * 1000:.1f};desc="{metricas.consultas} consultas"']
+    partes += [f'{nome};dur={duracao * 1000:.1f}' for nome, duracao in metricas.trechos.items()]
+    partes.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(partes)
+
+
+def registrar_lenta(request, resposta, view, metricas, total):
+    if total * 1000 < SLOW_REQUEST_MS:
+        return
+    logger.warning(json.dumps({
+        'evento': 'requisicao_lenta',
+        'metodo': request.method,
+        'caminho': request.path,
+        'view': view,
+        'status': resposta.status_code,
+        'total_ms': round(total * 1000, 1),
+        'db_ms': round(metricas.tempo_db * 1000, 1),
+        'consultas': metricas.consultas,
+        **{f'{nome}_ms': round(duracao * 1000, 1) for nome, duracao in metricas.trechos.items()},
+    }, ensure_ascii=False))
+
+
+# ---------------------------------------------------------------------------
+# Resumo por view (percentis)
+# ---------------------------------------------------------------------------
+
+def _pasta_metricas():
+    pasta = getattr(settings, 'METRICAS_DIR', None)
+    if not pasta:
+        pasta = Path(settings.DATABASES['default']['NAME']).parent / 'metricas'
+    return Path(pasta)
+
+
+class ResumoPorView:
+    """Janela das últimas METRICAS_AMOSTRAS durações (ms) de cada view neste processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._amostras = defaultdict(lambda: deque(maxlen=METRICAS_AMOSTRAS))
+        self._ultima_gravacao = time.monotonic()
+
+    def adicionar(self, view, duracao_ms):
+        with self._lock:
+            self._amostras[view].append(duracao_ms)
+            gravar = time.monotonic() - self._ultima_gravacao >= METRICAS_INTERVALO
+            if gravar:
+                self._ultima_gravacao = time.monotonic()
+        if gravar:
+            self.gravar()
+
+    def amostras(self):
+        """Cópia das amostras deste processo: {view: [ms, ...]}."""
+        with self._lock:
+            return {view: list(amostras) for view, amostras in self._amostras.items()}
+
+    def gravar(self):
+        """Grava as amostras deste worker (escrita atômica)."""
+        dados = self.amostras()
+        pasta = _pasta_metricas()
+        try:
+            pasta.mkdir(parents=True, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+            with os.fdopen(fd, 'w') as arquivo:
+                json.dump(dados, arquivo)
+            os.replace(temporario, pasta / f'metricas-{os.getpid()}.json')
+        except OSError:
+            logger.debug('Não foi possível gravar as métricas', exc_info=True)
+
+
+resumo = ResumoPorView()
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método nearest-rank."""
+    if not valores_ordenados:
+        return 0.0
+    # Posição ceil(p/100 * n), contada a partir de 1 (round() arredonda x.5 para o par)
+    indice = max(0, min(len(valores_ordenados) - 1, math.ceil(p * len(valores_ordenados) / 100) - 1))
+    return valores_ordenados[indice]
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Existe, mas é de outro usuário
+        return True
+    return True
+
+
+def _arquivos_dos_workers():
+    """
+    Arquivos de métricas dos outros processos vivos. Apaga os de processos
+    que terminaram e os parados há mais de METRICAS_VALIDADE.
+    """
+    limite = time.time() - METRICAS_VALIDADE
+    for arquivo in _pasta_metricas().glob('metricas-*.json'):
+        try:
+            pid = int(arquivo.stem.removeprefix('metricas-'))
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            # As amostras deste processo vêm da memória, mais novas
+            continue
+        try:
+            if not _processo_vivo(pid) or arquivo.stat().st_mtime < limite:
+                arquivo.unlink(missing_ok=True)
+                continue
+        except OSError:
+            continue
+        yield arquivo
+
+
+def ler_resumo():
+    """
+    Junta as amostras deste processo e dos outros workers e retorna
+    {view: {'n', 'p50', 'p95', 'p99', 'max'}} em ms. Não grava nada
+    (o comando ``metricas`` não deixa arquivo próprio).
+    """
+    amostras = defaultdict(list)
+    for view, valores in resumo.amostras().items():
+        amostras[view].extend(valores)
+    for arquivo in _arquivos_dos_workers():
+        try:
+            with open(arquivo) as conteudo:
+                for view, valores in json.load(conteudo).items():
+                    amostras[view].extend(valores)
+        except (OSError, ValueError):
+            continue
+
+    resultado = {}
+    for view, valores in sorted(amostras.items()):
+        valores.sort()
+        resultado[view] = {
+            'n': len(valores),
+            'p50': round(percentil(valores, 50), 1),
+            'p95': round(percentil(valores, 95), 1),
+            'p99': round(percentil(valores, 99), 1),
+            'max': round(valores[-1], 1),
+        }
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Fontes de tempo: templates e hash de senha
+# ---------------------------------------------------------------------------
+
+class TemplateMedido(Template):
+    def render(self, context=None, request=None):
+        # Inclui os context processors, executados dentro do render
+        with medir('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplatesInstrumentado(DjangoTemplates):
+    """Backend DjangoTemplates que mede o tempo de renderização (trecho 'tpl')."""
+
+    def from_string(self, template_code):
+        return TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateMedido(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class PBKDF2PasswordHasherMedido(PBKDF2PasswordHasher):
+    """
+    PBKDF2 padrão do Django (mesmo algoritmo e formato), medindo o tempo
+    de hash (trecho 'hash'). verify() chama encode(), então medir só
+    encode() cobre login e cadastro.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        with medir('hash'):
+            return super().encode(password, salt, iterations)
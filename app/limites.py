@@ -0,0 +1,107 @@
+"""
+Limite de tentativas (token bucket) para login, cadastro e contato.
+
+Cada POST protegido consome uma ficha de um ou mais baldes: um por IP e,
+no login, um pelo nome de usuário digitado (contra ataques distribuídos a
+uma mesma conta). O balde começa cheio (``tentativas`` fichas) e se
+recompõe aos poucos até ``tentativas`` a cada ``segundos``. Balde vazio =
+resposta 429 com Retry-After, antes de qualquer hash de senha ou acesso
+ao banco: o decorator roda antes da view, usando só o POST e o cache.
+
+Os baldes ficam no cache 'limites' (LIMITES_CACHE_BACKEND). Com 'locmem'
+cada worker tem os seus; com 'file' ou 'db' eles valem para todos os
+workers. A leitura e a gravação do balde não são atômicas: sob
+concorrência o limite é aproximado, o que basta para conter rajadas.
+"""
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+# {nome: {'ip' | 'usuario': (tentativas, segundos)}}
+LIMITES_PADRAO = {
+    'login': {'ip': (20, 60), 'usuario': (5, 300)},
+    'admin_login': {'ip': (10, 60), 'usuario': (5, 300)},
+    'cadastro': {'ip': (5, 3600)},
+    'contato': {'ip': (5, 600)},
+}
+LIMITES = {**LIMITES_PADRAO, **getattr(settings, 'LIMITES', {})}
+LIMITES_ATIVOS = getattr(settings, 'LIMITES_ATIVOS', True)
+# Atrás de um proxy reverso: usa o último IP do X-Forwarded-For (o que o proxy adicionou)
+LIMITES_X_FORWARDED_FOR = getattr(settings, 'LIMITES_X_FORWARDED_FOR', False)
+LIMITES_TEMPLATE = getattr(settings, 'LIMITES_TEMPLATE', '429.html')
+
+
+def ip_do_cliente(request):
+    if LIMITES_X_FORWARDED_FOR:
+        encaminhado = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if encaminhado:
+            return encaminhado.rsplit(',', 1)[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def consumir(chave, tentativas, segundos):
+    """
+    Tira uma ficha do balde ``chave``. Retorna 0 se havia ficha ou os
+    segundos até a próxima ficha, se o balde está vazio.
+    """
+    cache = caches['limites']
+    agora = time.time()
+    fichas, ultimo = cache.get(chave) or (tentativas, agora)
+    fichas = min(tentativas, fichas + (agora - ultimo) * tentativas / segundos)
+    if fichas < 1:
+        return (1 - fichas) * segundos / tentativas
+    # Depois de ``segundos`` sem uso o balde estaria cheio: pode expirar
+    cache.set(chave, (fichas - 1, agora), segundos)
+    return 0
+
+
+def verificar(nome, request):
+    """Consome as fichas do limite ``nome`` para o POST e retorna a espera (0 = liberado)."""
+    espera = 0
+    for tipo, (tentativas, segundos) in LIMITES.get(nome, {}).items():
+        if tipo == 'ip':
+            valor = ip_do_cliente(request)
+        else:
+            valor = request.POST.get('username', '').strip().lower()[:150]
+        if valor:
+            espera = max(espera, consumir(f'{nome}:{tipo}:{valor}', tentativas, segundos))
+    return espera
+
+
+def resposta_429(espera):
+    resposta = HttpResponse(
+        render_to_string(LIMITES_TEMPLATE, {'espera': math.ceil(espera)}), status=429
+    )
+    resposta['Retry-After'] = str(math.ceil(espera))
+    return resposta
+
+
+def limitar(nome):
+    """Decorator: aplica o limite ``nome`` aos POSTs da view (GET não conta)."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def _view_async(request, *args, **kwargs):
+                if LIMITES_ATIVOS and request.method == 'POST':
+                    # O cache 'limites' pode estar no banco ('db'): numa thread
+                    espera = await sync_to_async(verificar)(nome, request)
+                    if espera:
+                        return resposta_429(espera)
+                return await view(request, *args, **kwargs)
+            return _view_async
+
+        @wraps(view)
+        def _view(request, *args, **kwargs):
+            if LIMITES_ATIVOS and request.method == 'POST':
+                espera = verificar(nome, request)
+                if espera:
+                    return resposta_429(espera)
+            return view(request, *args, **kwargs)
+        return _view
+    return decorator
@@ -0,0 +1,64 @@
+"""
+Limpeza em lotes das linhas vencidas (sessões e reservas de estoque).
+
+Cada lote é apagado na sua transação e, entre os lotes, o lock de escrita
+do SQLite fica livre por ``pausa`` segundos: uma compra espera no máximo um
+lote, nunca a limpeza inteira. Usado por app/sessoes.py e app/reservas.py
+e pelos comandos limpar_sessoes e limpar_reservas (ComandoDeLimpeza).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+def apagar_em_lotes(vencidas, lote, pausa):
+    """
+    Apaga as linhas do queryset ``vencidas``, ``lote`` por transação, e
+    retorna quantas foram apagadas. O filtro deve usar um campo indexado:
+    cada lote lê só as chaves que vai apagar.
+    """
+    modelo = vencidas.model
+    apagadas = 0
+    while True:
+        with transaction.atomic():
+            chaves = list(vencidas.values_list('pk', flat=True)[:lote])
+            if chaves:
+                modelo._default_manager.filter(pk__in=chaves).delete()
+        apagadas += len(chaves)
+        if len(chaves) < lote:
+            return apagadas
+        time.sleep(pausa)
+
+
+class ComandoDeLimpeza(BaseCommand):
+    """
+    Base dos comandos de limpeza: roda uma vez ou, com --intervalo, repete
+    até ser interrompido. As subclasses definem ``itens`` (o que é apagado,
+    para as mensagens), ``lote_padrao``/``pausa_padrao`` (nomes dos
+    settings, para a ajuda) e ``limpar(lote, pausa)``.
+    """
+    itens = ''
+    lote_padrao = ''
+    pausa_padrao = ''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, help=f'{self.itens.capitalize()} apagadas por transação (padrão: {self.lote_padrao})',
+        )
+        parser.add_argument('--pausa', type=float, help=f'Segundos entre os lotes (padrão: {self.pausa_padrao})')
+        parser.add_argument('--intervalo', type=int, default=0, help='Repete a cada N segundos (0 = uma vez)')
+
+    def limpar(self, lote, pausa):
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.perf_counter()
+            apagadas = self.limpar(options['lote'], options['pausa'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{apagadas} {self.itens} vencidas apagadas em {time.perf_counter() - inicio:.1f}s.'
+            ))
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
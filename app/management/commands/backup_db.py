@@ -0,0 +1,106 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import backup
+
+
+def _tamanho(bytes_):
+    if bytes_ < 1024 * 1024:
+        return f'{bytes_ / 1024:.1f} KB'
+    return f'{bytes_ / 1024 / 1024:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = (
+        'Backup online do banco SQLite (API de backup, em passos, sem parar as compras), '
+        'completo e comprimido ou incremental por blocos, com verificação de integridade '
+        'e rotação. Também lista, verifica e restaura backups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', help='Pasta dos backups (padrão: BACKUP_DIR ou "backups" ao lado do banco)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Grava só os blocos que mudaram desde os backups anteriores')
+        parser.add_argument('--sem-compressao', action='store_true', help='Não comprime com gzip')
+        parser.add_argument('--paginas', type=int, help='Páginas copiadas por passo (padrão: BACKUP_PAGINAS)')
+        parser.add_argument('--pausa', type=float, help='Segundos entre os passos (padrão: BACKUP_PAUSA)')
+        parser.add_argument('--manter', type=int, help='Backups mantidos pela rotação, 0 = todos (padrão: BACKUP_MANTER)')
+        acoes = parser.add_mutually_exclusive_group()
+        acoes.add_argument('--listar', action='store_true', help='Lista os backups da pasta')
+        acoes.add_argument('--verificar', metavar='BACKUP', help='Reconstrói o backup e roda o integrity_check')
+        acoes.add_argument('--restaurar', metavar='BACKUP', help='Substitui o banco pelo conteúdo do backup')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Não pede confirmação antes de restaurar')
+
+    def handle(self, *args, **options):
+        try:
+            pasta = Path(options['destino']) if options['destino'] else backup.pasta_backups()
+            if options['listar']:
+                return self._listar(pasta)
+            if options['verificar']:
+                return self._verificar(self._localizar(pasta, options['verificar']))
+            if options['restaurar']:
+                return self._restaurar(self._localizar(pasta, options['restaurar']), options['interactive'])
+            self._fazer(pasta, options)
+        except (ValueError, backup.BackupInvalido) as erro:
+            raise CommandError(erro)
+
+    @staticmethod
+    def _localizar(pasta, nome):
+        caminho = Path(nome)
+        if not caminho.exists() and (pasta / nome).exists():
+            caminho = pasta / nome
+        if not caminho.exists():
+            raise CommandError(f'Backup não encontrado: {nome}')
+        return caminho
+
+    def _fazer(self, pasta, options):
+        inicio = time.perf_counter()
+        arquivo, copia, novos, reaproveitados = backup.fazer_backup(
+            pasta, incremental=options['incremental'], comprimir=not options['sem_compressao'],
+            paginas=options['paginas'], pausa=options['pausa'],
+        )
+        self.stdout.write(
+            f'Cópia online: {_tamanho(copia.bytes)} em {copia.segundos:.2f}s '
+            f'({copia.bytes / 1024 / 1024 / max(copia.segundos, 1e-6):.0f} MB/s, {copia.passos} passos); '
+            f'espera máxima de um escritor: {copia.pausa_escritores * 1000:.1f} ms'
+        )
+        if options['incremental']:
+            detalhe = f'{novos} blocos novos, {reaproveitados} reaproveitados'
+        else:
+            detalhe = _tamanho(arquivo.stat().st_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Backup íntegro gravado em {arquivo} ({detalhe}) em {time.perf_counter() - inicio:.1f}s.'
+        ))
+        removidos, blocos = backup.rotacionar(pasta, options['manter'])
+        if removidos or blocos:
+            self.stdout.write(f'Rotação: {len(removidos)} backups e {blocos} blocos sem uso apagados.')
+
+    def _listar(self, pasta):
+        backups = backup.listar_backups(pasta)
+        if not backups:
+            self.stdout.write(f'Nenhum backup em {pasta}.')
+        for arquivo in backups:
+            self.stdout.write(f'{arquivo.name}  {_tamanho(arquivo.stat().st_size)}')
+
+    def _verificar(self, arquivo):
+        tamanho = backup.verificar(arquivo)
+        self.stdout.write(self.style.SUCCESS(f'{arquivo.name}: íntegro ({_tamanho(tamanho)}).'))
+
+    def _restaurar(self, arquivo, interativo):
+        banco = backup.caminho_do_banco()
+        if interativo:
+            resposta = input(
+                f'O conteúdo de {banco} será substituído pelo de {arquivo.name}. '
+                "Digite 'sim' para continuar: "
+            )
+            if resposta != 'sim':
+                self.stdout.write('Restauração cancelada.')
+                return
+        inicio = time.perf_counter()
+        tamanho = backup.restaurar(arquivo, banco)
+        self.stdout.write(self.style.SUCCESS(
+            f'{banco} restaurado de {arquivo.name} ({_tamanho(tamanho)}) em {time.perf_counter() - inicio:.1f}s.'
+        ))
@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.catalogo import FORMATOS, exportar, formato_do_arquivo
+from app.models import Produto
+
+
+class Command(BaseCommand):
+    help = 'Exporta os produtos para CSV ou JSONL (mesmo formato aceito pelo import_produtos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', nargs='?', default='-', help='Caminho do arquivo ou "-" (padrão) para a saída padrão')
+        parser.add_argument('--formato', choices=FORMATOS, help='Padrão: pela extensão (.jsonl) ou csv')
+        parser.add_argument('--delimitador', default=',', help='Separador do CSV (ex.: ";")')
+        parser.add_argument('--em-estoque', action='store_true', help='Só produtos com estoque')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        formato = formato_do_arquivo(caminho, options['formato'])
+        produtos = Produto.objects.filter(estoque__gt=0) if options['em_estoque'] else Produto.objects.all()
+
+        if caminho == '-':
+            exportar(self.stdout, formato, produtos, options['delimitador'])
+            return
+
+        inicio = time.perf_counter()
+        try:
+            with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+                total = exportar(arquivo, formato, produtos, options['delimitador'])
+        except OSError as erro:
+            raise CommandError(f'Não foi possível escrever {caminho}: {erro}')
+
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} produtos exportados para {caminho} em {duracao:.1f}s '
+            f'({total / duracao if duracao else 0:.0f} linhas/s).'
+        ))
@@ -0,0 +1,42 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, UnidentifiedImageError
+
+from app.imagens import PASTA_VARIANTES, gerar_variantes
+
+EXTENSOES = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes redimensionadas (srcset) das imagens já existentes em MEDIA_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcar', action='store_true', help='Regera variantes que já existem')
+
+    def handle(self, *args, **options):
+        raiz = settings.MEDIA_ROOT
+        imagens = erros = variantes = 0
+
+        for pasta, subpastas, arquivos in os.walk(raiz):
+            # Não gera variantes das próprias variantes
+            if os.path.relpath(pasta, raiz) == '.':
+                subpastas[:] = [d for d in subpastas if d != PASTA_VARIANTES]
+            for nome in arquivos:
+                if os.path.splitext(nome)[1].lower() not in EXTENSOES:
+                    continue
+                relativo = os.path.relpath(os.path.join(pasta, nome), raiz).replace(os.sep, '/')
+                try:
+                    _, geradas = gerar_variantes(relativo, forcar=options['forcar'])
+                except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as erro:
+                    erros += 1
+                    self.stderr.write(f'{relativo}: {erro}')
+                    continue
+                imagens += 1
+                variantes += len(geradas)
+                self.stdout.write(f'{relativo}: {len(geradas)} variantes')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{imagens} imagens processadas, {variantes} variantes, {erros} erros.'
+        ))
@@ -0,0 +1,88 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.cache import invalidar_paginas
+from app.catalogo import FORMATOS, LinhaInvalida, copiar_imagem, formato_do_arquivo, gravar_lote, ler_registros, validar
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa produtos de um CSV ou JSONL (colunas sku, nome, descricao, preco, estoque, foto), '
+        'criando ou atualizando pelo sku em lotes. Linhas inválidas são informadas e ignoradas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo ou "-" para a entrada padrão')
+        parser.add_argument('--formato', choices=FORMATOS, help='Padrão: pela extensão (.jsonl) ou csv')
+        parser.add_argument('--delimitador', default=',', help='Separador do CSV (ex.: ";")')
+        parser.add_argument('--lote', type=int, default=1000, help='Produtos por transação')
+        parser.add_argument(
+            '--pasta-imagens',
+            help='Pasta local de onde a coluna foto é copiada para o storage (sem ela, foto é o nome no storage)',
+        )
+        parser.add_argument('--simular', action='store_true', help='Só valida o arquivo, sem gravar nada')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        formato = formato_do_arquivo(caminho, options['formato'])
+        if options['lote'] < 1:
+            raise CommandError('--lote precisa ser maior que zero.')
+
+        try:
+            arquivo = sys.stdin if caminho == '-' else open(caminho, encoding='utf-8-sig', newline='')
+        except OSError as erro:
+            raise CommandError(f'Não foi possível abrir {caminho}: {erro}')
+
+        inicio = time.perf_counter()
+        linhas = criados = atualizados = erros = 0
+        lote, com_foto = {}, False
+
+        def gravar():
+            nonlocal criados, atualizados
+            if lote and not options['simular']:
+                novos, existentes = gravar_lote(lote, com_foto)
+                criados += novos
+                atualizados += existentes
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'{linhas} linhas lidas...')
+            lote.clear()
+
+        try:
+            for numero, registro in ler_registros(arquivo, formato, options['delimitador']):
+                linhas += 1
+                try:
+                    dados = validar(registro)
+                    if dados.get('foto') and options['pasta_imagens'] and not options['simular']:
+                        dados['foto'] = copiar_imagem(options['pasta_imagens'], dados['foto'])
+                except LinhaInvalida as erro:
+                    erros += 1
+                    self.stderr.write(f'Linha {numero}: {erro}')
+                    continue
+
+                # Lotes homogêneos: com e sem a coluna foto não se misturam
+                if lote and ('foto' in dados) != com_foto:
+                    gravar()
+                com_foto = 'foto' in dados
+                # Mesmo sku repetido no lote: vale a última linha
+                lote[dados['sku']] = dados
+                if len(lote) >= options['lote']:
+                    gravar()
+            gravar()
+        finally:
+            if arquivo is not sys.stdin:
+                arquivo.close()
+
+        if criados or atualizados:
+            # bulk_create não dispara sinais: descarta a vitrine em cache
+            invalidar_paginas()
+
+        duracao = time.perf_counter() - inicio
+        resumo = (
+            f'{linhas} linhas em {duracao:.1f}s ({linhas / duracao if duracao else 0:.0f} linhas/s): '
+            f'{criados} criados, {atualizados} atualizados, {erros} com erro.'
+        )
+        if options['simular']:
+            resumo = f'[simulação] {linhas} linhas validadas, {erros} com erro.'
+        self.stdout.write(self.style.SUCCESS(resumo) if not erros else self.style.WARNING(resumo))
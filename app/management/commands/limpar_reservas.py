@@ -0,0 +1,15 @@
+from app.limpeza import ComandoDeLimpeza
+from app.reservas import limpar_expiradas
+
+
+class Command(ComandoDeLimpeza):
+    help = (
+        'Apaga as reservas de estoque vencidas em lotes pequenos (sem segurar o lock de escrita). '
+        'Com --intervalo, repete a limpeza periodicamente até ser interrompido.'
+    )
+    itens = 'reservas'
+    lote_padrao = 'RESERVAS_LOTE'
+    pausa_padrao = 'RESERVAS_PAUSA'
+
+    def limpar(self, lote, pausa):
+        return limpar_expiradas(lote, pausa)
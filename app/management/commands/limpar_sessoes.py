@@ -0,0 +1,23 @@
+from django.conf import settings
+
+from app.limpeza import ComandoDeLimpeza
+from app.sessoes import limpar_expiradas
+
+
+class Command(ComandoDeLimpeza):
+    help = (
+        'Apaga as sessões vencidas do banco em lotes pequenos (sem segurar o lock de escrita). '
+        'Com --intervalo, repete a limpeza periodicamente até ser interrompido.'
+    )
+    itens = 'sessões'
+    lote_padrao = 'SESSOES_LOTE'
+    pausa_padrao = 'SESSOES_PAUSA'
+
+    def limpar(self, lote, pausa):
+        return limpar_expiradas(lote, pausa)
+
+    def handle(self, *args, **options):
+        if settings.SESSION_BACKEND == 'signed_cookies':
+            # Restos de quando as sessões ficavam no banco ainda são apagados
+            self.stdout.write('SESSION_BACKEND=signed_cookies: as sessões novas não ficam no banco.')
+        super().handle(*args, **options)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.instrumentacao import ler_resumo
+
+
+class Command(BaseCommand):
+    help = 'Mostra o resumo de desempenho por view (p50/p95/p99 em ms) de todos os workers.'
+
+    def handle(self, *args, **options):
+        dados = ler_resumo()
+        if not dados:
+            self.stdout.write('Nenhuma amostra registrada ainda.')
+            return
+        self.stdout.write(f'{"view":<30} {"n":>7} {"p50":>9} {"p95":>9} {"p99":>9} {"max":>9}')
+        for view, linha in dados.items():
+            self.stdout.write(
+                f'{view:<30} {linha["n"]:>7} {linha["p50"]:>9} {linha["p95"]:>9} {linha["p99"]:>9} {linha["max"]:>9}'
+            )
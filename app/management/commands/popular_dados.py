@@ -0,0 +1,90 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.agregados import reconstruir
+from app.models import Pagina, Produto, Pedido
+
+SENHA_PADRAO = 'senha-bench-123'
+LOTE = 1000
+
+CATEGORIAS = ['Notebook', 'Smartphone', 'Tablet', 'Monitor', 'Desktop', 'Smartwatch', 'Fone', 'Impressora']
+MARCAS = ['Dell', 'Lenovo', 'Apple', 'Samsung', 'HP', 'Asus', 'Acer', 'Motorola', 'LG', 'Xiaomi']
+GRADES = ['Grade A', 'Grade B', 'Seminovo', 'Vitrine']
+
+
+class Command(BaseCommand):
+    help = 'Gera dados sintéticos (produtos, usuários e pedidos) para testes de carga e benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=2000)
+        parser.add_argument('--usuarios', type=int, default=500)
+        parser.add_argument('--pedidos', type=int, default=20000)
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semente'])
+        inicio = time.perf_counter()
+
+        if not Pagina.objects.exists():
+            Pagina.objects.create(
+                nome_do_site='EcoCycle',
+                texto_chamada='Tecnologia premium. Preço justo. Consciência limpa.',
+                texto_sobre='Eletrônicos corporativos recondicionados com garantia.',
+                endereco='Praia Grande - SP',
+                email='contato@ecocycle.dev',
+                whatsapp='13 99999-9999',
+            )
+
+        produtos = [
+            Produto(
+                nome=f'{aleatorio.choice(CATEGORIAS)} {aleatorio.choice(MARCAS)} {i} - {aleatorio.choice(GRADES)}',
+                estoque=aleatorio.randint(0, 50),
+                preco=Decimal(aleatorio.randint(199, 9999)) + Decimal('0.90'),
+                descricao='Equipamento recondicionado, testado e com garantia de 12 meses. ' * 3,
+            )
+            for i in range(options['produtos'])
+        ]
+        self._em_lotes(Produto, produtos)
+
+        # Um único hash para todos: gerar milhares de PBKDF2 levaria minutos
+        senha = make_password(SENHA_PADRAO)
+        prefixo = f'bench{options["semente"]}_'
+        usuarios = [
+            User(username=f'{prefixo}{i}', email=f'{prefixo}{i}@ecocycle.dev', password=senha)
+            for i in range(options['usuarios'])
+        ]
+        # ignore_conflicts: rodar de novo com a mesma semente reaproveita os usuários
+        self._em_lotes(User, usuarios, ignore_conflicts=True)
+
+        ids_produtos = list(Produto.objects.values_list('id', 'preco'))
+        ids_usuarios = list(User.objects.filter(username__startswith=prefixo).values_list('id', flat=True))
+        pedidos = []
+        if ids_produtos and ids_usuarios:
+            for _ in range(options['pedidos']):
+                produto_id, preco = aleatorio.choice(ids_produtos)
+                quantidade = aleatorio.randint(1, 3)
+                pedidos.append(Pedido(
+                    usuario_id=aleatorio.choice(ids_usuarios),
+                    produto_id=produto_id,
+                    quantidade=quantidade,
+                    total=preco * quantidade,
+                ))
+        self._em_lotes(Pedido, pedidos)
+        # bulk_create não passa pelos sinais: refaz os agregados de vendas
+        reconstruir()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(produtos)} produtos, {len(usuarios)} usuários (senha "{SENHA_PADRAO}") e '
+            f'{len(pedidos)} pedidos em {time.perf_counter() - inicio:.1f}s.'
+        ))
+
+    def _em_lotes(self, modelo, objetos, **opcoes):
+        for i in range(0, len(objetos), LOTE):
+            with transaction.atomic():
+                modelo.objects.bulk_create(objetos[i:i + LOTE], **opcoes)
@@ -0,0 +1,26 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.agregados import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os agregados diários de vendas (por produto e por cliente) a partir dos pedidos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Só refaz a partir desta data (AAAA-MM-DD); padrão: todo o histórico')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f'Data inválida: {options["desde"]!r} (use AAAA-MM-DD)')
+
+        inicio = time.perf_counter()
+        gravadas = reconstruir(desde)
+        resumo = ', '.join(f'{total} em {modelo._meta.verbose_name_plural}' for modelo, total in gravadas.items())
+        self.stdout.write(self.style.SUCCESS(f'Agregados recalculados ({resumo}) em {time.perf_counter() - inicio:.1f}s.'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.busca import reconstruir_indice, usa_fts
+from app.models import Produto
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói o índice de busca FTS5 dos produtos (app_produto_fts). '
+        'Recria tabela e triggers se tiverem sumido (ex.: migração que recriou app_produto).'
+    )
+
+    def handle(self, *args, **options):
+        if not usa_fts():
+            raise CommandError('A busca FTS5 só existe no SQLite; neste banco ela usa icontains.')
+
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de busca reconstruído: {Produto.objects.count()} produtos '
+            f'em {time.perf_counter() - inicio:.1f}s.'
+        ))
@@ -0,0 +1,249 @@
+"""
+Servidor de arquivos de mídia (uploads) para produção.
+
+Substitui django.views.static.serve, que lê o arquivo inteiro numa thread
+do gunicorn sem cabeçalhos de cache. Aqui:
+
+- o arquivo é entregue com FileResponse, que o gunicorn envia com sendfile;
+- ETag/Last-Modified permitem responder 304 a If-None-Match/If-Modified-Since;
+- requisições Range recebem 206 com apenas o trecho pedido;
+- se existir uma versão pré-comprimida (arquivo.br / arquivo.gz) e o cliente
+  aceitar, ela é servida no lugar da original, como faz o WhiteNoise;
+- nomes versionados (arquivo.<hash>.ext, ver url_versionada) são servidos
+  a partir da original e recebem Cache-Control immutable.
+
+No modo ASGI o FileResponse seria lido inteiro para a memória antes do
+envio (o Django não itera arquivos de forma assíncrona): lá o conteúdo sai
+por um gerador async que lê cada bloco numa thread e o entrega ao uvicorn,
+sem prender thread nenhuma enquanto um cliente lento baixa a imagem.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+# Cache para nomes sem hash (podem ser substituídos no admin)
+MEDIA_CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 24 * 60 * 60)
+# Cache para nomes versionados (o conteúdo nunca muda para a mesma URL)
+MEDIA_CACHE_IMUTAVEL = 365 * 24 * 60 * 60
+
+TAMANHO_BLOCO = 64 * 1024
+TAMANHO_HASH = 12
+
+_NOME_VERSIONADO = re.compile(r'^(?P<base>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % TAMANHO_HASH)
+_RANGE = re.compile(r'^bytes=(?P<inicio>\d*)-(?P<fim>\d*)$')
+_PRE_COMPRIMIDOS = (('br', '.br'), ('gzip', '.gz'))
+
+
+@lru_cache(maxsize=4096)
+def _hash_conteudo(caminho, mtime_ns, tamanho):
+    """Hash do conteúdo; mtime/tamanho na chave descartam entradas de arquivos alterados."""
+    md5 = hashlib.md5(usedforsecurity=False)
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            md5.update(bloco)
+    return md5.hexdigest()[:TAMANHO_HASH]
+
+
+def url_versionada(nome):
+    """
+    URL com o hash do conteúdo no nome (ex.: /media/produtos/Mac.3f2a9c1b7d4e.jpeg),
+    que pode ficar em cache por tempo indeterminado no navegador/CDN.
+    Se o arquivo não existir, devolve a URL normal.
+    """
+    try:
+        caminho = default_storage.path(nome)
+        info = os.stat(caminho)
+    except (OSError, NotImplementedError):
+        return default_storage.url(nome)
+    base, ext = os.path.splitext(nome)
+    return default_storage.url(f'{base}.{_hash_conteudo(caminho, info.st_mtime_ns, info.st_size)}{ext}')
+
+
+def _localizar(path):
+    """
+    Resolve o caminho pedido para (caminho_em_disco, stat, imutavel).
+    Levanta Http404 se não houver arquivo correspondente.
+    """
+    try:
+        caminho = safe_join(settings.MEDIA_ROOT, path)
+    except (ValueError, SuspiciousFileOperation):
+        raise Http404('Caminho inválido')
+
+    try:
+        info = os.stat(caminho)
+        if stat.S_ISREG(info.st_mode):
+            return caminho, info, False
+    except OSError:
+        pass
+
+    # arquivo.<hash>.ext -> arquivo.ext, conferindo o hash
+    encontrado = _NOME_VERSIONADO.match(path)
+    if encontrado:
+        original = safe_join(settings.MEDIA_ROOT, encontrado['base'] + encontrado['ext'])
+        try:
+            info = os.stat(original)
+        except OSError:
+            raise Http404('Arquivo não encontrado')
+        if stat.S_ISREG(info.st_mode):
+            # Hash antigo: entrega o conteúdo atual, mas sem marcar como imutável
+            imutavel = _hash_conteudo(original, info.st_mtime_ns, info.st_size) == encontrado['hash']
+            return original, info, imutavel
+    raise Http404('Arquivo não encontrado')
+
+
+def _pre_comprimido(request, caminho):
+    """Retorna (caminho, stat, codificacao) da melhor versão pré-comprimida aceita pelo cliente."""
+    aceitas = request.headers.get('Accept-Encoding', '')
+    for codificacao, sufixo in _PRE_COMPRIMIDOS:
+        if codificacao in aceitas:
+            try:
+                info = os.stat(caminho + sufixo)
+            except OSError:
+                continue
+            return caminho + sufixo, info, codificacao
+    return None
+
+
+def _intervalo(cabecalho, tamanho):
+    """
+    Interpreta um cabeçalho Range com um único intervalo.
+    Retorna (inicio, fim) inclusivo, None para ignorar o cabeçalho
+    (formato não suportado, ex.: múltiplos intervalos) ou False se
+    o intervalo for impossível de atender (416).
+    """
+    encontrado = _RANGE.match(cabecalho.strip())
+    if not encontrado or (not encontrado['inicio'] and not encontrado['fim']):
+        return None
+    if not encontrado['inicio']:
+        # bytes=-N: os últimos N bytes
+        sufixo = int(encontrado['fim'])
+        if sufixo == 0:
+            return False
+        return max(0, tamanho - sufixo), tamanho - 1
+    inicio = int(encontrado['inicio'])
+    fim = int(encontrado['fim']) if encontrado['fim'] else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        return False
+    return inicio, min(fim, tamanho - 1)
+
+
+def _ler_trecho(caminho, inicio, tamanho):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        while tamanho > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, tamanho))
+            if not bloco:
+                break
+            tamanho -= len(bloco)
+            yield bloco
+
+
+async def _ler_trecho_async(caminho, inicio, tamanho):
+    blocos = _ler_trecho(caminho, inicio, tamanho)
+    ler = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (bloco := await ler(blocos, None)) is not None:
+            yield bloco
+    finally:
+        # Cliente desconectou no meio: fecha o arquivo
+        blocos.close()
+
+
+async def blocos_async(arquivo):
+    """Lê um arquivo aberto em blocos, cada leitura numa thread (respostas no ASGI)."""
+    if arquivo is None:
+        # HEAD e 304: resposta sem corpo
+        return
+    ler = sync_to_async(arquivo.read, thread_sensitive=False)
+    while bloco := await ler(TAMANHO_BLOCO):
+        yield bloco
+
+
+def _conteudo(request, caminho, inicio, tamanho):
+    if isinstance(request, ASGIRequest):
+        return _ler_trecho_async(caminho, inicio, tamanho)
+    return _ler_trecho(caminho, inicio, tamanho)
+
+
+def servir_midia(request, path):
+    """
+    View de /media/<path>: ver docstring do módulo.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+
+    caminho, info, imutavel = _localizar(path)
+    tipo, codificacao_original = mimetypes.guess_type(caminho)
+    tipo = tipo or 'application/octet-stream'
+
+    cabecalho_range = request.headers.get('Range')
+    # Versões pré-comprimidas só valem para respostas completas
+    comprimido = None
+    if not cabecalho_range and not codificacao_original:
+        comprimido = _pre_comprimido(request, caminho)
+
+    # Cada representação (original, .br, .gz) tem o seu ETag
+    etag = quote_etag(f'{info.st_mtime_ns:x}-{info.st_size:x}' + (f'-{comprimido[2]}' if comprimido else ''))
+    ultima_modificacao = int(info.st_mtime)
+
+    cabecalhos = {
+        'ETag': etag,
+        'Last-Modified': http_date(ultima_modificacao),
+        'Accept-Ranges': 'bytes',
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': (
+            f'public, max-age={MEDIA_CACHE_IMUTAVEL}, immutable' if imutavel
+            else f'public, max-age={MEDIA_CACHE_MAX_AGE}'
+        ),
+    }
+
+    # 304 para If-None-Match / If-Modified-Since
+    condicional = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if condicional is not None:
+        for nome, valor in cabecalhos.items():
+            condicional.headers[nome] = valor
+        return condicional
+
+    if_range = request.headers.get('If-Range')
+    if cabecalho_range and (not if_range or if_range == etag):
+        intervalo = _intervalo(cabecalho_range, info.st_size)
+        if intervalo is False:
+            resposta = HttpResponse(status=416, headers=cabecalhos)
+            resposta['Content-Range'] = f'bytes */{info.st_size}'
+            return resposta
+        if intervalo is not None:
+            inicio, fim = intervalo
+            tamanho = fim - inicio + 1
+            resposta = StreamingHttpResponse(
+                _conteudo(request, caminho, inicio, tamanho), status=206, content_type=tipo, headers=cabecalhos
+            )
+            resposta['Content-Range'] = f'bytes {inicio}-{fim}/{info.st_size}'
+            resposta['Content-Length'] = str(tamanho)
+            return resposta
+
+    if comprimido:
+        caminho, info, codificacao = comprimido
+        cabecalhos['Content-Encoding'] = codificacao
+
+    if isinstance(request, ASGIRequest):
+        resposta = StreamingHttpResponse(
+            _conteudo(request, caminho, 0, info.st_size), content_type=tipo, headers=cabecalhos
+        )
+        resposta['Content-Length'] = str(info.st_size)
+        return resposta
+
+    # FileResponse usa wsgi.file_wrapper (sendfile no gunicorn) e define Content-Length
+    return FileResponse(open(caminho, 'rb'), content_type=tipo, headers=cabecalhos)
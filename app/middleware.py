@@ -1,46 +1,198 @@
 """
-Middleware para separar autenticação de admin e usuários do site
+Middlewares do app:
+
+- SeparateAdminAuthMiddleware: separa autenticação de admin e usuários do site
+- InstrumentacaoMiddleware: mede tempo, consultas e templates de cada requisição
+- EstaticosMiddleware: WhiteNoise que também roda em modo async
+
+Os três funcionam em WSGI e em ASGI (sync_capable e async_capable, como o
+MiddlewareMixin do Django). Um middleware só síncrono faria o Django, no
+ASGI, rodá-lo numa thread e voltar ao event loop para o resto da cadeia a
+cada requisição.
 """
-from django.contrib.auth import logout
-from django.urls import resolve
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import alogout, logout
+from django.urls import Resolver404, resolve
+from whitenoise.middleware import WhiteNoiseMiddleware
 
+from . import instrumentacao
+from .media import blocos_async
 
-class SeparateAdminAuthMiddleware:
+# Prefixos decididos sem passar pelo resolver de URLs
+PREFIXOS_ADMIN = ('/admin/', '/admin-login/')
+# Mídia e estáticos não são de nenhuma área: as páginas do admin também os carregam
+PREFIXOS_NEUTROS = ('/media/', '/static/')
+
+
+@lru_cache(maxsize=1024)
+def eh_area_admin(path_info):
     """
-    Middleware que mantém sessões separadas entre admin e site.
+    Classifica o caminho como área admin (True), site (False) ou neutro
+    (None: mídia e estáticos, que não derrubam sessão nenhuma).
 
-    - Se o usuário fizer login no admin, não estará logado no site
-    - Se o usuário fizer login no site, não estará logado no admin
+    Os prefixos conhecidos são decididos por comparação de string; só os
+    demais passam pelo resolve(), uma única vez por caminho (o resultado
+    fica num LRU limitado). Caminhos inexistentes (404) são tratados como
+    área do site, em vez de estourar Resolver404 aqui dentro.
+    """
+    if path_info.startswith(PREFIXOS_ADMIN):
+        return True
+    if path_info.startswith(PREFIXOS_NEUTROS):
+        return None
+    try:
+        match = resolve(path_info)
+    except Resolver404:
+        return False
+    return match.url_name == 'admin_login' or match.namespace == 'admin'
+
+
+async def acarregar_usuario(request):
+    """
+    Carrega a sessão e o usuário pelas APIs async do Django e fixa
+    request.user. Views async (e os templates que elas renderizam) leem
+    request.user e request.session de forma síncrona; no event loop essa
+    primeira leitura iria ao banco e o Django a recusaria
+    (SynchronousOnlyOperation). Sem login na sessão não há consulta.
     """
+    await request.session.aget('auth_type')
+    request.user = await request.auser()
+    return request.user
+
+
+class _SyncEAsync:
+    """Base dos middlewares que atendem WSGI e ASGI (como o MiddlewareMixin)."""
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class SeparateAdminAuthMiddleware(_SyncEAsync):
+    """
+    Middleware que mantém sessões separadas entre admin e site.
+
+    - Se o usuário fizer login no admin, não estará logado no site
+    - Se o usuário fizer login no site, não estará logado no admin
+    """
 
     def __call__(self, request):
-        # Identifica se a requisição é para área admin ou site
-        url_name = resolve(request.path_info).url_name
-        url_namespace = resolve(request.path_info).namespace
+        if self.async_mode:
+            return self.__acall__(request)
 
-        is_admin_area = (
-            request.path.startswith('/admin/') or
-            url_name == 'admin_login' or
-            url_namespace == 'admin'
-        )
+        # Identifica se a requisição é para área admin, site ou neutra
+        is_admin_area = eh_area_admin(request.path_info)
 
         # Marca no request se estamos na área admin
-        request.is_admin_area = is_admin_area
+        request.is_admin_area = is_admin_area is True
 
-        # Verifica se há conflito de sessão
-        if request.user.is_authenticated:
+        # Sem cookie de sessão não há login: evita ler sessão/usuário à toa.
+        # Uma imagem ou CSS carregado pelo admin não desloga a sessão do admin.
+        if is_admin_area is not None and settings.SESSION_COOKIE_NAME in request.COOKIES:
             session_type = request.session.get('auth_type', 'site')
+            area = 'admin' if is_admin_area else 'site'
 
-            # Se usuário logado como 'site' tenta acessar admin (ou vice-versa)
-            if is_admin_area and session_type == 'site':
-                # Faz logout automático para evitar conflito
-                logout(request)
-            elif not is_admin_area and session_type == 'admin':
-                # Faz logout automático para evitar conflito
+            # Se usuário logado como 'site' tenta acessar admin (ou vice-versa),
+            # faz logout automático para evitar conflito. O usuário só é
+            # carregado do banco quando há conflito.
+            if session_type != area and request.user.is_authenticated:
                 logout(request)
 
         response = self.get_response(request)
         return response
+
+    async def __acall__(self, request):
+        is_admin_area = eh_area_admin(request.path_info)
+        request.is_admin_area = is_admin_area is True
+
+        if is_admin_area is not None and settings.SESSION_COOKIE_NAME in request.COOKIES:
+            # No event loop o request.user preguiçoso não pode ir ao banco:
+            # com cookie de sessão, o usuário já é carregado aqui
+            user = await acarregar_usuario(request)
+            session_type = await request.session.aget('auth_type', 'site')
+            area = 'admin' if is_admin_area else 'site'
+            if session_type != area and user.is_authenticated:
+                await alogout(request)
+
+        return await self.get_response(request)
+
+
+class InstrumentacaoMiddleware(_SyncEAsync):
+    """
+    Mede cada requisição (consultas ao banco, templates, hash de senha e
+    tempo total) e publica em Server-Timing, no log de requisições lentas
+    e no resumo de percentis por view. Ver app/instrumentacao.py.
+
+    Deve ser o primeiro da lista MIDDLEWARE para medir o tempo total.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        # As consultas chegam à Metricas pelo execute_wrapper de cada
+        # conexão (instrumentacao.instrumentar_conexao), em qualquer thread
+        metricas, token = instrumentacao.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentacao.encerrar(token)
+        return self._publicar(request, response, metricas)
+
+    async def __acall__(self, request):
+        metricas, token = instrumentacao.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentacao.encerrar(token)
+        return self._publicar(request, response, metricas)
+
+    def _publicar(self, request, response, metricas):
+        total = metricas.total()
+        match = request.resolver_match
+        view = match.view_name if match else 'nao_encontrada'
+
+        response['Server-Timing'] = instrumentacao.server_timing(metricas, total)
+        instrumentacao.registrar_lenta(request, response, view, metricas, total)
+        instrumentacao.resumo.adicionar(view, total * 1000)
+        return response
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware que também roda em modo async. O original é só
+    síncrono; aqui a busca do arquivo é a mesma (em memória, ou no disco
+    com autorefresh em DEBUG) e as demais requisições seguem direto para
+    o próximo middleware, sem passar por uma thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            resposta = self.serve(static_file, request)
+            # Um FileResponse síncrono seria lido inteiro para a memória antes do envio
+            resposta.streaming_content = blocos_async(resposta.file_to_stream)
+            return resposta
+        return await self.get_response(request)
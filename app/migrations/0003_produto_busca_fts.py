@@ -0,0 +1,53 @@
+# Índice de busca FTS5 de Produto (nome, descricao) - ver app/busca.py
+
+from django.db import migrations
+
+SQL_CRIAR = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS app_produto_fts USING fts5(
+        nome, descricao,
+        content='app_produto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS app_produto_fts_ai AFTER INSERT ON app_produto BEGIN
+        INSERT INTO app_produto_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS app_produto_fts_ad AFTER DELETE ON app_produto BEGIN
+        INSERT INTO app_produto_fts(app_produto_fts, rowid, nome, descricao)
+        VALUES ('delete', old.id, old.nome, old.descricao);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS app_produto_fts_au AFTER UPDATE OF nome, descricao ON app_produto BEGIN
+        INSERT INTO app_produto_fts(app_produto_fts, rowid, nome, descricao)
+        VALUES ('delete', old.id, old.nome, old.descricao);
+        INSERT INTO app_produto_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END""",
+    # Indexa os produtos que já existem
+    "INSERT INTO app_produto_fts(app_produto_fts) VALUES ('rebuild')",
+]
+
+SQL_REMOVER = [
+    'DROP TRIGGER IF EXISTS app_produto_fts_ai',
+    'DROP TRIGGER IF EXISTS app_produto_fts_ad',
+    'DROP TRIGGER IF EXISTS app_produto_fts_au',
+    'DROP TABLE IF EXISTS app_produto_fts',
+]
+
+
+def _executar(comandos):
+    def operacao(apps, schema_editor):
+        # FTS5 só existe no SQLite; nos outros bancos a busca usa icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in comandos:
+            schema_editor.execute(sql)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_pedido_usuario_data_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(SQL_CRIAR), _executar(SQL_REMOVER)),
+    ]
@@ -0,0 +1,39 @@
+# Adiciona Produto.sku (único, opcional).
+#
+# No SQLite, um AddField com unique=True recria a tabela app_produto
+# (CREATE nova / cópia / DROP / RENAME), o que apagaria os triggers do
+# índice de busca (0003) e copiaria a tabela inteira. Por isso o banco
+# recebe a coluna nula e um índice único separado, e só o estado do
+# Django registra o campo como unique.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_produto_busca_fts'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AddField(
+                    model_name='produto',
+                    name='sku',
+                    field=models.CharField(blank=True, max_length=64, null=True, verbose_name='SKU'),
+                ),
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX app_produto_sku_uniq ON app_produto (sku)',
+                    'DROP INDEX app_produto_sku_uniq',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='produto',
+                    name='sku',
+                    field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='SKU'),
+                ),
+            ],
+        ),
+    ]
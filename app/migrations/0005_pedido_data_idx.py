@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_produto_sku'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['data'], name='pedido_data_idx'),
+        ),
+    ]
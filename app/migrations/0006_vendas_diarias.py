@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def carregar_historico(apps, schema_editor):
+    # Os agregados nascem com os pedidos que já existem
+    from app.agregados import reconstruir
+    reconstruir(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_pedido_data_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiariaProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('co2_kg', models.PositiveIntegerField(default=0, verbose_name='CO₂ evitado (kg)')),
+                ('lixo_kg', models.PositiveIntegerField(default=0, verbose_name='Lixo eletrônico evitado (kg)')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.produto')),
+            ],
+            options={
+                'verbose_name': 'Venda diária por produto',
+                'verbose_name_plural': 'Vendas diárias por produto',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'produto'), name='venda_produto_dia_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendaDiariaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('co2_kg', models.PositiveIntegerField(default=0, verbose_name='CO₂ evitado (kg)')),
+                ('lixo_kg', models.PositiveIntegerField(default=0, verbose_name='Lixo eletrônico evitado (kg)')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Venda diária por cliente',
+                'verbose_name_plural': 'Vendas diárias por cliente',
+                'indexes': [models.Index(fields=['dia'], name='venda_usuario_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'dia'), name='venda_usuario_dia_uniq')],
+            },
+        ),
+        migrations.RunPython(carregar_historico, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_vendas_diarias'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField(default=1)),
+                ('expira_em', models.DateTimeField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='app.produto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produto', 'expira_em', 'quantidade'], name='reserva_produto_expira_idx'), models.Index(fields=['expira_em'], name='reserva_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'produto'), name='reserva_usuario_produto_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_reservas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contato',
+            index=models.Index(fields=['criado_em'], name='contato_criado_em_idx'),
+        ),
+    ]
@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+# Estimativas de impacto usadas no perfil do cliente (por pedido)
+ECONOMIA_POR_PEDIDO = 70      # % economizado em relação a um produto novo
+CO2_POR_PEDIDO_KG = 150       # kg de CO₂ evitados
+LIXO_POR_UNIDADE_KG = 2       # kg de lixo eletrônico evitados por aparelho recondicionado
+
 class Pagina(models.Model):
     nome_do_site = models.CharField(max_length=100)
     logo_do_site = models.ImageField(upload_to='site/', blank=True, null=True)
@@ -21,6 +26,8 @@ class Pagina(models.Model):
         verbose_name_plural = "Configurações da Página"
 
 class Produto(models.Model):
+    # Código do fornecedor; chave do import_produtos/export_produtos
+    sku = models.CharField('SKU', max_length=64, unique=True, null=True, blank=True)
     nome = models.CharField(max_length=100)
     estoque = models.IntegerField()
     preco = models.DecimalField(max_digits=10, decimal_places=2)
@@ -41,6 +48,12 @@ class Contato(models.Model):
     def __str__(self):
         return f"Mensagem de {self.nome}"
 
+    class Meta:
+        indexes = [
+            # Export por período (export_relatorio contatos --desde/--ate)
+            models.Index(fields=['criado_em'], name='contato_criado_em_idx'),
+        ]
+
 class Pedido(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
@@ -50,3 +63,87 @@ class Pedido(models.Model):
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.usuario.username}"
+
+    class Meta:
+        indexes = [
+            # Histórico do perfil: filtra por usuário e pagina por (data, id)
+            models.Index(fields=['usuario', '-data', '-id'], name='pedido_usuario_data_idx'),
+            # Relatórios e date_hierarchy do admin: filtram só por data
+            models.Index(fields=['data'], name='pedido_data_idx'),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Agregados diários de vendas (ver app/agregados.py)
+# ---------------------------------------------------------------------------
+
+class VendaDiaria(models.Model):
+    """Totais de um dia; mantidos a cada pedido e refeitos por reconstruir_agregados."""
+    dia = models.DateField()
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    co2_kg = models.PositiveIntegerField('CO₂ evitado (kg)', default=0)
+    lixo_kg = models.PositiveIntegerField('Lixo eletrônico evitado (kg)', default=0)
+
+    class Meta:
+        abstract = True
+
+class VendaDiariaProduto(VendaDiaria):
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self):
+        return f"{self.produto_id} em {self.dia}"
+
+    class Meta:
+        verbose_name = "Venda diária por produto"
+        verbose_name_plural = "Vendas diárias por produto"
+        constraints = [
+            # Também serve de índice para o painel, que filtra por período
+            models.UniqueConstraint(fields=['dia', 'produto'], name='venda_produto_dia_uniq'),
+        ]
+
+class VendaDiariaUsuario(VendaDiaria):
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self):
+        return f"{self.usuario_id} em {self.dia}"
+
+    class Meta:
+        verbose_name = "Venda diária por cliente"
+        verbose_name_plural = "Vendas diárias por cliente"
+        constraints = [
+            # Resumo do perfil: filtra por usuário
+            models.UniqueConstraint(fields=['usuario', 'dia'], name='venda_usuario_dia_uniq'),
+        ]
+        indexes = [
+            # Maiores clientes do período no painel
+            models.Index(fields=['dia'], name='venda_usuario_dia_idx'),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Reservas de estoque da página de compra (ver app/reservas.py)
+# ---------------------------------------------------------------------------
+
+class Reserva(models.Model):
+    """Unidades seguradas para um usuário enquanto ele decide a compra."""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='reservas')
+    quantidade = models.PositiveIntegerField(default=1)
+    expira_em = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.quantidade}x {self.produto_id} para {self.usuario_id} até {self.expira_em}"
+
+    class Meta:
+        constraints = [
+            # Uma reserva por usuário e produto: reabrir a página só a renova
+            models.UniqueConstraint(fields=['usuario', 'produto'], name='reserva_usuario_produto_uniq'),
+        ]
+        indexes = [
+            # Reservado por produto: a soma sai só do índice, sem ler a tabela
+            models.Index(fields=['produto', 'expira_em', 'quantidade'], name='reserva_produto_expira_idx'),
+            # Limpeza das vencidas
+            models.Index(fields=['expira_em'], name='reserva_expira_idx'),
+        ]
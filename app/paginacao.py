@@ -0,0 +1,71 @@
+"""
+Paginação por cursor (keyset).
+
+Em vez de OFFSET (que obriga o banco a percorrer todas as linhas das
+páginas anteriores), a próxima página é pedida a partir do último item
+visto: WHERE (campo, id) < (valor, pk). Com um índice em (campo, id) o
+custo da página N é o mesmo da página 1.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def codificar_cursor(valor, pk):
+    bruto = f'{valor.isoformat() if hasattr(valor, "isoformat") else valor}|{pk}'
+    return urlsafe_base64_encode(bruto.encode())
+
+
+def decodificar_cursor(queryset, campo, cursor):
+    """
+    Converte o cursor da URL em (valor, pk) já no tipo do campo.
+    Cursor ausente ou inválido retorna None (primeira página).
+    """
+    if not cursor:
+        return None
+    try:
+        valor, pk = urlsafe_base64_decode(cursor).decode().rsplit('|', 1)
+        valor = queryset.model._meta.get_field(campo).to_python(valor)
+        return valor, int(pk)
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _a_partir_do_cursor(queryset, campo, cursor):
+    queryset = queryset.order_by(f'-{campo}', '-id')
+    posicao = decodificar_cursor(queryset, campo, cursor)
+    if posicao is not None:
+        valor, pk = posicao
+        queryset = queryset.filter(Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'id__lt': pk}))
+    return queryset
+
+
+def _separar_proximo(itens, campo, tamanho):
+    proximo = None
+    if len(itens) > tamanho:
+        itens = itens[:tamanho]
+        ultimo = itens[-1]
+        if isinstance(ultimo, dict):
+            proximo = codificar_cursor(ultimo[campo], ultimo['id'])
+        else:
+            proximo = codificar_cursor(getattr(ultimo, campo), ultimo.pk)
+    return itens, proximo
+
+
+def paginar_por_cursor(queryset, campo, cursor=None, tamanho=20):
+    """
+    Retorna (itens, proximo_cursor) em ordem decrescente de (campo, id).
+
+    Funciona com querysets de instâncias ou de .values() (desde que
+    'campo' e 'id' estejam entre os valores). proximo_cursor é None
+    na última página.
+    """
+    queryset = _a_partir_do_cursor(queryset, campo, cursor)
+    # Busca um item a mais só para saber se existe próxima página
+    return _separar_proximo(list(queryset[:tamanho + 1]), campo, tamanho)
+
+
+async def apaginar_por_cursor(queryset, campo, cursor=None, tamanho=20):
+    """paginar_por_cursor para views async: a mesma consulta, pelo ORM async."""
+    queryset = _a_partir_do_cursor(queryset, campo, cursor)
+    return _separar_proximo([item async for item in queryset[:tamanho + 1]], campo, tamanho)
@@ -0,0 +1,109 @@
+"""
+Relatórios CSV de pedidos e contatos (ações do admin e comando
+export_relatorio).
+
+As linhas saem direto do cursor do banco (values_list + iterator) e são
+entregues aos poucos (StreamingHttpResponse ou arquivo), então a memória
+usada é a mesma para mil ou para um milhão de pedidos. Os JOINs com
+usuário e produto ficam no próprio SELECT.
+
+No modo ASGI a resposta precisa de um iterador async: com um gerador
+síncrono o Django leria tudo com sync_to_async(list) antes do primeiro
+byte. linhas_csv_async lê TAMANHO_BLOCO linhas por vez na thread do ORM
+da requisição (a mesma do cursor).
+"""
+import csv
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Contato, Pedido
+
+# Linhas lidas do banco por vez
+TAMANHO_BLOCO = 2000
+# BOM para o Excel reconhecer o arquivo como UTF-8 (acentos)
+BOM = '\ufeff'
+# Começos de célula que o Excel e o LibreOffice tratam como fórmula
+INICIO_DE_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+# (cabeçalho, campo) de cada relatório
+COLUNAS_PEDIDOS = (
+    ('Pedido', 'id'),
+    ('Data', 'data'),
+    ('Usuário', 'usuario__username'),
+    ('E-mail', 'usuario__email'),
+    ('Produto', 'produto__nome'),
+    ('SKU', 'produto__sku'),
+    ('Quantidade', 'quantidade'),
+    ('Total', 'total'),
+)
+COLUNAS_CONTATOS = (
+    ('Contato', 'id'),
+    ('Data', 'criado_em'),
+    ('Nome', 'nome'),
+    ('E-mail', 'email'),
+    ('Mensagem', 'mensagem'),
+)
+
+RELATORIOS = {
+    'pedidos': (Pedido, COLUNAS_PEDIDOS, 'data'),
+    'contatos': (Contato, COLUNAS_CONTATOS, 'criado_em'),
+}
+
+
+class _Eco:
+    """"Arquivo" que devolve o que recebe, para o csv.writer gerar strings."""
+
+    def write(self, valor):
+        return valor
+
+
+def _formatar(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, str) and valor.startswith(INICIO_DE_FORMULA):
+        # Texto vindo do site (nome e mensagem do contato, nome do usuário):
+        # com o apóstrofo a planilha o mostra como texto, sem executar
+        return "'" + valor
+    return valor
+
+
+def linhas_csv(queryset, colunas):
+    """Gera o CSV linha a linha (cabeçalho primeiro), já como texto."""
+    escritor = csv.writer(_Eco())
+    yield BOM + escritor.writerow([cabecalho for cabecalho, _ in colunas])
+    campos = [campo for _, campo in colunas]
+    for linha in queryset.values_list(*campos).iterator(chunk_size=TAMANHO_BLOCO):
+        yield escritor.writerow([_formatar(valor) for valor in linha])
+
+
+async def linhas_csv_async(queryset, colunas):
+    """linhas_csv para o ASGI: blocos de TAMANHO_BLOCO linhas, cada um lido numa thread."""
+    linhas = linhas_csv(queryset, colunas)
+    # thread_sensitive (padrão): todos os blocos na mesma thread, a dona do cursor
+    proximo_bloco = sync_to_async(lambda: ''.join(islice(linhas, TAMANHO_BLOCO)))
+    try:
+        while bloco := await proximo_bloco():
+            yield bloco
+    finally:
+        await sync_to_async(linhas.close)()
+
+
+def resposta_csv(request, queryset, colunas, nome_arquivo):
+    if isinstance(request, ASGIRequest):
+        conteudo = linhas_csv_async(queryset, colunas)
+    else:
+        conteudo = linhas_csv(queryset, colunas)
+    resposta = StreamingHttpResponse(conteudo, content_type='text/csv; charset=utf-8')
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return resposta
+
+
+def nome_do_arquivo(relatorio):
+    return f'{relatorio}-{timezone.localdate():%Y%m%d}.csv'
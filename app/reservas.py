@@ -0,0 +1,162 @@
+"""
+Reservas de estoque da página de compra.
+
+Ao abrir /comprar/<id>/, o usuário logado ganha uma reserva de uma unidade
+que vale RESERVA_MINUTOS (ver reservar()). Reabrir a página não estica o
+prazo. Enquanto a reserva vale, essa unidade não é vendida a outro
+cliente. realizar_compra e finalizar_compra (app/services.py) só debitam
+se o estoque, menos as reservas ativas dos outros usuários, cobre a
+quantidade. A compra converte a reserva do próprio usuário em Pedido e a
+apaga na mesma transação. Numa venda relâmpago, quem fica sem unidade
+descobre isso ao abrir a página, e não depois de preencher tudo.
+
+Uma reserva vencida não conta em lugar nenhum, porque todas as consultas
+filtram expira_em > agora. Por isso a limpeza não tem pressa: cada reserva
+gravada apaga junto até RESERVAS_VARREDURA vencidas (ver reservar()). Como
+cada reserva cria no máximo uma linha, as vencidas não se acumulam mesmo
+sem nenhum processo agendado. limpar_expiradas() apaga todas em lotes
+(apagar_em_lotes, em app/limpeza.py, como a limpeza das sessões), pelo
+comando limpar_reservas, para quem quiser zerar a tabela de uma vez.
+
+O disponível (estoque menos reservado) vem de com_disponivel(), na mesma
+consulta da lista: é uma subconsulta correlacionada que o SQLite responde
+só pelo índice reserva_produto_expira_idx (produto, expira_em, quantidade).
+
+O card da vitrine (cache de página) só mostra o número quando restam menos
+de RESERVA_AVISO_ESTOQUE unidades. Por isso uma reserva só descarta o cache
+quando deixa o produto nessa faixa.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidar_paginas
+from .limpeza import apagar_em_lotes
+from .models import Produto, Reserva
+
+# Duração de uma reserva (minutos)
+RESERVA_MINUTOS = getattr(settings, 'RESERVA_MINUTOS', 5)
+# Abaixo deste disponível a vitrine mostra "últimas N unidades"
+RESERVA_AVISO_ESTOQUE = getattr(settings, 'RESERVA_AVISO_ESTOQUE', 5)
+# Reservas vencidas apagadas por transação e pausa (segundos) entre os lotes
+RESERVAS_LOTE = getattr(settings, 'RESERVAS_LOTE', 500)
+RESERVAS_PAUSA = getattr(settings, 'RESERVAS_PAUSA', 0.05)
+# Reservas vencidas apagadas a cada reserva gravada (0 = só pelo comando)
+RESERVAS_VARREDURA = getattr(settings, 'RESERVAS_VARREDURA', 20)
+
+
+def reservado(produto=OuterRef('pk'), agora=None, exceto=None):
+    """
+    Expressão com as unidades em reservas ativas do produto (id ou
+    OuterRef), 0 se não houver nenhuma. ``exceto`` deixa de fora as
+    reservas de um usuário, que não disputam com ele mesmo.
+    """
+    reservas = Reserva.objects.filter(produto=produto, expira_em__gt=agora or timezone.now())
+    if exceto is not None:
+        reservas = reservas.exclude(usuario=exceto)
+    total = reservas.values('produto').annotate(total=Sum('quantidade')).values('total')
+    return Coalesce(Subquery(total), 0)
+
+
+def com_disponivel(queryset, agora=None, exceto=None):
+    """Anota ``disponivel`` (estoque - reservas ativas) em cada produto do queryset."""
+    return queryset.annotate(disponivel=F('estoque') - reservado(agora=agora, exceto=exceto))
+
+
+def sql_disponivel(agora=None):
+    """
+    Coluna ``disponivel`` para SQL cru sobre app_produto (a busca FTS5).
+    Retorna (sql, parâmetros).
+    """
+    agora = connection.ops.adapt_datetimefield_value(agora or timezone.now())
+    return (
+        f'app_produto.estoque - COALESCE((SELECT SUM(r.quantidade) FROM {Reserva._meta.db_table} r '
+        f'WHERE r.produto_id = app_produto.id AND r.expira_em > %s), 0) AS disponivel',
+        [agora],
+    )
+
+
+def _sql_reservar():
+    reserva, produto = Reserva._meta.db_table, Produto._meta.db_table
+    # Só insere se o estoque menos as reservas ativas dos outros cobre a
+    # quantidade. A reserva vencida do próprio usuário é renovada; a ativa
+    # fica como está (reabrir a página não estica o prazo)
+    return (
+        f'INSERT INTO {reserva} (usuario_id, produto_id, quantidade, expira_em) '
+        f'SELECT %s, %s, %s, %s WHERE '
+        f'(SELECT estoque FROM {produto} WHERE id = %s) - COALESCE((SELECT SUM(quantidade) FROM {reserva} '
+        f'WHERE produto_id = %s AND expira_em > %s AND usuario_id != %s), 0) >= %s '
+        f'ON CONFLICT (usuario_id, produto_id) DO UPDATE SET '
+        f'quantidade = excluded.quantidade, expira_em = excluded.expira_em '
+        f'WHERE {reserva}.expira_em <= %s'
+    )
+
+
+def _sql_varrer():
+    reserva = Reserva._meta.db_table
+    # Pelo índice reserva_expira_idx: lê só os ids que vai apagar
+    return (
+        f'DELETE FROM {reserva} WHERE id IN '
+        f'(SELECT id FROM {reserva} WHERE expira_em <= %s ORDER BY expira_em LIMIT %s)'
+    )
+
+
+def reservar(usuario, produto_id, quantidade=1):
+    """
+    Reserva ``quantidade`` unidades do produto para o usuário por
+    RESERVA_MINUTOS, se as reservas ativas dos outros deixarem, e retorna
+    o Produto com ``disponivel`` (o quanto este usuário pode comprar, sem
+    contar a própria reserva) e ``reserva_ate`` (fim da reserva dele ou
+    None). Levanta Produto.DoesNotExist.
+
+    São duas consultas e nenhuma transação: a conferência e a gravação são
+    um único INSERT ... ON CONFLICT, e no SQLite um comando de escrita já
+    enxerga o último estado e segura o lock até o fim. Duas reservas
+    simultâneas não levam a mesma unidade.
+
+    Quando grava, apaga também até RESERVAS_VARREDURA reservas vencidas (de
+    qualquer produto), num DELETE limitado. Quem só consulta um produto
+    esgotado não escreve nada.
+    """
+    agora = timezone.now()
+    valor = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.execute(_sql_reservar(), [
+            usuario.pk, produto_id, quantidade, valor(agora + timedelta(minutes=RESERVA_MINUTOS)),
+            produto_id, produto_id, valor(agora), usuario.pk, quantidade, valor(agora),
+        ])
+        reservou = cursor.rowcount > 0
+        if reservou and RESERVAS_VARREDURA:
+            # Vencidas não contam em consulta nenhuma: apagá-las não muda a
+            # vitrine e não descarta o cache de página
+            cursor.execute(_sql_varrer(), [valor(agora), RESERVAS_VARREDURA])
+    produto = com_disponivel(Produto.objects.filter(pk=produto_id), agora=agora, exceto=usuario).annotate(
+        reserva_ate=Subquery(
+            Reserva.objects.filter(produto=OuterRef('pk'), usuario=usuario, expira_em__gt=agora).values('expira_em')
+        ),
+    ).get()
+    if reservou and produto.disponivel - quantidade < RESERVA_AVISO_ESTOQUE:
+        # O card da vitrine mostra o disponível nessa faixa
+        transaction.on_commit(invalidar_paginas)
+    return produto
+
+
+def limpar_expiradas(lote=None, pausa=None):
+    """
+    Apaga as reservas vencidas, ``lote`` por transação, e retorna quantas
+    foram apagadas. Entre os lotes o lock fica livre por ``pausa`` segundos.
+    """
+    # expira_em é indexado: cada lote lê só os ids que vai apagar
+    apagadas = apagar_em_lotes(
+        Reserva.objects.filter(expira_em__lte=timezone.now()),
+        lote or RESERVAS_LOTE,
+        RESERVAS_PAUSA if pausa is None else pausa,
+    )
+    if apagadas:
+        # A vitrine pode estar mostrando como reservadas unidades que voltaram
+        invalidar_paginas()
+    return apagadas
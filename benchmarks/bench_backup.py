@@ -0,0 +1,182 @@
+"""
+Benchmark do backup online (app/backup.py) com compras acontecendo.
+
+Num banco temporário populado (popular_dados), threads escritoras fazem
+"compras" a --taxa por segundo (BEGIN IMMEDIATE, UPDATE do estoque e
+COMMIT, como realizar_compra) enquanto o banco é copiado de cada jeito:
+
+- cópia do arquivo: shutil.copyfile do db.sqlite3 (o que se fazia à mão).
+  Não leva o que ainda está no -wal, e a cópia pode sair rasgada
+- backup em passos sem retrato: a API de backup em passos, sem a
+  transação de leitura. Cada compra no meio faz a cópia recomeçar (limitada
+  a --max-passos)
+- backup_db: copiar_online() com o retrato fixo, em passos com pausa
+
+Para cada um mostra o tempo e a vazão da cópia, se ela terminou e passou
+no integrity_check, se o estoque somado da cópia é o de algum momento da
+cópia (cada compra tira 1), e a latência das compras durante a cópia
+(p50/p99/máx), com a espera máxima medida pela sonda de escritores.
+
+Uso:
+    python benchmarks/bench_backup.py [--pedidos 300000] [--taxa 200]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from _django import configurar_django
+from carga import percentil
+
+
+class Compras:
+    """Threads que fazem compras (UPDATE de estoque) a uma taxa fixa e medem a latência."""
+
+    def __init__(self, banco, taxa, threads=2):
+        self.banco = banco
+        self.intervalo = threads / taxa
+        self.latencias = []
+        self.feitas = 0
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._threads = [threading.Thread(target=self._comprar, args=(i,), daemon=True) for i in range(threads)]
+
+    def _comprar(self, indice):
+        conexao = sqlite3.connect(self.banco, timeout=60, isolation_level=None)
+        # Como as conexões do Django (Projeto/sqlite.py)
+        conexao.execute('PRAGMA synchronous=NORMAL')
+        produto = indice + 1
+        proxima = time.perf_counter()
+        while not self._parar.is_set():
+            inicio = time.perf_counter()
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.execute('UPDATE app_produto SET estoque = estoque - 1 WHERE id = ?', (produto,))
+            conexao.execute('COMMIT')
+            with self._lock:
+                self.latencias.append((time.perf_counter() - inicio) * 1000)
+                self.feitas += 1
+            proxima += self.intervalo
+            time.sleep(max(0, proxima - time.perf_counter()))
+        conexao.close()
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def copia_do_arquivo(banco, destino, max_passos):
+    shutil.copyfile(banco, destino)
+    return 'ok'
+
+
+def passos_sem_retrato(banco, destino, max_passos):
+    passos = 0
+
+    def progresso(status, restantes, total):
+        nonlocal passos
+        passos += 1
+        if passos >= max_passos:
+            raise RuntimeError('desistiu')
+        time.sleep(0.002)
+
+    origem, copia = sqlite3.connect(banco), sqlite3.connect(destino)
+    try:
+        origem.backup(copia, pages=256, progress=progresso)
+        return 'ok'
+    except RuntimeError:
+        return f'não terminou ({passos} passos)'
+    finally:
+        copia.close()
+        origem.close()
+
+
+def backup_db(banco, destino, max_passos):
+    from app.backup import copiar_online
+    copia = copiar_online(banco, destino)
+    return f'ok ({copia.passos} passos, sonda {copia.pausa_escritores * 1000:.1f} ms)'
+
+
+MODOS = [
+    ('cópia do arquivo', copia_do_arquivo),
+    ('passos sem retrato', passos_sem_retrato),
+    ('backup_db', backup_db),
+]
+
+
+def conferir(destino):
+    """Resultado do integrity_check e o estoque somado (muda a cada compra)."""
+    try:
+        conexao = sqlite3.connect(f'file:{destino}?mode=ro', uri=True)
+        try:
+            integridade = conexao.execute('PRAGMA integrity_check').fetchone()[0]
+            estoque = conexao.execute('SELECT SUM(estoque) FROM app_produto').fetchone()[0]
+        finally:
+            conexao.close()
+    except sqlite3.DatabaseError as erro:
+        return str(erro), None
+    return integridade, estoque
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos', type=int, default=300000)
+    parser.add_argument('--taxa', type=float, default=200, help='compras por segundo durante a cópia')
+    parser.add_argument('--max-passos', type=int, default=5000, help='limite do backup sem retrato')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = os.path.join(pasta, 'bench.sqlite3')
+        os.environ['SQLITE_PATH'] = banco
+        configurar_django()
+        from django.core.management import call_command
+        from django.db import connections
+
+        print('Preparando banco...', flush=True)
+        call_command('migrate', verbosity=0)
+        call_command('popular_dados', produtos=2000, usuarios=500, pedidos=args.pedidos, verbosity=0)
+        connections.close_all()
+        tamanho = os.path.getsize(banco)
+        print(f'Banco de {tamanho / 1024 / 1024:.0f} MB, {args.taxa:.0f} compras/s durante cada cópia\n')
+
+        print(f'{"modo":<20} {"tempo":>7} {"MB/s":>6} {"compras p50":>12} {"p99":>8} {"máx":>8}  resultado')
+        for nome, copiar in MODOS:
+            destino = os.path.join(pasta, f'copia-{len(nome)}.sqlite3')
+            with Compras(banco, args.taxa) as compras:
+                time.sleep(0.5)
+                antes = len(compras.latencias)
+                _, estoque_antes = conferir(banco)
+                inicio = time.perf_counter()
+                resultado = copiar(banco, destino, args.max_passos)
+                segundos = time.perf_counter() - inicio
+                _, estoque_depois = conferir(banco)
+                latencias = sorted(compras.latencias[antes:])
+            if resultado.startswith('ok'):
+                integridade, estoque = conferir(destino)
+                # Uma cópia coerente tem o estoque de algum momento entre o início e o fim
+                coerente = estoque_depois <= estoque <= estoque_antes
+                resultado += (
+                    f'; integrity_check: {integridade}; estoque {estoque} '
+                    f'(banco: {estoque_antes} -> {estoque_depois}, {"coerente" if coerente else "VELHO"})'
+                )
+            print(
+                f'{nome:<20} {segundos:>6.2f}s {tamanho / 1024 / 1024 / segundos:>6.0f} '
+                f'{percentil(latencias, 50):>10.2f}ms {percentil(latencias, 99):>6.2f}ms '
+                f'{(latencias[-1] if latencias else 0):>6.2f}ms  {resultado}',
+                flush=True,
+            )
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(destino + sufixo):
+                    os.remove(destino + sufixo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Busca de produtos: LIKE '%termo%' (icontains) x índice FTS5.
+
+Cria um banco SQLite temporário com N produtos de nomes e descrições
+aleatórios (vocabulário fixo, semente fixa) e mede, para cada termo, o
+tempo da busca antiga (icontains em nome e descrição, como o
+search_fields do admin) e da busca nova (app/busca.py, com ranking).
+
+Uso:
+    python benchmarks/bench_busca.py [--produtos 100000] [--repeticoes 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+CATEGORIAS = (
+    'Notebook Celular Tablet Monitor Teclado Mouse Impressora Roteador '
+    'Fone Câmera Console Relógio'
+).split()
+MARCAS = 'Dell Lenovo Apple Samsung Motorola Xiaomi LG Asus Acer HP Sony Positivo'.split()
+ADJETIVOS = 'acessível econômico silencioso portátil compacto rápido gamer profissional'.split()
+TERMOS = ['notebook', 'acessivel', 'lenovo notebook', 'not', 'zx4821', 'inexistente']
+
+
+def vocabulario(aleatorio, tamanho=5000):
+    """Palavras sintéticas para as descrições (um catálogo real é bem variado)."""
+    silabas = 'ba be bi bo bu ca ce ci co cu da de di do du fa fe fi la le li lo ma me mi mo na ne ni no pa pe pi po ra re ri ro sa se si so ta te ti to va ve vi'.split()
+    return [''.join(aleatorio.choices(silabas, k=aleatorio.randint(2, 4))) for _ in range(tamanho)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--produtos', type=int, default=100_000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    pasta = tempfile.TemporaryDirectory()
+    os.environ['SQLITE_PATH'] = os.path.join(pasta.name, 'busca.sqlite3')
+
+    from _django import configurar_django
+    configurar_django()
+    from decimal import Decimal
+
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from django.db.models import Q
+
+    from app.busca import buscar_produtos, filtrar_produtos, reconstruir_indice
+    from app.models import Produto
+
+    call_command('migrate', verbosity=0)
+    aleatorio = random.Random(42)
+    palavras = vocabulario(aleatorio)
+
+    print(f'Criando {args.produtos} produtos...', flush=True)
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        for lote in range(0, args.produtos, 5000):
+            Produto.objects.bulk_create(
+                Produto(
+                    nome=(
+                        f'{aleatorio.choice(CATEGORIAS)} {aleatorio.choice(MARCAS)} '
+                        f'{aleatorio.choice("ABCXZ")}{aleatorio.choice("ABCXZ")}{indice}'
+                    ),
+                    descricao=' '.join(aleatorio.choices(palavras, k=20) + aleatorio.choices(ADJETIVOS, k=1)),
+                    estoque=aleatorio.randint(0, 50),
+                    preco=Decimal(aleatorio.randint(50, 9000)),
+                )
+                for indice in range(lote, min(lote + 5000, args.produtos))
+            )
+    print(f'  inserção (com triggers do índice): {time.perf_counter() - inicio:.1f}s')
+
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        reconstruir_indice()
+    print(f'  reconstrução do índice: {time.perf_counter() - inicio:.1f}s')
+    connection.close()
+
+    def icontains(termo):
+        # Busca antiga: cada palavra em nome OU descrição (como o search_fields do admin)
+        produtos = Produto.objects.filter(estoque__gt=0)
+        for palavra in termo.split():
+            produtos = produtos.filter(Q(nome__icontains=palavra) | Q(descricao__icontains=palavra))
+        return produtos
+
+    def vitrine_icontains(termo):
+        return list(icontains(termo)[:48])
+
+    def admin_icontains(termo):
+        # Lista do admin: COUNT(*) do paginador + primeira página ordenada
+        produtos = icontains(termo)
+        return produtos.count(), list(produtos.order_by('-pk')[:100])
+
+    def admin_fts(termo):
+        produtos = filtrar_produtos(Produto.objects.filter(estoque__gt=0), termo)
+        return produtos.count(), list(produtos.order_by('-pk')[:100])
+
+    def medir(funcao, termo):
+        funcao(termo)  # aquecimento
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            funcao(termo)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tempos)
+
+    print('\nTempo mediano por busca (ms). Vitrine: 48 primeiros; admin: COUNT + página de 100.')
+    print(
+        f'{"termo":<16} {"encontrados":>11} | {"vitrine like":>12} {"vitrine fts":>11} | '
+        f'{"admin like":>10} {"admin fts":>9} {"ganho":>7}'
+    )
+    for termo in TERMOS:
+        vitrine_antes = medir(vitrine_icontains, termo)
+        vitrine_depois = medir(buscar_produtos, termo)
+        admin_antes = medir(admin_icontains, termo)
+        admin_depois = medir(admin_fts, termo)
+        encontrados = admin_fts(termo)[0]
+        print(
+            f'{termo:<16} {encontrados:>11} | {vitrine_antes:>12.2f} {vitrine_depois:>11.2f} | '
+            f'{admin_antes:>10.2f} {admin_depois:>9.2f} {admin_antes / admin_depois:>6.1f}x'
+        )
+    print(
+        '\nA vitrine com LIKE para no 48º resultado sem ordenar; a com FTS5 ordena todos por relevância.\n'
+        'LIKE também não ignora acentos: "acessivel" não encontra "acessível".'
+    )
+    pasta.cleanup()
+
+
+if __name__ == '__main__':
+    main()
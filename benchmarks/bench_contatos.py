@@ -0,0 +1,176 @@
+"""
+Benchmark da fila de contatos (app/fila_contatos.py): espera pelo lock de
+escrita do SQLite com compras e uma rajada de mensagens de contato ao
+mesmo tempo.
+
+Num banco temporário (com as migrações), threads compradoras chamam
+realizar_compra e threads de "spam" enviam mensagens de contato, cada
+grupo num ritmo fixo. Dois modos:
+
+- "sincrono": cada mensagem é um INSERT na requisição (fila desligada)
+- "fila": mensagens enfileiradas e gravadas em lotes pela thread da fila
+
+A espera pelo lock é o tempo do BEGIN IMMEDIATE de cada compra (medido
+com um execute_wrapper). Os e-mails vão para o backend dummy.
+
+Uso:
+    python benchmarks/bench_contatos.py [--compradores 4] [--taxa-compras 200]
+                                        [--spam 8] [--taxa 400] [--segundos 5]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from _django import configurar_django
+
+PRODUTOS = 50
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+def no_ritmo(taxa_por_thread, fim, operacao):
+    """Chama operacao() taxa_por_thread vezes por segundo até ``fim``."""
+    intervalo, proximo = 1 / taxa_por_thread, time.perf_counter()
+    while time.perf_counter() < fim:
+        operacao()
+        proximo += intervalo
+        time.sleep(max(0.0, proximo - time.perf_counter()))
+
+
+def executar(modo, segundos, compradores, taxa_compras, spam, taxa):
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+
+    from app.fila_contatos import FilaContatos
+    from app.models import Contato, Produto
+    from app.services import EstoqueInsuficiente, realizar_compra
+
+    fila = FilaContatos(tamanho=0 if modo == 'sincrono' else 1000, lote=100, intervalo_email=60)
+    usuario = User.objects.get(username='bench')
+    produtos = list(Produto.objects.all())
+    fim = time.perf_counter() + segundos
+    lock = threading.Lock()
+    esperas, latencias = [], []
+    contagem = {'compras': 0, 'contatos': 0, 'erros': 0}
+
+    def comprador():
+        minhas, compras, erros = [], 0, 0
+
+        def medir_begin(execute, sql, params, many, context):
+            if not sql.startswith('BEGIN'):
+                return execute(sql, params, many, context)
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                minhas.append((time.perf_counter() - inicio) * 1000)
+
+        def comprar():
+            nonlocal compras, erros
+            try:
+                realizar_compra(usuario, random.choice(produtos), 1)
+                compras += 1
+            except (EstoqueInsuficiente, OperationalError):
+                erros += 1
+
+        try:
+            with connection.execute_wrapper(medir_begin):
+                no_ritmo(taxa_compras / compradores, fim, comprar)
+        finally:
+            connection.close()
+        with lock:
+            esperas.extend(minhas)
+            contagem['compras'] += compras
+            contagem['erros'] += erros
+
+    def spammer():
+        minhas = []
+
+        def enviar():
+            inicio = time.perf_counter()
+            try:
+                fila.enviar(Contato(nome='Spam', email='spam@x.com', mensagem='Compre agora! ' * 20))
+            except OperationalError:
+                with lock:
+                    contagem['erros'] += 1
+            minhas.append((time.perf_counter() - inicio) * 1000)
+
+        try:
+            no_ritmo(taxa / spam, fim, enviar)
+        finally:
+            connection.close()
+        with lock:
+            latencias.extend(minhas)
+            contagem['contatos'] += len(minhas)
+
+    threads = [threading.Thread(target=comprador) for _ in range(compradores)]
+    threads += [threading.Thread(target=spammer) for _ in range(spam)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    fila.encerrar()
+    gravados = Contato.objects.count()
+    Contato.objects.all().delete()
+    return contagem, esperas, latencias, gravados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--compradores', type=int, default=4)
+    parser.add_argument('--taxa-compras', type=float, default=200, help='compras por segundo (total)')
+    parser.add_argument('--spam', type=int, default=8, help='threads enviando mensagens de contato')
+    parser.add_argument('--taxa', type=float, default=400, help='mensagens de contato por segundo (total)')
+    parser.add_argument('--segundos', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'bench.sqlite3')
+        os.environ['EMAIL_BACKEND'] = 'django.core.mail.backends.dummy.EmailBackend'
+        configurar_django()
+        from decimal import Decimal
+
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+
+        from app.models import Produto
+
+        call_command('migrate', verbosity=0)
+        User.objects.create_user('bench', password='senha-bench-123')
+        Produto.objects.bulk_create(
+            Produto(nome=f'Produto {i}', estoque=10 ** 9, preco=Decimal('99.90'), descricao='x')
+            for i in range(PRODUTOS)
+        )
+
+        print(
+            f'{args.compradores} compradores a {args.taxa_compras:.0f} compras/s, '
+            f'{args.spam} threads de contato a {args.taxa:.0f} msg/s, '
+            f'{args.segundos}s por modo\n'
+        )
+        print(
+            f'{"modo":<9} {"compras/s":>10} {"BEGIN p50":>10} {"p95":>8} {"p99":>8} {"max":>8}'
+            f' {"contato p95":>12} {"gravados":>9} {"erros":>6}'
+        )
+        for modo in ('sincrono', 'fila'):
+            contagem, esperas, latencias, gravados = executar(
+                modo, args.segundos, args.compradores, args.taxa_compras, args.spam, args.taxa
+            )
+            print(
+                f'{modo:<9} {contagem["compras"] / args.segundos:>10.0f}'
+                f' {percentil(esperas, 50):>8.2f}ms {percentil(esperas, 95):>6.2f}ms'
+                f' {percentil(esperas, 99):>6.2f}ms {max(esperas, default=0):>6.1f}ms'
+                f' {percentil(latencias, 95):>10.2f}ms {gravados:>5}/{contagem["contatos"]:<4}'
+                f' {contagem["erros"]:>5}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Bytes de HTML por página: CSS embutido (antes) x CSS em arquivos estáticos (depois).
+
+Renderiza cada página com o test client e reconstrói a versão "antes"
+substituindo cada <link> para /static/css/*.css pelo <style> com o
+conteúdo do arquivo, exatamente como os templates eram. Mostra o tamanho
+bruto e com gzip; a diferença é o que deixa de ser enviado a cada
+visualização depois que o navegador guardou os CSS em cache.
+
+Uso:
+    python benchmarks/bench_html_bytes.py
+"""
+import gzip
+import re
+from decimal import Decimal
+
+from _django import banco_de_teste, configurar_django
+
+configurar_django()
+
+from django.contrib.staticfiles import finders  # noqa: E402
+from django.test import Client  # noqa: E402
+
+_LINK_CSS = re.compile(r'<link rel="stylesheet" href="/static/(css/[^"]+?)(?:\.[0-9a-f]{12})?(\.css)">')
+
+
+def embutir_css(html):
+    def _style(encontrado):
+        caminho = finders.find(encontrado[1] + encontrado[2])
+        with open(caminho, encoding='utf-8') as arquivo:
+            return f'<style>\n{arquivo.read()}</style>'
+    return _LINK_CSS.sub(_style, html)
+
+
+def tamanhos(html):
+    dados = html.encode()
+    return len(dados), len(gzip.compress(dados))
+
+
+def main():
+    from django.contrib.auth.models import User
+    from app.models import Pagina, Produto
+
+    Pagina.objects.create(
+        nome_do_site='EcoCycle', texto_chamada='Tecnologia premium.', texto_sobre='Sobre nós',
+        endereco='Rua 1', email='contato@ecocycle.dev', whatsapp='13 99999-9999',
+    )
+    produto = Produto.objects.create(nome='Notebook', estoque=5, preco=Decimal('1999.90'), descricao='Recondicionado')
+    usuario = User.objects.create_user('bench', password='senha-forte-123')
+
+    anonimo = Client()
+    logado = Client()
+    logado.force_login(usuario)
+    paginas = [
+        ('/', anonimo),
+        ('/login/', anonimo),
+        ('/cadastro/', anonimo),
+        ('/admin-login/', anonimo),
+        (f'/comprar/{produto.id}/', logado),
+        ('/perfil/', logado),
+    ]
+
+    print(f'{"página":<16} {"antes":>10} {"depois":>10} {"gzip antes":>12} {"gzip depois":>12}')
+    for url, cliente in paginas:
+        html = cliente.get(url).content.decode()
+        antes, antes_gz = tamanhos(embutir_css(html))
+        depois, depois_gz = tamanhos(html)
+        print(f'{url:<16} {antes:>10} {depois:>10} {antes_gz:>12} {depois_gz:>12}')
+
+
+if __name__ == '__main__':
+    with banco_de_teste():
+        main()
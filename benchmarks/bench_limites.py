@@ -0,0 +1,95 @@
+"""
+Benchmark do limite de tentativas (app/limites.py): CPU gasto por
+tentativa de login com o hasher de senha real (PBKDF2 do settings).
+
+Num banco temporário (com as migrações), mede com o Django test client:
+
+- tentativa processada: senha errada, passa pelo formulário (um hash)
+- hash extra: uma chamada a authenticate(), o que as views de login
+  faziam a mais antes (cada POST custava dois hashes)
+- tentativa recusada: balde do usuário vazio, resposta 429 sem hash e
+  sem consultas ao banco
+
+Uso:
+    python benchmarks/bench_limites.py [--tentativas 10] [--recusadas 500]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from _django import configurar_django
+
+
+def cpu_medio(funcao, vezes):
+    inicio = time.process_time()
+    for i in range(vezes):
+        funcao(i)
+    return (time.process_time() - inicio) / vezes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tentativas', type=int, default=10, help='tentativas processadas medidas')
+    parser.add_argument('--recusadas', type=int, default=500, help='tentativas recusadas medidas')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'bench.sqlite3')
+        configurar_django()
+        from django.contrib.auth import authenticate
+        from django.contrib.auth.hashers import make_password
+        from django.contrib.auth.models import User
+        from django.core.cache import caches
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext, setup_test_environment
+        from django.urls import reverse
+
+        setup_test_environment()
+        # O django.request registra cada 429 como warning: fora da saída do benchmark
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        call_command('migrate', verbosity=0)
+        senha = make_password('senha-bench-123')
+        User.objects.bulk_create(User(username=f'cliente{i}', password=senha) for i in range(args.tentativas))
+        url = reverse('login')
+        caches['limites'].clear()
+
+        def processada(i):
+            # IP e usuário diferentes a cada tentativa: nenhum balde esvazia
+            resposta = Client(REMOTE_ADDR=f'10.0.{i // 250}.{i % 250}').post(
+                url, {'username': f'cliente{i}', 'password': 'errada'}
+            )
+            assert resposta.status_code == 200, resposta.status_code
+
+        def hash_extra(i):
+            authenticate(username=f'cliente{i}', password='errada')
+
+        cliente = Client(REMOTE_ADDR='10.9.9.9')
+        for _ in range(5):
+            cliente.post(url, {'username': 'alvo', 'password': 'errada'})
+
+        def recusada(i):
+            resposta = cliente.post(url, {'username': 'alvo', 'password': 'errada'})
+            assert resposta.status_code == 429, resposta.status_code
+
+        tempo_processada = cpu_medio(processada, args.tentativas)
+        tempo_hash = cpu_medio(hash_extra, args.tentativas)
+        with CaptureQueriesContext(connection) as consultas:
+            tempo_recusada = cpu_medio(recusada, args.recusadas)
+
+        print('CPU por tentativa de login (média, ms)\n')
+        print(f'{"antes: processada + hash duplicado":<40} {tempo_processada + tempo_hash:>10.2f}')
+        print(f'{"agora: processada (um hash)":<40} {tempo_processada:>10.2f}')
+        print(f'{"agora: recusada (429)":<40} {tempo_recusada:>10.2f}')
+        print(
+            f'\nCada tentativa recusada economiza {tempo_processada - tempo_recusada:.1f} ms de CPU '
+            f'({tempo_processada / tempo_recusada:.0f}x menos) e faz '
+            f'{len(consultas) / args.recusadas:.0f} consultas ao banco.'
+        )
+
+
+if __name__ == '__main__':
+    main()
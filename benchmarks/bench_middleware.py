@@ -0,0 +1,86 @@
+"""
+Custo por requisição do SeparateAdminAuthMiddleware.
+
+Compara a versão anterior (dois resolve() por requisição, sem tratar 404)
+com a atual (prefixos + LRU) numa mistura de caminhos típica do site,
+incluindo mídia e caminhos inexistentes. A view é um no-op, então o tempo
+medido é só o do middleware.
+
+Uso:
+    python benchmarks/bench_middleware.py [--requisicoes 50000]
+"""
+import argparse
+import time
+
+from _django import configurar_django
+
+configurar_django()
+
+from django.contrib.auth import logout  # noqa: E402
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.contrib.sessions.backends.signed_cookies import SessionStore  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import Resolver404, resolve  # noqa: E402
+
+from app.middleware import SeparateAdminAuthMiddleware, eh_area_admin  # noqa: E402
+
+CAMINHOS = [
+    '/', '/', '/', '/perfil/', '/comprar/1/', '/comprar/2/', '/login/', '/cadastro/',
+    '/media/produtos/Mac.jpeg', '/media/site/logo.png', '/static/css/base.css',
+    '/admin/', '/admin/app/produto/', '/admin-login/', '/favicon.ico', '/wp-login.php',
+]
+
+
+class MiddlewareAnterior:
+    """Implementação antiga, para comparação."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            url_name = resolve(request.path_info).url_name
+            url_namespace = resolve(request.path_info).namespace
+        except Resolver404:
+            # A versão antiga propagava o erro (500); aqui só contamos o custo
+            url_name = url_namespace = None
+        is_admin_area = request.path.startswith('/admin/') or url_name == 'admin_login' or url_namespace == 'admin'
+        request.is_admin_area = is_admin_area
+        if request.user.is_authenticated:
+            session_type = request.session.get('auth_type', 'site')
+            if (is_admin_area and session_type == 'site') or (not is_admin_area and session_type == 'admin'):
+                logout(request)
+        return self.get_response(request)
+
+
+def medir(classe, requisicoes):
+    middleware = classe(lambda request: None)
+    fabrica = RequestFactory()
+    pedidos = []
+    for caminho in CAMINHOS:
+        request = fabrica.get(caminho)
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        pedidos.append(request)
+
+    inicio = time.perf_counter()
+    for i in range(requisicoes):
+        middleware(pedidos[i % len(pedidos)])
+    return (time.perf_counter() - inicio) / requisicoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requisicoes', type=int, default=50000)
+    args = parser.parse_args()
+
+    anterior = medir(MiddlewareAnterior, args.requisicoes)
+    eh_area_admin.cache_clear()
+    atual = medir(SeparateAdminAuthMiddleware, args.requisicoes)
+    print(f'{len(CAMINHOS)} caminhos, {args.requisicoes} requisições')
+    print(f'anterior: {anterior:8.2f} µs/requisição')
+    print(f'atual:    {atual:8.2f} µs/requisição ({anterior / atual:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
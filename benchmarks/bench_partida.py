@@ -0,0 +1,155 @@
+"""
+Benchmark da partida a frio (app/inicializacao.py e gunicorn.conf.py):
+tempo do início do processo até o primeiro byte da página inicial.
+
+Num banco temporário já migrado e populado, cada configuração é iniciada
+--vezes vezes com o comando que o container rodaria. Assim que a porta
+aceita conexões, um cliente pede GET / e mede o primeiro byte. Depois mede
+a primeira requisição de outras páginas (cada worker ainda frio) e a
+memória (PSS do master + workers: páginas compartilhadas por fork contam
+uma vez só).
+
+Configurações:
+
+- antes: ``manage.py migrate && gunicorn`` sem preload nem aquecimento
+  (o CMD antigo do Dockerfile)
+- agora: gunicorn.conf.py padrão (impressão digital, preload, aquecimento)
+
+Uso:
+    python benchmarks/bench_partida.py [--vezes 3] [--workers 2]
+"""
+import argparse
+import contextlib
+import io
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _django import RAIZ
+from carga import porta_livre
+
+CONFIGURACOES = [
+    # (nome, comando, variáveis de ambiente)
+    ('antes', 'python manage.py migrate && exec gunicorn -c /dev/null --workers {workers} --threads 2 '
+              '--bind 127.0.0.1:{porta} Projeto.wsgi:application', {}),
+    ('agora', 'exec gunicorn', {}),
+]
+
+PAGINAS = ['/login/', '/api/produtos/', '/buscar/?q=notebook']
+
+
+def requisitar(porta, caminho):
+    """(ms até o primeiro byte, ms até o fim) de um GET; None se a porta está fechada."""
+    inicio = time.perf_counter()
+    try:
+        conexao = socket.create_connection(('127.0.0.1', porta), timeout=60)
+    except ConnectionRefusedError:
+        return None
+    with conexao:
+        conexao.sendall(f'GET {caminho} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        primeiro = conexao.recv(1)
+        if not primeiro:
+            return None
+        primeiro_byte = time.perf_counter()
+        while conexao.recv(65536):
+            pass
+    return (primeiro_byte - inicio) * 1000, (time.perf_counter() - inicio) * 1000
+
+
+def pss_mb(pid):
+    """PSS (MB) do processo e de todos os seus filhos."""
+    total = 0
+    pendentes = [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        try:
+            with open(f'/proc/{atual}/smaps_rollup') as arquivo:
+                for linha in arquivo:
+                    if linha.startswith('Pss:'):
+                        total += int(linha.split()[1])
+            with open(f'/proc/{atual}/task/{atual}/children') as arquivo:
+                pendentes.extend(int(filho) for filho in arquivo.read().split())
+        except FileNotFoundError:
+            continue
+    return total / 1024
+
+
+def partir(comando, ambiente, workers):
+    """Inicia o servidor e mede a partida; devolve um dicionário de tempos (ms) e memória."""
+    porta = porta_livre()
+    ambiente = {
+        **os.environ, **ambiente, 'PORT': str(porta), 'WEB_CONCURRENCY': str(workers),
+        'PATH': os.path.dirname(sys.executable) + os.pathsep + os.environ.get('PATH', ''),
+    }
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        ['sh', '-c', comando.format(porta=porta, workers=workers)],
+        cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if processo.poll() is not None:
+                raise SystemExit(f'o servidor saiu com código {processo.returncode}: {comando}')
+            resultado = requisitar(porta, '/')
+            if resultado is not None:
+                break
+            time.sleep(0.005)
+        # requisitar() voltou no fim da resposta: o primeiro byte chegou antes
+        medicao = {
+            'primeiro_byte': (time.perf_counter() - inicio) * 1000 - resultado[1] + resultado[0],
+            'index': resultado[1],
+        }
+        for caminho in PAGINAS:
+            medicao[caminho] = requisitar(porta, caminho)[1]
+        time.sleep(0.5)
+        medicao['pss'] = pss_mb(processo.pid)
+        return medicao
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vezes', type=int, default=3, help='partidas por configuração (mostra a mediana)')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'bench.sqlite3')
+        os.environ.setdefault('SLOW_REQUEST_MS', '100000')
+        from _django import configurar_django
+        configurar_django()
+        from django.core.management import call_command
+        from django.db import connections
+
+        from app.inicializacao import migrar_se_preciso
+
+        call_command('migrate', verbosity=0)
+        call_command('popular_dados', produtos=500, usuarios=50, pedidos=2000, verbosity=0)
+
+        colunas = ['primeiro_byte', 'index', *PAGINAS, 'pss']
+        print(f'\nMediana de {args.vezes} partidas com {args.workers} workers (ms; memória em MB)\n')
+        print(f'{"configuração":<12} {"1º byte":>9} {"GET /":>7} ' + ' '.join(f'{c[:14]:>14}' for c in PAGINAS)
+              + f' {"PSS":>6}')
+        for nome, comando, ambiente in CONFIGURACOES:
+            # Banco em dia, como numa partida comum (o 'antes' roda o migrate de qualquer jeito)
+            with contextlib.redirect_stdout(io.StringIO()):
+                migrar_se_preciso()
+            connections.close_all()
+            medicoes = [partir(comando, ambiente, args.workers) for _ in range(args.vezes)]
+            mediana = {c: statistics.median(m[c] for m in medicoes) for c in colunas}
+            print(
+                f'{nome:<12} {mediana["primeiro_byte"]:>9.0f} {mediana["index"]:>7.1f} '
+                + ' '.join(f'{mediana[c]:>14.1f}' for c in PAGINAS)
+                + f' {mediana["pss"]:>6.0f}',
+                flush=True,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark das reservas de estoque da página de compra (app/reservas.py).
+
+1. Venda relâmpago: --compradores clientes logados (Django test client em
+   --concorrencia threads, num banco temporário) disputam um produto com
+   --estoque unidades. Cada um abre /comprar/<id>/, "preenche" o pedido
+   por --pensar segundos e envia o POST. Quem abre a página e vê 0
+   unidades disponíveis desiste ali mesmo.
+
+   - sem reservas: RESERVA_MINUTOS=0 (a reserva vence ao nascer, como se
+     não existisse): quem abre a página enquanto ainda há estoque preenche
+     o pedido, e quem perde a corrida só descobre no POST
+   - com reservas: o padrão
+
+   Mostra as vendas, as compras que falharam depois de preenchidas
+   (trabalho perdido do cliente), os avisados já no GET e a latência do
+   GET e do POST.
+
+2. Disponível na vitrine: lista de --produtos produtos com --reservas
+   reservas ativas espalhadas, lida de três jeitos: só o estoque (a lista
+   de antes), com_disponivel() (subconsulta correlacionada, uma consulta)
+   e uma soma por produto (N+1). Mediana de 20 leituras.
+
+Uso:
+    python benchmarks/bench_reservas.py [--compradores 200] [--estoque 20] [--concorrencia 64] [--pensar 1]
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from _django import configurar_django
+from carga import percentil
+
+DISPONIVEL = re.compile(r'(-?\d+) unidades? disponíve')
+
+
+def venda_relampago(usuarios, produto, concorrencia, pensar):
+    from django.db import connections
+    from django.test import Client
+
+    url = f'/comprar/{produto}/'
+    resultado = {'vendas': 0, 'falhas_no_post': 0, 'avisados_no_get': 0, 'get': [], 'post': []}
+    lock = threading.Lock()
+    fila = list(usuarios)
+    random.shuffle(fila)
+
+    def comprador():
+        while True:
+            with lock:
+                if not fila:
+                    break
+                usuario = fila.pop()
+            cliente = Client()
+            cliente.force_login(usuario)
+            inicio = time.perf_counter()
+            pagina = cliente.get(url).content.decode()
+            get_ms = (time.perf_counter() - inicio) * 1000
+            if int(DISPONIVEL.search(pagina)[1]) <= 0:
+                with lock:
+                    resultado['get'].append(get_ms)
+                    resultado['avisados_no_get'] += 1
+                continue
+            time.sleep(pensar * random.uniform(0.5, 1.5))
+            inicio = time.perf_counter()
+            resposta = cliente.post(url, {'quantidade': 1})
+            post_ms = (time.perf_counter() - inicio) * 1000
+            with lock:
+                resultado['get'].append(get_ms)
+                resultado['post'].append(post_ms)
+                if resposta.status_code == 302:
+                    resultado['vendas'] += 1
+                else:
+                    resultado['falhas_no_post'] += 1
+        connections.close_all()
+
+    threads = [threading.Thread(target=comprador) for _ in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+
+def medir_leitura(funcao, vezes=20):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    tempos = []
+    for _ in range(vezes):
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--compradores', type=int, default=200)
+    parser.add_argument('--estoque', type=int, default=20)
+    parser.add_argument('--concorrencia', type=int, default=64)
+    parser.add_argument('--pensar', type=float, default=1.0, help='segundos entre abrir a página e comprar')
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--reservas', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'bench.sqlite3')
+        os.environ.setdefault('SLOW_REQUEST_MS', '100000')
+        configurar_django()
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.db.models import Sum
+        from django.utils import timezone
+
+        from app import reservas
+        from app.models import Pedido, Produto, Reserva
+        from app.reservas import com_disponivel
+
+        print('Preparando banco...', flush=True)
+        call_command('migrate', verbosity=0)
+        call_command('popular_dados', produtos=args.produtos, usuarios=args.compradores, pedidos=0, verbosity=0)
+        usuarios = list(User.objects.filter(is_staff=False)[:args.compradores])
+        produto = Produto.objects.order_by('pk').first()
+
+        print(f'\nVenda relâmpago: {len(usuarios)} compradores, {args.estoque} unidades, '
+              f'{args.concorrencia} threads, {args.pensar}s preenchendo\n')
+        print(f'{"modo":<14} {"vendas":>6} {"falhas no POST":>15} {"avisados no GET":>16} '
+              f'{"GET p50/p99":>14} {"POST p50/p99":>15} {"tempo":>7}')
+        for nome, minutos in (('sem reservas', 0), ('com reservas', reservas.RESERVA_MINUTOS)):
+            Produto.objects.filter(pk=produto.pk).update(estoque=args.estoque)
+            Reserva.objects.all().delete()
+            Pedido.objects.all().delete()
+            reservas.RESERVA_MINUTOS = minutos
+            r = venda_relampago(usuarios, produto.pk, args.concorrencia, args.pensar)
+            get, post = sorted(r['get']), sorted(r['post'])
+            print(
+                f'{nome:<14} {r["vendas"]:>6} {r["falhas_no_post"]:>15} {r["avisados_no_get"]:>16} '
+                f'{percentil(get, 50):>7.0f}/{percentil(get, 99):<4.0f}ms '
+                f'{percentil(post, 50):>8.0f}/{percentil(post, 99):<4.0f}ms {r["segundos"]:>6.1f}s',
+                flush=True,
+            )
+
+        # Reservas ativas espalhadas pelo catálogo
+        Reserva.objects.all().delete()
+        expira = timezone.now() + timedelta(minutes=5)
+        ids = list(Produto.objects.values_list('pk', flat=True))
+        Reserva.objects.bulk_create(
+            Reserva(usuario=usuarios[i % len(usuarios)], produto_id=ids[(i * 7) % len(ids)], expira_em=expira)
+            for i in range(args.reservas)
+        )
+        em_estoque = Produto.objects.filter(estoque__gt=0)
+
+        def por_produto():
+            for item in em_estoque.all():
+                reservado = Reserva.objects.filter(
+                    produto=item, expira_em__gt=timezone.now()
+                ).aggregate(total=Sum('quantidade'))['total'] or 0
+                item.disponivel = item.estoque - reservado
+
+        print(f'\nDisponível na vitrine: {len(ids)} produtos, {args.reservas} reservas ativas\n')
+        print(f'{"leitura":<26} {"ms":>8} {"consultas":>10}')
+        for nome, funcao in (
+            ('só o estoque (antes)', lambda: list(em_estoque.all())),
+            ('com_disponivel()', lambda: list(com_disponivel(em_estoque))),
+            ('uma soma por produto', por_produto),
+        ):
+            ms, consultas = medir_leitura(funcao)
+            print(f'{nome:<26} {ms:>8.1f} {consultas:>10}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark das opções de sessão (SESSION_BACKEND em settings e
+app/sessoes.py): custo por requisição de um usuário logado.
+
+Num banco temporário (com as migrações), cada opção passa por
+SessionMiddleware + AuthenticationMiddleware + SeparateAdminAuthMiddleware
+com uma view mínima, em dois casos:
+
+- leitura: a view só lê request.user e request.session['auth_type']
+  (a maioria das páginas)
+- escrita: a view também altera a sessão (ex.: adicionar ao carrinho)
+
+Opções medidas:
+
+- db: sessão no django_session e usuário lido do auth_user (como antes)
+- cached_db + locmem / file: sessão e usuário no cache 'sessoes'
+- signed_cookies: sessão no cookie, usuário no cache 'sessoes' (file)
+
+Uso:
+    python benchmarks/bench_sessoes.py [--leituras 3000] [--escritas 1000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from importlib import import_module
+
+from _django import configurar_django
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+OPCOES = [
+    # (nome, engine, alias do cache, backend de autenticação)
+    ('db', 'db', 'sessoes_locmem', 'django.contrib.auth.backends.ModelBackend'),
+    ('cached_db + locmem', 'cached_db', 'sessoes_locmem', 'app.sessoes.ModelBackendComCache'),
+    ('cached_db + file', 'cached_db', 'sessoes_file', 'app.sessoes.ModelBackendComCache'),
+    ('signed_cookies', 'signed_cookies', 'sessoes_file', 'app.sessoes.ModelBackendComCache'),
+]
+
+
+def medir(cadeia, fabrica, cookie, vezes):
+    """Tempo médio (ms) e consultas por requisição da cadeia de middlewares."""
+    from django.conf import settings
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    def requisitar():
+        nonlocal cookie
+        request = fabrica.get('/perfil/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+        resposta = cadeia(request)
+        assert resposta.status_code == 200, resposta.status_code
+        if settings.SESSION_COOKIE_NAME in resposta.cookies:
+            # signed_cookies: a sessão alterada volta num cookie novo
+            cookie = resposta.cookies[settings.SESSION_COOKIE_NAME].value
+
+    requisitar()  # aquece o cache
+    reset_queries()  # com DEBUG o log de consultas lota e a contagem daria 0
+    with CaptureQueriesContext(connection) as consultas:
+        requisitar()
+    inicio = time.perf_counter()
+    for _ in range(vezes):
+        requisitar()
+    return (time.perf_counter() - inicio) / vezes * 1000, len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leituras', type=int, default=3000, help='requisições de leitura por opção')
+    parser.add_argument('--escritas', type=int, default=1000, help='requisições de escrita por opção')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'bench.sqlite3')
+        configurar_django()
+        from django.conf import settings
+        from django.contrib.auth import login
+        from django.contrib.auth.middleware import AuthenticationMiddleware
+        from django.contrib.auth.models import User
+        from django.contrib.sessions.middleware import SessionMiddleware
+        from django.core.management import call_command
+        from django.http import HttpResponse
+        from django.test import RequestFactory, override_settings
+
+        from app.middleware import SeparateAdminAuthMiddleware
+
+        call_command('migrate', verbosity=0)
+        usuario = User.objects.create_user('bench', password='senha-bench-123')
+        fabrica = RequestFactory()
+        caches = {
+            **settings.CACHES,
+            'sessoes_locmem': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'bench-sessoes',
+            },
+            'sessoes_file': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(pasta, 'cache_sessoes'),
+            },
+        }
+
+        def leitura(request):
+            request.user.is_authenticated
+            request.session.get('auth_type')
+            return HttpResponse('ok')
+
+        def escrita(request):
+            leitura(request)
+            request.session['carrinho'] = {'1': time.perf_counter_ns() % 10}
+            return HttpResponse('ok')
+
+        print(f'Custo por requisição de um usuário logado (média de {args.leituras} leituras / {args.escritas} escritas)\n')
+        print(f'{"opção":<20} {"leitura":>10} {"consultas":>10} {"escrita":>10} {"consultas":>10}')
+        for nome, engine, alias, backend in OPCOES:
+            with override_settings(
+                CACHES=caches, SESSION_ENGINE=ENGINES[engine], SESSION_CACHE_ALIAS=alias,
+                AUTHENTICATION_BACKENDS=[backend],
+            ):
+                # Login como o da view: sessão nova com auth_type 'site'
+                request = fabrica.post('/login/')
+                request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+                login(request, usuario, backend=backend)
+                request.session['auth_type'] = 'site'
+                request.session.save()
+                cookie = request.session.session_key
+
+                resultados = []
+                for view, vezes in ((leitura, args.leituras), (escrita, args.escritas)):
+                    cadeia = SessionMiddleware(AuthenticationMiddleware(SeparateAdminAuthMiddleware(view)))
+                    resultados.append(medir(cadeia, fabrica, cookie, vezes))
+            (ms_leitura, q_leitura), (ms_escrita, q_escrita) = resultados
+            print(f'{nome:<20} {ms_leitura:>8.3f}ms {q_leitura:>10} {ms_escrita:>8.3f}ms {q_escrita:>10}')
+
+
+if __name__ == '__main__':
+    main()
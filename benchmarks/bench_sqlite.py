@@ -0,0 +1,148 @@
+"""
+Benchmark do perfil SQLite: padrão do Django x Projeto/sqlite.py.
+
+Simula a carga do site com várias threads num banco em arquivo temporário:
+leituras (listagem de produtos) e escritas (contato + compra com débito de
+estoque dentro de uma transação).
+
+- "padrao": rollback journal, sem PRAGMAs, BEGIN DEFERRED e uma conexão
+  nova por operação (CONN_MAX_AGE=0)
+- "otimizado": PRAGMAs de Projeto/sqlite.py, BEGIN IMMEDIATE e uma conexão
+  persistente por thread
+
+Uso:
+    python benchmarks/bench_sqlite.py [--threads 8] [--segundos 5] [--escritas 0.2]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Projeto.sqlite import pragmas  # noqa: E402
+
+PRODUTOS = 200
+
+ESQUEMA = """
+CREATE TABLE produto (id INTEGER PRIMARY KEY, nome TEXT, estoque INTEGER, preco REAL, descricao TEXT);
+CREATE TABLE pedido (id INTEGER PRIMARY KEY, produto_id INTEGER, quantidade INTEGER, total REAL);
+CREATE TABLE contato (id INTEGER PRIMARY KEY, nome TEXT, email TEXT, mensagem TEXT);
+"""
+
+
+def criar_banco(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.executescript(ESQUEMA)
+    conn.executemany(
+        'INSERT INTO produto (nome, estoque, preco, descricao) VALUES (?, ?, ?, ?)',
+        [(f'Produto {i}', 10 ** 9, 99.9, 'x' * 200) for i in range(PRODUTOS)],
+    )
+    conn.commit()
+    conn.close()
+
+
+class Perfil:
+    def __init__(self, nome, caminho, otimizado):
+        self.nome = nome
+        self.caminho = caminho
+        self.otimizado = otimizado
+        self.local = threading.local()
+
+    def conectar(self):
+        if self.otimizado:
+            conn = getattr(self.local, 'conn', None)
+            if conn is None:
+                conn = sqlite3.connect(self.caminho, isolation_level=None, check_same_thread=False)
+                for nome, valor in pragmas().items():
+                    conn.execute(f'PRAGMA {nome}={valor}')
+                self.local.conn = conn
+            return conn
+        return sqlite3.connect(self.caminho, isolation_level=None)
+
+    def liberar(self, conn):
+        if not self.otimizado:
+            conn.close()
+
+    def ler(self):
+        conn = self.conectar()
+        try:
+            conn.execute('SELECT id, nome, preco, descricao FROM produto WHERE estoque > 0').fetchall()
+        finally:
+            self.liberar(conn)
+
+    def escrever(self):
+        conn = self.conectar()
+        produto = random.randint(1, PRODUTOS)
+        try:
+            conn.execute('BEGIN IMMEDIATE' if self.otimizado else 'BEGIN')
+            try:
+                # Leitura antes da escrita: com BEGIN DEFERRED é aqui que o lock é promovido
+                conn.execute('SELECT estoque FROM produto WHERE id = ?', (produto,)).fetchone()
+                conn.execute('INSERT INTO contato (nome, email, mensagem) VALUES (?, ?, ?)', ('a', 'a@b.c', 'oi'))
+                conn.execute('UPDATE produto SET estoque = estoque - 1 WHERE id = ? AND estoque >= 1', (produto,))
+                conn.execute('INSERT INTO pedido (produto_id, quantidade, total) VALUES (?, 1, 99.9)', (produto,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            self.liberar(conn)
+
+
+def executar(perfil, threads, segundos, fracao_escritas):
+    contagem = {'leituras': 0, 'escritas': 0, 'erros': 0}
+    lock = threading.Lock()
+    fim = time.perf_counter() + segundos
+
+    def trabalhador():
+        local = {'leituras': 0, 'escritas': 0, 'erros': 0}
+        while time.perf_counter() < fim:
+            escrita = random.random() < fracao_escritas
+            try:
+                if escrita:
+                    perfil.escrever()
+                    local['escritas'] += 1
+                else:
+                    perfil.ler()
+                    local['leituras'] += 1
+            except sqlite3.OperationalError:
+                local['erros'] += 1
+        with lock:
+            for chave, valor in local.items():
+                contagem[chave] += valor
+
+    workers = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--escritas', type=float, default=0.2, help='fração de operações de escrita')
+    args = parser.parse_args()
+
+    print(f'{args.threads} threads, {args.segundos}s por perfil, {args.escritas:.0%} escritas\n')
+    print(f'{"perfil":<10} {"leituras/s":>12} {"escritas/s":>12} {"erros":>8}')
+    for nome, otimizado in (('padrao', False), ('otimizado', True)):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'bench.sqlite3')
+            criar_banco(caminho)
+            contagem = executar(Perfil(nome, caminho, otimizado), args.threads, args.segundos, args.escritas)
+        print(
+            f'{nome:<10} {contagem["leituras"] / args.segundos:>12.0f} '
+            f'{contagem["escritas"] / args.segundos:>12.0f} {contagem["erros"]:>8}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+"""
+Teste de carga dos endpoints do EcoCycle.
+
+Cria um banco SQLite temporário, aplica as migrações, popula com
+`manage.py popular_dados` e dispara requisições concorrentes contra:
+
+    index         GET  /
+    perfil        GET  /perfil/            (logado)
+    buscar        GET  /buscar/?q=notebook
+    comprar_get   GET  /comprar/<id>/      (logado)
+    comprar_post  POST /comprar/<id>/      (logado)
+    login         GET  /login/
+    cadastro      GET  /cadastro/
+
+Dois modos:
+- client: Django test client em threads, no mesmo processo (sem rede)
+- gunicorn: sobe um gunicorn local com o mesmo banco e usa HTTP de verdade
+
+Para cada endpoint mostra vazão (req/s), latência p50/p95/p99 (ms) e
+consultas ao banco por requisição (lidas do cabeçalho Server-Timing).
+O resultado pode ser salvo como baseline em JSON e comparado depois:
+com --comparar, o script sai com código 1 se algum endpoint piorar além
+da tolerância.
+
+--referencia <commit> mede primeiro uma cópia do projeto nesse commit
+(git worktree temporário, mesmos dados e parâmetros) e compara a árvore
+atual com ela. Exemplo: as views de leitura no WSGI contra o commit antes
+do modo ASGI (a série que tornou index, perfil e buscar async).
+
+Uso:
+    python benchmarks/carga.py --modo client --concorrencia 4 --requisicoes 200
+    python benchmarks/carga.py --salvar benchmarks/baseline.json
+    python benchmarks/carga.py --comparar benchmarks/baseline.json --tolerancia 0.25
+    python benchmarks/carga.py --modo gunicorn --workers 2 --threads 2
+    python benchmarks/carga.py --modo gunicorn --workers 2 --servidor asgi
+    python benchmarks/carga.py --endpoints index,perfil,buscar --referencia f89bfbf~1
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from _django import RAIZ
+
+ENDPOINTS = {
+    # nome: (método, caminho, precisa de login, dados do POST)
+    'index': ('GET', '/', False, None),
+    'perfil': ('GET', '/perfil/', True, None),
+    'buscar': ('GET', '/buscar/?q=notebook', False, None),
+    'comprar_get': ('GET', '/comprar/{produto}/', True, None),
+    'comprar_post': ('POST', '/comprar/{produto}/', True, {'quantidade': '1'}),
+    'login': ('GET', '/login/', False, None),
+    'cadastro': ('GET', '/cadastro/', False, None),
+}
+
+_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+_CSRF = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    # Nearest-rank: o menor valor com pelo menos p% das amostras até ele
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p * len(ordenados) / 100) - 1))
+    return ordenados[indice]
+
+
+def consultas_do_cabecalho(valor):
+    encontrado = _CONSULTAS.search(valor or '')
+    return int(encontrado[1]) if encontrado else None
+
+
+# ---------------------------------------------------------------------------
+# Clientes
+# ---------------------------------------------------------------------------
+
+class ClienteDjango:
+    """Django test client (sem rede, mesmo processo)."""
+
+    def __init__(self, usuario=None):
+        from django.test import Client
+        self.cliente = Client()
+        if usuario is not None:
+            self.cliente.force_login(usuario)
+
+    def requisitar(self, metodo, caminho, dados=None):
+        if metodo == 'POST':
+            resposta = self.cliente.post(caminho, dados)
+        else:
+            resposta = self.cliente.get(caminho)
+        return resposta.status_code, resposta.get('Server-Timing')
+
+    def encerrar(self):
+        from django.db import connections
+        connections.close_all()
+
+
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    """HTTP de verdade contra o gunicorn local, com cookies e CSRF."""
+
+    def __init__(self, base, usuario=None, senha=None):
+        self.base = base
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SemRedirecionar
+        )
+        self.csrf = None
+        if usuario is not None:
+            self.requisitar('POST', '/login/', {'username': usuario, 'password': senha}, csrf_de='/login/')
+            # O login troca o token CSRF (rotate_token)
+            self.csrf = None
+
+    def _abrir(self, pedido):
+        try:
+            with self.abridor.open(pedido, timeout=60) as resposta:
+                corpo = resposta.read()
+                return resposta.status, resposta.headers, corpo
+        except urllib.error.HTTPError as erro:
+            return erro.code, erro.headers, erro.read()
+
+    def requisitar(self, metodo, caminho, dados=None, csrf_de=None):
+        if metodo == 'POST':
+            if self.csrf is None:
+                _, _, corpo = self._abrir(urllib.request.Request(self.base + (csrf_de or caminho)))
+                self.csrf = _CSRF.search(corpo.decode())[1]
+            corpo = urllib.parse.urlencode({**dados, 'csrfmiddlewaretoken': self.csrf}).encode()
+            pedido = urllib.request.Request(
+                self.base + caminho, data=corpo, headers={'Referer': self.base + caminho}
+            )
+        else:
+            pedido = urllib.request.Request(self.base + caminho)
+        status, cabecalhos, _ = self._abrir(pedido)
+        return status, cabecalhos.get('Server-Timing')
+
+    def encerrar(self):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+def executar_endpoint(nome, fabrica_cliente, concorrencia, requisicoes, produto):
+    metodo, caminho, precisa_login, dados = ENDPOINTS[nome]
+    caminho = caminho.format(produto=produto)
+    latencias, consultas = [], []
+    erros = 0
+    lock = threading.Lock()
+    restantes = [requisicoes]
+    pronto = threading.Barrier(concorrencia + 1)
+
+    def trabalhador():
+        nonlocal erros
+        cliente = fabrica_cliente(precisa_login)
+        try:
+            # Aquecimento (não medido): sessão, caches, conexões
+            cliente.requisitar(metodo, caminho, dados)
+            pronto.wait()
+            while True:
+                with lock:
+                    if restantes[0] <= 0:
+                        break
+                    restantes[0] -= 1
+                inicio = time.perf_counter()
+                status, timing = cliente.requisitar(metodo, caminho, dados)
+                duracao = (time.perf_counter() - inicio) * 1000
+                with lock:
+                    latencias.append(duracao)
+                    n = consultas_do_cabecalho(timing)
+                    if n is not None:
+                        consultas.append(n)
+                    if status >= 400:
+                        erros += 1
+        finally:
+            cliente.encerrar()
+
+    threads = [threading.Thread(target=trabalhador) for _ in range(concorrencia)]
+    for t in threads:
+        t.start()
+    pronto.wait()
+    inicio = time.perf_counter()
+    for t in threads:
+        t.join()
+    tempo = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'requisicoes': len(latencias),
+        'erros': erros,
+        'rps': round(len(latencias) / tempo, 1) if tempo else 0.0,
+        'p50': round(percentil(latencias, 50), 2),
+        'p95': round(percentil(latencias, 95), 2),
+        'p99': round(percentil(latencias, 99), 2),
+        'consultas': round(sum(consultas) / len(consultas), 2) if consultas else None,
+    }
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def subir_gunicorn(workers, threads, servidor='wsgi', raiz=RAIZ):
+    porta = porta_livre()
+    if servidor == 'asgi':
+        # Workers do uvicorn, como no gunicorn.conf.py com SERVIDOR=asgi
+        modo = ['--worker-class', 'uvicorn_worker.UvicornWorker', 'Projeto.asgi:application']
+    else:
+        modo = ['--threads', str(threads), 'Projeto.wsgi:application']
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{porta}',
+         '--workers', str(workers), '--log-level', 'warning', *modo],
+        cwd=raiz, env={**os.environ, 'SERVIDOR': servidor},
+    )
+    base = f'http://127.0.0.1:{porta}'
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(base + '/login/', timeout=1).read()
+            return processo, base
+        except OSError:
+            if processo.poll() is not None:
+                raise SystemExit('gunicorn não subiu')
+            time.sleep(0.1)
+    processo.terminate()
+    raise SystemExit('gunicorn não respondeu a tempo')
+
+
+def medir_referencia(commit, args):
+    """
+    Roda este script com os mesmos parâmetros numa cópia do projeto em
+    ``commit`` (git worktree temporário) e retorna o resultado.
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        copia = os.path.join(pasta, 'projeto')
+        subprocess.run(['git', 'worktree', 'add', '--detach', copia, commit], cwd=RAIZ, check=True)
+        try:
+            saida = os.path.join(pasta, 'referencia.json')
+            parametros = [
+                '--modo', args.modo, '--concorrencia', str(args.concorrencia),
+                '--requisicoes', str(args.requisicoes), '--endpoints', args.endpoints,
+                '--produtos', str(args.produtos), '--usuarios', str(args.usuarios),
+                '--pedidos', str(args.pedidos), '--workers', str(args.workers),
+                '--threads', str(args.threads), '--servidor', args.servidor,
+            ]
+            print(f'Referência: {commit}', flush=True)
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *parametros, '--raiz', copia, '--salvar', saida],
+                check=True,
+            )
+            with open(saida) as arquivo:
+                return json.load(arquivo)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', copia], cwd=RAIZ, check=True)
+
+
+def comparar(resultado, baseline, tolerancia):
+    """Lista de regressões em relação ao baseline."""
+    regressoes = []
+    for nome, base in baseline['endpoints'].items():
+        atual = resultado['endpoints'].get(nome)
+        if atual is None:
+            continue
+        if atual['p95'] > base['p95'] * (1 + tolerancia):
+            regressoes.append(f'{nome}: p95 {base["p95"]}ms -> {atual["p95"]}ms')
+        if atual['rps'] < base['rps'] * (1 - tolerancia):
+            regressoes.append(f'{nome}: vazão {base["rps"]} -> {atual["rps"]} req/s')
+        if base['consultas'] is not None and atual['consultas'] is not None and atual['consultas'] > base['consultas']:
+            regressoes.append(f'{nome}: consultas {base["consultas"]} -> {atual["consultas"]} por requisição')
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modo', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--concorrencia', type=int, default=4)
+    parser.add_argument('--requisicoes', type=int, default=200, help='requisições medidas por endpoint')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='lista separada por vírgulas')
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--usuarios', type=int, default=500)
+    parser.add_argument('--pedidos', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=2, help='(gunicorn) workers')
+    parser.add_argument('--threads', type=int, default=2, help='(gunicorn) threads por worker')
+    parser.add_argument('--servidor', choices=['wsgi', 'asgi'], default='wsgi',
+                        help='(gunicorn) workers síncronos ou do uvicorn (ver gunicorn.conf.py)')
+    parser.add_argument('--salvar', help='grava o resultado como baseline JSON')
+    parser.add_argument('--comparar', help='baseline JSON para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='piora relativa aceita (0.25 = 25%%)')
+    parser.add_argument('--referencia', help='commit medido antes, como baseline (git worktree temporário)')
+    parser.add_argument('--raiz', default=RAIZ, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    referencia = medir_referencia(args.referencia, args) if args.referencia else None
+
+    pasta = tempfile.TemporaryDirectory()
+    os.environ['SQLITE_PATH'] = os.path.join(pasta.name, 'bench.sqlite3')
+    os.environ.setdefault('SLOW_REQUEST_MS', '100000')
+    # Todos os clientes entram com o mesmo usuário e IP: o limite de tentativas recusaria
+    os.environ.setdefault('LIMITES_ATIVOS', '0')
+
+    from _django import configurar_django
+    configurar_django(args.raiz)
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db.models import Count
+
+    from app.models import Produto
+    from app.management.commands.popular_dados import SENHA_PADRAO
+
+    print('Preparando banco...', flush=True)
+    call_command('migrate', verbosity=0)
+    call_command('popular_dados', produtos=args.produtos, usuarios=args.usuarios, pedidos=args.pedidos, verbosity=0)
+
+    # Produto com estoque "infinito" para as compras e o cliente com mais pedidos (pior caso do perfil)
+    produto = Produto.objects.order_by('id').first()
+    Produto.objects.filter(pk=produto.pk).update(estoque=10 ** 9)
+    usuario = User.objects.annotate(n=Count('pedido')).order_by('-n').first()
+
+    processo = None
+    if args.modo == 'gunicorn':
+        from django.db import connections
+        connections.close_all()
+        processo, base = subir_gunicorn(args.workers, args.threads, args.servidor, args.raiz)
+
+        def fabrica_cliente(precisa_login):
+            if precisa_login:
+                return ClienteHTTP(base, usuario.username, SENHA_PADRAO)
+            return ClienteHTTP(base)
+    else:
+        def fabrica_cliente(precisa_login):
+            return ClienteDjango(usuario if precisa_login else None)
+
+    resultado = {
+        'modo': args.modo,
+        'concorrencia': args.concorrencia,
+        'requisicoes': args.requisicoes,
+        'dados': {'produtos': args.produtos, 'usuarios': args.usuarios, 'pedidos': args.pedidos},
+        'endpoints': {},
+    }
+    try:
+        print(f'\n{"endpoint":<14} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"consultas":>10} {"erros":>6}')
+        for nome in args.endpoints.split(','):
+            linha = executar_endpoint(nome, fabrica_cliente, args.concorrencia, args.requisicoes, produto.pk)
+            resultado['endpoints'][nome] = linha
+            consultas = '-' if linha['consultas'] is None else linha['consultas']
+            print(
+                f'{nome:<14} {linha["rps"]:>8} {linha["p50"]:>8} {linha["p95"]:>8} '
+                f'{linha["p99"]:>8} {consultas:>10} {linha["erros"]:>6}',
+                flush=True,
+            )
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+        pasta.cleanup()
+
+    if args.salvar:
+        with open(args.salvar, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+        print(f'\nBaseline gravado em {args.salvar}')
+
+    if args.comparar or referencia:
+        if referencia is None:
+            with open(args.comparar) as arquivo:
+                referencia = json.load(arquivo)
+        regressoes = comparar(resultado, referencia, args.tolerancia)
+        if regressoes:
+            print('\nRegressões:')
+            for regressao in regressoes:
+                print(f'  - {regressao}')
+            sys.exit(1)
+        print('\nSem regressões em relação ao baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Configuração do gunicorn (lida automaticamente quando ele roda na raiz do projeto).
+
+SERVIDOR escolhe o modo:
+
+- 'wsgi' (padrão): workers síncronos com GUNICORN_THREADS threads cada
+  (Projeto.wsgi). Cada requisição ocupa uma thread até o último byte da
+  resposta sair, inclusive para clientes lentos.
+- 'asgi': workers do uvicorn (Projeto.asgi). Cada worker atende muitas
+  conexões no event loop; só o trabalho síncrono (ORM, middlewares do
+  Django) passa por threads, e um cliente lento ou um download de imagem
+  não prende nenhuma. As views de leitura (index, perfil, busca e API do
+  catálogo) são async.
+
+WEB_CONCURRENCY (workers) e PORT valem para os dois modos.
+
+Partida (a máquina dorme sem tráfego e acorda a cada visita): o Django é
+carregado uma vez no master (preload_app), que antes de abrir a porta migra
+só se preciso e aquece templates, URLs e caches (app/inicializacao.py). Os
+workers nascem por fork já prontos e compartilham essa memória.
+"""
+import os
+
+SERVIDOR = os.environ.get('SERVIDOR', 'wsgi')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+preload_app = True
+
+if SERVIDOR == 'asgi':
+    wsgi_app = 'Projeto.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'Projeto.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', 2))
+
+
+def on_starting(server):
+    # Master, antes do bind; o preload_app já carregou o Django
+    from app.inicializacao import preparar
+    preparar()